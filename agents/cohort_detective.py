@@ -1,21 +1,11 @@
-import json
-from openai import OpenAI
-
+from core.llm import LLMGateway
 from core.schemas import CohortInsight
 from core.prompts import COHORT_DETECTIVE_SYSTEM
 
 
-def _json_only(text: str) -> str:
-    # Strip fenced blocks if present
-    t = text.strip()
-    if t.startswith("```"):
-        t = t.split("```", 2)[1]
-    return t.strip()
-
-
 def run_cohort_detective(
     *,
-    client: OpenAI,
+    llm: LLMGateway,
     model: str,
     goal: str,
     wedge_name: str,
@@ -35,22 +25,21 @@ def run_cohort_detective(
         "urgency_hint": urgency_hint,
     }
 
-    resp = client.chat.completions.create(
+    def _enforce(data: dict) -> dict:
+        # enforce the computed cohort size/rate (trust data over model)
+        data["size"] = int(cohort_size)
+        data["dropoff_rate"] = dropoff_rate
+        if "urgency" not in data:
+            data["urgency"] = urgency_hint
+        return data
+
+    return llm.complete_json(
+        agent="cohort_detective",
         model=model,
         temperature=0.2,
-        messages=[
-            {"role": "system", "content": COHORT_DETECTIVE_SYSTEM},
-            {"role": "user", "content": f"Input stats:\n{json.dumps(user, indent=2)}"},
-        ],
+        system=COHORT_DETECTIVE_SYSTEM,
+        payload=user,
+        preamble="Input stats:\n",
+        schema=CohortInsight,
+        prepare=_enforce,
     )
-
-    content = resp.choices[0].message.content or "{}"
-    data = json.loads(_json_only(content))
-
-    # enforce the computed cohort size/rate (trust data over model)
-    data["size"] = int(cohort_size)
-    data["dropoff_rate"] = dropoff_rate
-    if "urgency" not in data:
-        data["urgency"] = urgency_hint
-
-    return CohortInsight(**data)
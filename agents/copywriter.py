@@ -1,17 +1,8 @@
-import json
-from openai import OpenAI
-
+from core.llm import LLMGateway
 from core.schemas import MessagesBundle, FlowStep
 from core.prompts import COPYWRITER_SYSTEM
 
 
-def _json_only(text: str) -> str:
-    t = text.strip()
-    if t.startswith("```"):
-        t = t.split("```", 2)[1]
-    return t.strip()
-
-
 def _normalize_messages(data: dict, wedge_name: str) -> dict:
     """
     Some model responses occasionally omit title/notes for sms/in_app.
@@ -70,7 +61,7 @@ def _normalize_messages(data: dict, wedge_name: str) -> dict:
 
 def run_copywriter(
     *,
-    client: OpenAI,
+    llm: LLMGateway,
     model: str,
     goal: str,
     wedge_name: str,
@@ -90,16 +81,12 @@ def run_copywriter(
         },
     }
 
-    resp = client.chat.completions.create(
+    return llm.complete_json(
+        agent="copywriter",
         model=model,
         temperature=0.6,
-        messages=[
-            {"role": "system", "content": COPYWRITER_SYSTEM},
-            {"role": "user", "content": json.dumps(user, indent=2)},
-        ],
+        system=COPYWRITER_SYSTEM,
+        payload=user,
+        schema=MessagesBundle,
+        prepare=lambda data: _normalize_messages(data, wedge_name=wedge_name),
     )
-
-    content = resp.choices[0].message.content or "{}"
-    data = json.loads(_json_only(content))
-    data = _normalize_messages(data, wedge_name=wedge_name)
-    return MessagesBundle(**data)
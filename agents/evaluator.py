@@ -1,9 +1,13 @@
-import json
 import re
-from typing import Tuple
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
 
-from openai import OpenAI
+from pydantic import BaseModel, Field
 
+from core.llm import LLMGateway
+from core.utils import JobCancelled
 from core.schemas import MessagesBundle, QAGate, CohortInsight, FlowSpec, ExplainBundle
 from core.prompts import EVALUATOR_SYSTEM, EXPLAIN_SYSTEM
 from agents.copywriter import run_copywriter
@@ -18,73 +22,173 @@ RISKY_PATTERNS = [
     r"\breplaces (your|the) clinician\b",
 ]
 
+# One pass per variant instead of one search per pattern over a JSON blob;
+# the named group that matched tells us which pattern fired.
+_RISKY_RE = re.compile("|".join(f"(?P<r{i}>{pat})" for i, pat in enumerate(RISKY_PATTERNS)), re.IGNORECASE)
 
-def _json_only(text: str) -> str:
-    t = text.strip()
-    if t.startswith("```"):
-        t = t.split("```", 2)[1]
-    return t.strip()
+CHANNEL_MAX_CHARS = {"sms": 240, "in_app": 280}
 
+SPAM_PHRASES = re.compile(
+    r"\b(act now|urgent|limited time|don't miss|last chance|click here|free|100%|risk[- ]free)\b",
+    re.IGNORECASE,
+)
+_CAPS_WORD = re.compile(r"\b[A-Z]{4,}\b")  # 4+ letters skips SMS/EHR-style acronyms
 
-def _rule_based_flags(messages: MessagesBundle) -> list[str]:
-    flags = []
-    text_blob = json.dumps(messages.model_dump()).lower()
-    for pat in RISKY_PATTERNS:
-        if re.search(pat, text_blob):
-            flags.append(f"Risky phrase detected: /{pat}/")
-    # simple spam signal
-    if text_blob.count("!") > 6:
+QA_THRESHOLD = 0.78
+LOCAL_PASS_SCORE = 0.85  # reported when the local checks are confident enough to skip the judge
+LOCAL_PASS_LIMIT_RATIO = 0.9  # "trivially passes" = every variant within 90% of its limit
+
+
+@dataclass
+class LocalQA:
+    score: float
+    flags: List[str] = field(default_factory=list)
+    verdict: str = "borderline"  # pass | fail | borderline
+    hard_fail: bool = False
+
+
+class _JudgeReply(BaseModel):
+    # Lenient view of the judge's reply; clamped into QAGate below.
+    score: float = 0.5
+    flags: list[str] = Field(default_factory=list)
+
+
+def local_prescore(messages: MessagesBundle) -> LocalQA:
+    """
+    Fast local QA: risky phrases, channel length limits and spam signals,
+    checked per variant and on each channel's title and notes. Decides whether
+    the LLM judge is needed at all (any flag means it is).
+    """
+    flags: List[str] = []
+    score = 1.0
+    hard_fail = False
+    near_limit = False
+    total_bangs = 0
+
+    for ch in ["email", "sms", "in_app"]:
+        pack = getattr(messages, ch)
+        # the title is the email subject line (and the in-app heading): it ships too
+        for part, value in (("title", pack.title), ("notes", pack.notes)):
+            where = f"{ch} {part}"
+            for m in _RISKY_RE.finditer(value):
+                pat = RISKY_PATTERNS[int(m.lastgroup[1:])]
+                flags.append(f"Risky phrase detected: /{pat}/ ({where})")
+                hard_fail = True
+                score -= 0.3
+            if not value.strip():
+                flags.append(f"{where} is empty.")
+                hard_fail = hard_fail or part == "title"
+                score -= 0.2 if part == "title" else 0.05
+            bangs = value.count("!")
+            total_bangs += bangs
+            spam = max(0, bangs - 1) + len(_CAPS_WORD.findall(value)) + 2 * len(SPAM_PHRASES.findall(value))
+            if spam >= 2:  # titles are short: a lower bar than the body
+                flags.append(f"Spammy tone in {where} (signal score {spam}).")
+                score -= 0.05 * min(spam, 6)
+
+        for i, v in enumerate(pack.variants, start=1):
+            where = f"{ch} variant {i}"
+            text = f"{v.text}\n{v.cta}"
+
+            for m in _RISKY_RE.finditer(text):
+                pat = RISKY_PATTERNS[int(m.lastgroup[1:])]
+                flags.append(f"Risky phrase detected: /{pat}/ ({where})")
+                hard_fail = True
+                score -= 0.3
+
+            limit = CHANNEL_MAX_CHARS.get(ch)
+            if limit:
+                if len(v.text) > limit:
+                    flags.append(f"{where} is {len(v.text)} chars (limit {limit}).")
+                    hard_fail = True
+                    score -= 0.15
+                elif len(v.text) > limit * LOCAL_PASS_LIMIT_RATIO:
+                    near_limit = True
+
+            if not v.text.strip():
+                flags.append(f"{where} is empty.")
+                hard_fail = True
+                score -= 0.2
+
+            bangs = text.count("!")
+            total_bangs += bangs
+            spam = max(0, bangs - 1) + len(_CAPS_WORD.findall(text)) + 2 * len(SPAM_PHRASES.findall(text))
+            if spam >= 3:
+                flags.append(f"Spammy tone in {where} (signal score {spam}).")
+                score -= 0.05 * min(spam, 6)
+
+    if total_bangs > 6:
         flags.append("Too many exclamation marks (spammy tone).")
-    return flags
+        score -= 0.05
+
+    flags = list(dict.fromkeys(flags))
+    score = max(0.0, min(1.0, score))
+    if hard_fail:
+        verdict = "fail"
+    elif not flags and not near_limit:
+        verdict = "pass"
+    else:
+        verdict = "borderline"
+    return LocalQA(score=round(score, 3), flags=flags, verdict=verdict, hard_fail=hard_fail)
 
 
 def run_evaluator(
     *,
-    client: OpenAI,
+    llm: LLMGateway,
     model: str,
     wedge_name: str,
     messages: MessagesBundle,
+    local_first: bool = True,
 ) -> QAGate:
-    base_flags = _rule_based_flags(messages)
+    """
+    Local checks run first; the LLM judge is only called for borderline copy
+    (or always, with local_first=False).
+    """
+    local = local_prescore(messages)
+    base_flags = local.flags
+    if local_first and local.verdict == "pass":
+        return QAGate(score=LOCAL_PASS_SCORE, flags=[], regenerations=0, judged_by="local")
+    if local_first and local.verdict == "fail":
+        # Below threshold either way; skip the judge and let the regen loop act.
+        return QAGate(score=min(local.score, QA_THRESHOLD - 0.1), flags=base_flags, regenerations=0, judged_by="local")
 
+    # Rubric lives in EVALUATOR_SYSTEM; only the shipped copy is judged (title = email subject line).
     payload = {
         "wedge_name": wedge_name,
-        "messages": messages.model_dump(),
-        "known_flags": base_flags,
-        "scoring_rubric": {
-            "clarity": "clear, short, actionable",
-            "spam_risk": "no pushy language, no excessive punctuation",
-            "brand_tone": "calm, confident, time-saving workflow",
-            "healthcare_safety": "no outcomes promises, no medical advice",
+        "variants": {
+            ch: {
+                "title": getattr(messages, ch).title,
+                "variants": [v.model_dump() for v in getattr(messages, ch).variants],
+            }
+            for ch in ["email", "sms", "in_app"]
         },
+        "known_flags": base_flags,
     }
 
-    resp = client.chat.completions.create(
+    judged = llm.complete_json(
+        agent="evaluator",
         model=model,
         temperature=0.1,
-        messages=[
-            {"role": "system", "content": EVALUATOR_SYSTEM},
-            {"role": "user", "content": json.dumps(payload, indent=2)},
-        ],
+        system=EVALUATOR_SYSTEM,
+        payload=payload,
+        schema=_JudgeReply,
+        prepare=lambda data: {**data, "flags": data.get("flags") or []},
     )
 
-    content = resp.choices[0].message.content or "{}"
-    data = json.loads(_json_only(content))
-
     # Merge flags
-    flags = list(dict.fromkeys((data.get("flags") or []) + base_flags))
-    score = float(data.get("score", 0.5))
+    flags = list(dict.fromkeys(judged.flags + base_flags))
+    score = min(1.0, max(0.0, judged.score))
 
     # Penalize if rule-based flags exist
     if base_flags:
         score = max(0.0, score - 0.15)
 
-    return QAGate(score=score, flags=flags, regenerations=0)
+    return QAGate(score=score, flags=flags, regenerations=0, judged_by="llm")
 
 
 def maybe_regenerate_messages(
     *,
-    client: OpenAI,
+    llm: LLMGateway,
     model: str,
     wedge_name: str,
     trigger: str,
@@ -92,56 +196,139 @@ def maybe_regenerate_messages(
     messages: MessagesBundle,
     qa: QAGate,
     max_regens: int = 2,
+    local_first: bool = True,
 ) -> Tuple[MessagesBundle, QAGate]:
     """
     If QA score is too low or flags are serious, regenerate copy up to N times.
     """
-    threshold = 0.78
     regens = 0
 
-    while qa.score < threshold and regens < max_regens:
+    while qa.score < QA_THRESHOLD and regens < max_regens:
         regens += 1
         messages = run_copywriter(
-            client=client,
+            llm=llm,
             model=model,
             goal="activation",
             wedge_name=wedge_name,
             trigger=trigger,
             sequence=sequence,
         )
-        qa = run_evaluator(client=client, model=model, wedge_name=wedge_name, messages=messages)
+        qa = run_evaluator(llm=llm, model=model, wedge_name=wedge_name, messages=messages, local_first=local_first)
         qa.regenerations = regens
 
     return messages, qa
 
 
+def best_of_n_messages(
+    *,
+    llm: LLMGateway,
+    copy_model: str,
+    judge_model: str,
+    goal: str,
+    wedge_name: str,
+    trigger: str,
+    sequence,
+    n: int = 3,
+    latency_budget_s: float = 30.0,
+    local_first: bool = True,
+    seeds: Optional[List[MessagesBundle]] = None,
+) -> Tuple[MessagesBundle, QAGate, Dict[str, Any]]:
+    """
+    Generate N candidate bundles concurrently (each scored as soon as it is
+    written) and keep the best passing one. `seeds` (e.g. a speculative draft)
+    count towards N and are only scored; `seed_scores` reports them in seed
+    order and `generated_scores` the candidates written here.
+
+    Waits for all candidates until the latency budget; after that it returns
+    the best scored candidate so far (waiting only if none has finished).
+    """
+    started = time.perf_counter()
+    seeds = list(seeds or [])[:n]
+
+    def _score(messages: MessagesBundle) -> Tuple[MessagesBundle, QAGate]:
+        qa = run_evaluator(llm=llm, model=judge_model, wedge_name=wedge_name, messages=messages, local_first=local_first)
+        return messages, qa
+
+    def _candidate() -> Tuple[MessagesBundle, QAGate]:
+        messages = run_copywriter(
+            llm=llm, model=copy_model, goal=goal, wedge_name=wedge_name, trigger=trigger, sequence=sequence
+        )
+        return _score(messages)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, n))
+    seed_futs = [pool.submit(_score, m) for m in seeds]
+    pending = set(seed_futs) | {pool.submit(_candidate) for _ in range(n - len(seeds))}
+    scored: List[Tuple[MessagesBundle, QAGate]] = []
+    generated_scores: List[float] = []
+    failures = 0
+    budget_hit = False
+
+    try:
+        while pending:
+            remaining = latency_budget_s - (time.perf_counter() - started)
+            if remaining <= 0:
+                budget_hit = True
+                if scored:
+                    break
+                remaining = None  # nothing usable yet: wait for the first candidate
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    scored.append(fut.result())
+                    if fut not in seed_futs:
+                        generated_scores.append(round(scored[-1][1].score, 3))
+                except JobCancelled:
+                    raise  # the job is cancelled or past its deadline: not a candidate failure
+                except Exception:
+                    failures += 1
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if not scored:
+        if llm.cancel is not None:
+            llm.cancel.check()
+        raise RuntimeError(f"All {n} copy candidates failed.")
+
+    # Prefer passing candidates, then the highest score.
+    best_messages, best_qa = max(scored, key=lambda c: (c[1].score >= QA_THRESHOLD, c[1].score))
+    info = {
+        "n": n,
+        "scored": len(scored),
+        "failed": failures,
+        "passing": sum(1 for _, qa in scored if qa.score >= QA_THRESHOLD),
+        "scores": sorted((round(qa.score, 3) for _, qa in scored), reverse=True),
+        # None for a seed that failed or was not scored within the budget
+        "seed_scores": [
+            round(f.result()[1].score, 3) if f.done() and not f.cancelled() and f.exception() is None else None
+            for f in seed_futs
+        ],
+        "generated_scores": sorted(generated_scores, reverse=True),
+        "budget_hit": budget_hit,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+    return best_messages, best_qa, info
+
+
 def run_explain(
     *,
-    client: OpenAI,
+    llm: LLMGateway,
     model: str,
     cohort: CohortInsight,
     flow: FlowSpec,
     messages: MessagesBundle,
 ) -> ExplainBundle:
+    # Message intent lives in EXPLAIN_SYSTEM; the flow is sent as one line per step.
     payload = {
         "cohort": cohort.model_dump(),
-        "flow": flow.model_dump(),
-        "message_intent_summary": {
-            "email": "remove friction and prompt first consult setup",
-            "sms": "short reminder with low barrier CTA",
-            "in_app": "gentle safety net with help option",
-        },
+        "trigger": flow.trigger,
+        "timing": [f"{s.t_plus} {s.channel}: {s.goal}" for s in flow.sequence],
     }
 
-    resp = client.chat.completions.create(
+    return llm.complete_json(
+        agent="explain",
         model=model,
         temperature=0.2,
-        messages=[
-            {"role": "system", "content": EXPLAIN_SYSTEM},
-            {"role": "user", "content": json.dumps(payload, indent=2)},
-        ],
+        system=EXPLAIN_SYSTEM,
+        payload=payload,
+        schema=ExplainBundle,
     )
-
-    content = resp.choices[0].message.content or "{}"
-    data = json.loads(_json_only(content))
-    return ExplainBundle(**data)
@@ -1,20 +1,61 @@
-import json
-from openai import OpenAI
+import re
 
-from core.schemas import FlowSpec
+from core.event_parser import WEDGES
+from core.llm import LLMGateway
+from core.schemas import FlowSpec, FlowStep
 from core.prompts import FLOW_ARCHITECT_SYSTEM
 
+# What Flow Architect is asked for (its own defaults, independent of speculation).
+DEFAULT_CHANNELS = ["email", "sms", "in_app"]
+DEFAULT_TIMING = ["T+48h", "T+60h", "T+96h"]
 
-def _json_only(text: str) -> str:
-    t = text.strip()
-    if t.startswith("```"):
-        t = t.split("```", 2)[1]
-    return t.strip()
+_T_PLUS_RE = re.compile(r"T\s*\+\s*(\d+(?:\.\d+)?)\s*([mhd])", re.IGNORECASE)
+_UNIT_HOURS = {"m": 1 / 60, "h": 1.0, "d": 24.0}
+
+
+def t_plus_hours(t_plus: str) -> float | None:
+    m = _T_PLUS_RE.search(t_plus or "")
+    if not m:
+        return None
+    return float(m.group(1)) * _UNIT_HOURS[m.group(2).lower()]
+
+
+def default_trigger(wedge: str) -> str:
+    return WEDGES[wedge]["trigger"]
+
+
+def default_sequence(wedge: str) -> list[FlowStep]:
+    """The likely sequence for `wedge`; what speculative copy is written against."""
+    return [
+        FlowStep(t_plus=t_plus, channel=channel, goal=goal, cta=cta)
+        for t_plus, channel, goal, cta in WEDGES[wedge]["default_sequence"]
+    ]
+
+
+def _same_text(a: str, b: str) -> bool:
+    return " ".join(a.split()).casefold() == " ".join(b.split()).casefold()
+
+
+def matches_default(sequence: list[FlowStep], wedge: str, tolerance_h: float) -> bool:
+    """
+    Same channels in the same order as the wedge's default sequence, each step
+    with the default goal and CTA and within `tolerance_h` of its timing.
+    """
+    default = default_sequence(wedge)
+    if [s.channel for s in sequence] != [s.channel for s in default]:
+        return False
+    for actual, expected in zip(sequence, default):
+        hours = t_plus_hours(actual.t_plus)
+        if hours is None or abs(hours - t_plus_hours(expected.t_plus)) > tolerance_h:
+            return False
+        if not (_same_text(actual.goal, expected.goal) and _same_text(actual.cta, expected.cta)):
+            return False
+    return True
 
 
 def run_flow_architect(
     *,
-    client: OpenAI,
+    llm: LLMGateway,
     model: str,
     goal: str,
     wedge_name: str,
@@ -26,19 +67,16 @@ def run_flow_architect(
         "urgency": urgency,
         "requirements": {
             "steps": 3,
-            "channels": ["email", "sms", "in_app"],
-            "default_timing": ["T+48h", "T+60h", "T+96h"],
+            "channels": DEFAULT_CHANNELS,
+            "default_timing": DEFAULT_TIMING,
         },
     }
 
-    resp = client.chat.completions.create(
+    return llm.complete_json(
+        agent="flow_architect",
         model=model,
         temperature=0.25,
-        messages=[
-            {"role": "system", "content": FLOW_ARCHITECT_SYSTEM},
-            {"role": "user", "content": json.dumps(prompt, indent=2)},
-        ],
+        system=FLOW_ARCHITECT_SYSTEM,
+        payload=prompt,
+        schema=FlowSpec,
     )
-    content = resp.choices[0].message.content or "{}"
-    data = json.loads(_json_only(content))
-    return FlowSpec(**data)
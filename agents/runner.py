@@ -1,19 +1,41 @@
 from __future__ import annotations
 
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any
-
-from openai import OpenAI
+from typing import TYPE_CHECKING, Any, Callable, Dict
 
 from core.config import AppConfig
-from core.event_parser import parse_csv_bytes, wedge_stats
-from core.schemas import AutopilotResult
-from core.utils import send_slack, JobManager
-from agents.cohort_detective import run_cohort_detective
-from agents.flow_architect import run_flow_architect
-from agents.copywriter import run_copywriter
-from agents.evaluator import run_evaluator, maybe_regenerate_messages, run_explain
+from core.job_store import SQLiteJobStore
+from core.llm import HedgePolicy, LLMGateway
+from core.llm_backends import (
+    FixtureStore,
+    LatencyModel,
+    LLMBackend,
+    OpenAIBackend,
+    RecordingBackend,
+    ReplayBackend,
+    StubBackend,
+)
+from core.metrics import HEDGING, SPECULATION, UsageLedger
+from core.ratelimit import get_rate_limiter
+from core.routing import ModelRouter, get_model_router
+from core.variant_library import get_variant_library, step_ctas
+from core.telemetry import CACHE_LOOKUPS, REGENERATIONS, STAGE_SECONDS
+from core.profiling import StageProfiler
+from core.tracing import NULL_TRACER, Tracer, start_trace
+from core.utils import send_slack, CancelToken, JobManager
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+    from core.schemas import AutopilotResult
+
+# pandas (core.event_parser), the OpenAI SDK and the agent modules are imported
+# on first use, so the web app and workers boot without them (see bench_imports.py).
 
 
 def build_deploy_payload(mode: str, cohort: Dict[str, Any], flow: Dict[str, Any], messages: Dict[str, Any], qa: Dict[str, Any]) -> Dict[str, Any]:
@@ -70,38 +92,154 @@ def build_deploy_payload(mode: str, cohort: Dict[str, Any], flow: Dict[str, Any]
     return payload
 
 
-def build_autopilot_job(
+@lru_cache(maxsize=4)
+def make_client(config: AppConfig) -> OpenAI:
+    """
+    One SDK client per config, built on the first live call.
+    """
+    from openai import OpenAI
+
+    # Retries live in the gateway (per call, jittered), so the SDK's own are off.
+    return OpenAI(api_key=config.openai_api_key, max_retries=0)
+
+
+@lru_cache(maxsize=4)
+def make_backend(config: AppConfig) -> LLMBackend:
+    """
+    Process-wide backend for this config (live, recording, or offline replay).
+    """
+    if config.llm_backend == "replay":
+        return ReplayBackend(
+            FixtureStore(config.llm_fixtures_dir),
+            latency=LatencyModel(config.llm_replay_latency),
+            strict=config.llm_replay_strict,
+        )
+    if config.llm_backend == "stub":
+        return StubBackend(LatencyModel(config.llm_replay_latency))
+    live = OpenAIBackend(make_client(config))
+    if config.llm_backend == "record":
+        return RecordingBackend(live, FixtureStore(config.llm_fixtures_dir))
+    if config.llm_backend != "openai":
+        raise ValueError(f"Unknown LLM_BACKEND: {config.llm_backend}")
+    return live
+
+
+def make_job_manager(config: AppConfig) -> JobManager | SQLiteJobStore:
+    """
+    "memory": jobs run on threads of this process. "sqlite": a store shared by
+    web and execution processes; worker.py runs the jobs.
+    """
+    if config.job_store == "sqlite":
+        return SQLiteJobStore(
+            config.job_store_path,
+            job_timeout_s=config.job_timeout_s,
+            max_jobs=config.jobs_max,
+            ttl_s=config.jobs_ttl_s,
+            max_queue=config.job_queue_max,
+        )
+    if config.job_store != "memory":
+        raise ValueError(f"Unknown JOB_STORE: {config.job_store}")
+    return JobManager(
+        job_timeout_s=config.job_timeout_s,
+        max_jobs=config.jobs_max,
+        ttl_s=config.jobs_ttl_s,
+        max_memory_bytes=int(config.jobs_memory_mb * 1024 * 1024),
+        spill_dir=config.jobs_spill_dir,
+        workers=config.job_workers,
+        max_queue=config.job_queue_max,
+    )
+
+
+def make_hedge_policy(config: AppConfig) -> HedgePolicy | None:
+    if not config.llm_hedging:
+        return None
+    agents = frozenset(a.strip() for a in config.hedge_agents.split(",") if a.strip())
+    return HedgePolicy(agents=agents, quantile=config.hedge_quantile, max_ratio=config.hedge_max_ratio)
+
+
+def make_router(config: AppConfig) -> ModelRouter | None:
+    pool = tuple(m.strip() for m in config.model_pool.split(",") if m.strip())
+    if not pool:
+        return None
+    return get_model_router(pool, config.agent_slos_s, config.model_strong, config.copy_escalate_p)
+
+
+def make_gateway(
+    config: AppConfig,
+    backend: LLMBackend | None = None,
+    lane: str = "interactive",
+    cancel: CancelToken | None = None,
+    tracer: Tracer = NULL_TRACER,
+) -> LLMGateway:
+    """
+    One gateway (and usage ledger, cancel token) per job; the backend and rate limiter are shared.
+    """
+    return LLMGateway(
+        backend or make_backend(config),
+        timeout_s=config.llm_timeout_s,
+        max_attempts=config.llm_max_attempts,
+        ledger=UsageLedger(),
+        limiter=get_rate_limiter(config.openai_rpm, config.openai_tpm),
+        lane=lane,
+        cancel=cancel,
+        hedge=make_hedge_policy(config),
+        router=make_router(config),
+        tracer=tracer,
+    )
+
+
+def run_autopilot_pipeline(
     *,
-    job_id: str,
-    raw_csv: bytes,
+    llm: LLMGateway,
+    config: AppConfig,
+    stats: Dict[str, Any],
     goal: str,
-    wedge: str,
     mode: str,
-    config: AppConfig,
-    exports_dir: str,
-    jobs: JobManager,
-):
+    progress: Callable[..., None],
+    started: float,
+) -> AutopilotResult:
     """
-    Returns a no-arg callable suitable for JobManager.run().
+    Agent stages for one cohort (output of wedge_stats / CohortIndex.stats).
+    Shared by the UI job and the batch CLI.
     """
-    exports = Path(exports_dir)
-    client = OpenAI(api_key=config.openai_api_key)
+    from core.schemas import AutopilotResult
+    from agents.cohort_detective import run_cohort_detective
+    from agents.flow_architect import default_sequence, default_trigger, matches_default, run_flow_architect
+    from agents.copywriter import run_copywriter
+    from agents.evaluator import QA_THRESHOLD, best_of_n_messages, run_evaluator, maybe_regenerate_messages, run_explain
 
-    def p(text: str, done: bool = False, kind: str = "info"):
-        jobs.update(job_id, text, done=done, kind=kind)
+    p = progress
+    cancel = llm.cancel
+    router = llm.router
+    tracer = llm.tracer
+    routed: Dict[str, str] = {}
 
-    def job_fn() -> Dict[str, Any]:
-        p("✓ Parsing events…")
-        parsed = parse_csv_bytes(raw_csv)
-        p(f"✓ Analyzing {parsed.total_users:,} user journeys / {parsed.total_events:,} events…")
+    def model_for(agent: str, default: str) -> str:
+        # routed per call when a model pool is configured; static config otherwise
+        routed[agent] = router.choose(agent, default) if router is not None else default
+        return routed[agent]
 
-        stats = wedge_stats(parsed.df, wedge=wedge)
-        p(f"✓ Cohort prepared: {stats['cohort_size']:,} users ({stats['dropoff_rate']})…")
+    def copy_model(regenerating: bool = False) -> str:
+        key = "copywriter_regen" if regenerating else "copywriter"
+        routed[key] = router.choose_copy(config.model_quality, regenerating) if router is not None else config.model_quality
+        return routed[key]
 
+    def record_quality(model: str, score: float):
+        if router is not None:
+            router.observe_quality("copywriter", model, score)
+
+    @contextmanager
+    def stage(name: str):
+        # per-stage deadline + cancellation checks on entry/exit (no-op without a token), timed for /metrics
+        with tracer.span(name), STAGE_SECONDS.time(stage=name):
+            with cancel.stage(name, config.stage_timeout_s) if cancel is not None else nullcontext():
+                yield
+
+    with stage("cohort_detective"):
         p("⏳ Cohort Detective reasoning…")
         cohort = run_cohort_detective(
-            client=client,
-            model=config.model_fast,
+            llm=llm,
+            model=model_for("cohort_detective", config.model_fast),
             goal=goal,
             wedge_name=stats["cohort_name"],
             wedge=stats["wedge"],
@@ -112,63 +250,170 @@ def build_autopilot_job(
         )
         p("✓ Cohort Detective completed.", done=True)
 
+    perf: Dict[str, Any] = {}
+    copy_args = dict(llm=llm, model=copy_model(), goal=goal, wedge_name=stats["cohort_name"])
+    messages = None
+
+    # Speculative copy: most flows come back with the wedge's default sequence,
+    # so draft against it while Flow Architect runs and keep it if the real flow matches.
+    spec_pool = spec_future = None
+    if config.speculative_copy:
+        spec_pool = ThreadPoolExecutor(max_workers=1)
+
+        def _speculate():
+            copy_started = time.perf_counter()
+            msgs = run_copywriter(
+                **copy_args, trigger=default_trigger(stats["wedge"]), sequence=default_sequence(stats["wedge"])
+            )
+            return msgs, copy_started, time.perf_counter()
+
+        spec_future = spec_pool.submit(_speculate)
+
+    with stage("flow_architect"):
         p("⏳ Flow Architect designing sequence…")
+        flow_started = time.perf_counter()
         flow = run_flow_architect(
-            client=client,
-            model=config.model_fast,
+            llm=llm,
+            model=model_for("flow_architect", config.model_fast),
             goal=goal,
             wedge_name=stats["cohort_name"],
             urgency=cohort.urgency,
         )
+        flow_done = time.perf_counter()
         p("✓ Flow Architect completed.", done=True)
 
-        p("⏳ Copywriter generating variants…")
-        messages = run_copywriter(
-            client=client,
-            model=config.model_quality,
-            goal=goal,
-            wedge_name=stats["cohort_name"],
-            trigger=flow.trigger,
-            sequence=flow.sequence,
-        )
-        p("✓ Copywriter completed.", done=True)
+    if spec_future is not None:
+        hit = matches_default(flow.sequence, stats["wedge"], config.speculation_tolerance_h)
+        saved = 0.0
+        if hit:
+            try:
+                messages, copy_started, copy_done = spec_future.result()
+                # sequential = flow + copy; speculative = until both finished
+                copy_s = copy_done - copy_started
+                saved = max(0.0, (flow_done - flow_started) + copy_s - (max(flow_done, copy_done) - flow_started))
+                p(f"✓ Speculative copy matches the flow (saved {saved:.1f}s).", done=True)
+            except Exception:
+                hit = False
+        if not hit:
+            p("↻ Flow differs from the default sequence; discarding speculative copy.")
+        spec_pool.shutdown(wait=False)
+        SPECULATION.record(hit=hit, saved_s=saved)
+        CACHE_LOOKUPS.inc(cache="speculative_copy", result="hit" if hit else "miss")
+        perf["speculation"] = {"hit": hit, "latency_saved_s": round(saved, 3), **SPECULATION.snapshot()}
 
-        p("⏳ Evaluator scoring + regenerating if needed…")
-        qa = run_evaluator(
-            client=client,
-            model=config.model_fast,
-            wedge_name=stats["cohort_name"],
-            messages=messages,
-        )
+    # Library: QA-approved variants written for the same step CTAs skip the Copywriter.
+    library = get_variant_library(config.variant_library_path) if config.variant_library else None
+    ctas = step_ctas(flow.sequence) if library is not None else None
+    library_ids: list[int] = []
+    if library is not None and messages is None:
+        found = None
+        if ctas is not None:
+            found = library.find_bundle(wedge=stats["wedge"], goal=goal, wedge_name=stats["cohort_name"], ctas=ctas)
+        perf["library"] = {"hit": found is not None}
+        CACHE_LOOKUPS.inc(cache="variant_library", result="hit" if found is not None else "miss")
+        if found is not None:
+            messages, library_ids = found
+            p("✓ Reusing QA-approved variants from the library.", done=True)
+    reused = messages if library_ids else None
 
-        messages, qa = maybe_regenerate_messages(
-            client=client,
-            model=config.model_quality,
-            wedge_name=stats["cohort_name"],
-            trigger=flow.trigger,
-            sequence=flow.sequence,
-            messages=messages,
-            qa=qa,
-            max_regens=2,
+    def discard_reused(score: float | None):
+        # reused copy that no longer passes QA leaves the library
+        if reused is not None and score is not None and score < QA_THRESHOLD:
+            perf["library"]["discarded"] = library.discard(library_ids)
+            p("↻ Library variants failed QA; discarded them.")
+
+    with stage("copy_and_qa"):
+        if config.qa_strategy == "best_of_n":
+            p(f"⏳ Copywriter + Evaluator: {config.best_of_n} candidates in parallel…")
+            messages, qa, perf["best_of_n"] = best_of_n_messages(
+                llm=llm,
+                copy_model=copy_args["model"],
+                judge_model=model_for("evaluator", config.model_fast),
+                goal=goal,
+                wedge_name=stats["cohort_name"],
+                trigger=flow.trigger,
+                sequence=flow.sequence,
+                n=config.best_of_n,
+                latency_budget_s=config.qa_latency_budget_s,
+                local_first=config.local_qa,
+                seeds=[messages] if messages is not None else None,
+            )
+            bon = perf["best_of_n"]
+            if reused is not None:
+                discard_reused(bon["seed_scores"][0])
+            # only candidates written here; seeds came from the library or an earlier draft
+            for score in bon["generated_scores"]:
+                record_quality(copy_args["model"], score)
+            p(f"✓ QA Gate picked best of {bon['scored']} ({bon['passing']} passing).", done=True)
+        else:
+            if messages is None:
+                p("⏳ Copywriter generating variants…")
+                messages = run_copywriter(**copy_args, trigger=flow.trigger, sequence=flow.sequence)
+                p("✓ Copywriter completed.", done=True)
+
+            p("⏳ Evaluator scoring + regenerating if needed…")
+            qa = run_evaluator(
+                llm=llm,
+                model=model_for("evaluator", config.model_fast),
+                wedge_name=stats["cohort_name"],
+                messages=messages,
+                local_first=config.local_qa,
+            )
+            if reused is None:
+                record_quality(copy_args["model"], qa.score)
+            discard_reused(qa.score)
+
+            messages, qa = maybe_regenerate_messages(
+                llm=llm,
+                model=copy_model(regenerating=True) if qa.score < QA_THRESHOLD else config.model_quality,
+                wedge_name=stats["cohort_name"],
+                trigger=flow.trigger,
+                sequence=flow.sequence,
+                messages=messages,
+                qa=qa,
+                max_regens=2,
+                local_first=config.local_qa,
+            )
+            p("✓ QA Gate completed.", done=True)
+
+    if qa.regenerations:
+        REGENERATIONS.inc(qa.regenerations)
+
+    # store fresh copy (including a regeneration of failed library variants), not the reused bundle itself
+    if library is not None and ctas is not None and messages is not reused and qa.score >= QA_THRESHOLD:
+        perf.setdefault("library", {})["stored"] = library.add_bundle(
+            wedge=stats["wedge"], goal=goal, wedge_name=stats["cohort_name"], ctas=ctas, messages=messages, score=qa.score
         )
-        p("✓ QA Gate completed.", done=True)
 
+    with stage("explain"):
         p("⏳ Explainability layer writing narrative…")
         explain = run_explain(
-            client=client,
-            model=config.model_fast,
+            llm=llm,
+            model=model_for("explain", config.model_fast),
             cohort=cohort,
             flow=flow,
             messages=messages,
         )
         p("✓ Explain completed.", done=True)
 
-        adoption = {
-            "shadow": "AI proposes flows with confidence + review checkpoints. Nothing auto-deploys.",
-            "assisted": "AI pre-fills deploy templates and suggests holdout. Human approval required to export.",
-            "auto": "AI outputs API-ready payloads, chooses best variants, and suggests sunset rules. Human spot-check weekly.",
-        }
+    adoption = {
+        "shadow": "AI proposes flows with confidence + review checkpoints. Nothing auto-deploys.",
+        "assisted": "AI pre-fills deploy templates and suggests holdout. Human approval required to export.",
+        "auto": "AI outputs API-ready payloads, chooses best variants, and suggests sunset rules. Human spot-check weekly.",
+    }
 
+    usage = llm.ledger.summary(wall_time_s=time.perf_counter() - started)
+    if router is not None:
+        perf["routing"] = {"chosen": routed, "models": router.snapshot()}
+    if llm.hedge is not None:
+        perf["hedging"] = {"job_hedges": usage.hedges, "job_hedge_wins": usage.hedge_wins, **HEDGING.snapshot()}
+    p(
+        f"✓ {usage.calls} LLM calls • {usage.prompt_tokens + usage.completion_tokens:,} tokens • "
+        f"{usage.tokens_saved:,} saved by compaction • ${usage.cost_usd:.4f} • {usage.wall_time_s:.1f}s",
+        done=True,
+    )
+
+    with tracer.span("build_deploy_payload", mode=mode):
         deploy_payload = build_deploy_payload(
             mode=mode,
             cohort=cohort.model_dump(),
@@ -176,36 +421,149 @@ def build_autopilot_job(
             messages=messages.model_dump(),
             qa=qa.model_dump(),
         )
+    deploy_payload["usage"] = usage.model_dump()
 
-        result = AutopilotResult(
-            cohort=cohort,
-            flow=flow,
-            messages=messages,
-            qa=qa,
-            explain=explain,
-            adoption=adoption,
-            deploy_payload=deploy_payload,
-        ).model_dump()
+    return AutopilotResult(
+        cohort=cohort,
+        flow=flow,
+        messages=messages,
+        qa=qa,
+        explain=explain,
+        adoption=adoption,
+        deploy_payload=deploy_payload,
+        usage=usage,
+        perf=perf,
+    )
+
+
+def build_autopilot_job(
+    *,
+    job_id: str,
+    raw_csv: bytes,
+    goal: str,
+    wedge: str,
+    mode: str,
+    config: AppConfig,
+    exports_dir: str,
+    jobs: JobManager | SQLiteJobStore,
+    profile: bool = False,
+):
+    """
+    Returns a no-arg callable suitable for JobManager.run() / SQLiteJobStore.execute().
+    With `profile` (or PROFILE_JOBS) the parse and wedge stages are profiled.
+    """
+    exports = Path(exports_dir)
+    cancel = jobs.token(job_id)
+    tracer = start_trace(job_id, config.trace_sample_rate, config.trace_slow_s)
+    llm = make_gateway(config, cancel=cancel, tracer=tracer)
+    profiler = StageProfiler(job_id, exports, top_n=config.profile_top_n) if profile or config.profile_jobs else None
+
+    def p(text: str, done: bool = False, kind: str = "info"):
+        jobs.update(job_id, text, done=done, kind=kind)
+
+    def profiled(name: str):
+        return profiler.stage(name, progress=p) if profiler is not None else nullcontext()
+
+    def run() -> Dict[str, Any]:
+        from core.event_parser import parse_csv_bytes, wedge_stats
+
+        started = time.perf_counter()
+        p("✓ Parsing events…")
+        with (
+            tracer.span("parse_csv_bytes", bytes=len(raw_csv)) as span,
+            STAGE_SECONDS.time(stage="parse"),
+            profiled("parse"),
+        ):
+            parsed = parse_csv_bytes(raw_csv)
+            span.set(rows=parsed.total_events, users=parsed.total_users)
+        p(f"✓ Analyzing {parsed.total_users:,} user journeys / {parsed.total_events:,} events…")
+
+        with (
+            tracer.span("wedge_stats", wedge=wedge) as span,
+            STAGE_SECONDS.time(stage="wedge_stats"),
+            profiled("wedge_stats"),
+        ):
+            stats = wedge_stats(parsed.df, wedge=wedge)
+            span.set(cohort_size=stats["cohort_size"])
+        if cancel is not None:
+            cancel.check()
+        p(f"✓ Cohort prepared: {stats['cohort_size']:,} users ({stats['dropoff_rate']})…")
+
+        out = run_autopilot_pipeline(
+            llm=llm, config=config, stats=stats, goal=goal, mode=mode, progress=p, started=started
+        )
+        result = out.model_dump()
+        deploy_payload = out.deploy_payload
+        if profiler is not None:
+            result["perf"]["profile"] = profiler.reports
 
         # Write exports
-        exports.mkdir(exist_ok=True)
-        out_path = exports / f"{job_id}_flow.json"
-        latest_path = exports / "latest_flow.json"
-        out_path.write_text(json.dumps(deploy_payload, indent=2))
-        latest_path.write_text(json.dumps(deploy_payload, indent=2))
+        with tracer.span("export") as span, STAGE_SECONDS.time(stage="export"):
+            exports.mkdir(exist_ok=True)
+            out_path = exports / f"{job_id}_flow.json"
+            latest_path = exports / "latest_flow.json"
+            body = json.dumps(deploy_payload, indent=2)
+            out_path.write_text(body)
+            latest_path.write_text(body)
+            span.set(bytes=len(body))
 
         # Optional Slack summary
         if config.slack_webhook_url:
             text = (
                 f"*Lifecycle Autopilot generated a flow*\n"
-                f"• Cohort: {cohort.name} ({cohort.dropoff_rate})\n"
-                f"• Trigger: {flow.trigger}\n"
-                f"• QA score: {qa.score}\n"
+                f"• Cohort: {out.cohort.name} ({out.cohort.dropoff_rate})\n"
+                f"• Trigger: {out.flow.trigger}\n"
+                f"• QA score: {out.qa.score}\n"
                 f"• Mode: {mode}\n"
             )
-            send_slack(config.slack_webhook_url, text)
+            with tracer.span("send_slack"):
+                send_slack(config.slack_webhook_url, text)
 
         p("✓ Export ready.", done=True)
         return result
 
+    def job_fn() -> Dict[str, Any]:
+        tracer.start()  # queue wait is not part of the trace
+        try:
+            with tracer.span("job", job_id=job_id, goal=goal, wedge=wedge, mode=mode):
+                return run()
+        finally:
+            tracer.save(exports)
+
     return job_fn
+
+
+def launch_autopilot_job(
+    *,
+    jobs: JobManager | SQLiteJobStore,
+    config: AppConfig,
+    raw_csv: bytes,
+    goal: str,
+    wedge: str,
+    mode: str,
+    exports_dir: str,
+    session_id: str | None = None,
+    priority: str = "interactive",
+    profile: bool = False,
+):
+    """
+    Create and queue a job on whichever store is configured: enqueued for
+    worker.py with the shared SQLite store, built and run in-process otherwise.
+    Returns (job_id, admitted); a rejected job is already marked failed/busy.
+    """
+    job_id = jobs.create_job(session_id=session_id)
+    if isinstance(jobs, SQLiteJobStore):
+        spec = {"goal": goal, "wedge": wedge, "mode": mode, "exports_dir": exports_dir, "profile": profile}
+        return job_id, jobs.enqueue(job_id, spec, raw_csv, priority=priority)
+    job_fn = build_autopilot_job(
+        job_id=job_id,
+        raw_csv=raw_csv,
+        goal=goal,
+        wedge=wedge,
+        mode=mode,
+        config=config,
+        exports_dir=exports_dir,
+        jobs=jobs,
+        profile=profile,
+    )
+    return job_id, jobs.run(job_id, job_fn, priority=priority)
@@ -1,19 +1,27 @@
 import base64
+import hashlib
 import json
 import os
+import uuid
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
 import dash
 import dash_bootstrap_components as dbc
-import pandas as pd
-from dash import Input, Output, State, dcc, html, no_update
+from dash import ClientsideFunction, Input, Output, Patch, State, dcc, html, no_update
 
+from core.api import register_api
 from core.config import AppConfig
 from core.metrics import compute_speedup_metrics
-from core.utils import JobManager, human_dt
-from agents.runner import build_autopilot_job
+from core.sse import register_sse
+from core.telemetry import register_metrics
+from core.utils import human_dt
+from agents.runner import launch_autopilot_job, make_job_manager
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 import sys
 from pathlib import Path
@@ -26,7 +34,7 @@ if str(ROOT) not in sys.path:
 APP_TITLE = "Lifecycle Autopilot - Heidi Growth AI Enablement"
 
 config = AppConfig.load()
-jobs = JobManager()
+jobs = make_job_manager(config)
 
 EXPORTS_DIR = Path("exports")
 EXPORTS_DIR.mkdir(exist_ok=True)
@@ -39,6 +47,11 @@ app = dash.Dash(
     assets_folder="assets",
 )
 server = app.server
+job_events = register_sse(
+    server, jobs, max_streams=config.sse_max_streams, max_thread_streams=config.sse_max_thread_streams
+)
+register_api(server, jobs, config, exports_dir=str(EXPORTS_DIR), events=job_events)
+register_metrics(server, jobs)
 
 
 def heidi_logo():
@@ -278,6 +291,13 @@ def left_console():
                         n_clicks=0,
                     ),
                     html.Div(className="spacer-8"),
+                    dbc.Button(
+                        "Cancel Run",
+                        id="btn-cancel",
+                        className="pill-btn pill-outline full-width",
+                        n_clicks=0,
+                    ),
+                    html.Div(className="spacer-8"),
                     dbc.Button(
                         "Open Explain Drawer",
                         id="btn-explain",
@@ -320,6 +340,7 @@ def stepper():
         className="stepper",
         children=[
             html.Div("Agents at work", className="panel-title"),
+            html.Div(id="queue-status", className="progress-line"),
             html.Div(id="progress-lines", className="progress-lines"),
         ],
     )
@@ -492,46 +513,55 @@ def footer_credit():
     )
 
 
-app.layout = html.Div(
-    className="app-shell",
-    children=[
-        top_announcement(),
-        nav_bar(),
-        hero_section(),
-        html.Div(
-            className="console-wrap",
-            children=[
-                dcc.Store(id="store-job-id"),
-                dcc.Store(id="store-result"),
-                dcc.Store(id="store-df-meta"),
-                dcc.Interval(id="poll", interval=600, n_intervals=0, disabled=True),
-
-                html.Div(className="console-left", children=[left_console()]),
-                html.Div(
-                    className="console-main",
-                    children=[
-                        stepper(),
-                        html.Div(className="spacer-12"),
-                        dbc.Tabs(
-                            [
-                                dbc.Tab(detect_tab(), label="Detect", tab_id="tab-detect"),
-                                dbc.Tab(flow_tab(), label="Build Flow", tab_id="tab-flow"),
-                                dbc.Tab(messages_tab(), label="Messages + QA", tab_id="tab-messages"),
-                                dbc.Tab(adoption_tab(), label="Adoption + ROI", tab_id="tab-adoption"),
-                            ],
-                            id="tabs",
-                            active_tab="tab-detect",
-                            className="heidi-tabs",
-                        ),
-                    ],
-                ),
-            ],
-        ),
-        explain_drawer(),
-        toast_area(),
-        footer_credit(),
-    ],
-)
+def serve_layout():
+    # Called per page load, so each browser tab gets its own session id
+    # (a new run from the same session cancels the one it supersedes).
+    return html.Div(
+        className="app-shell",
+        children=[
+            top_announcement(),
+            nav_bar(),
+            hero_section(),
+            html.Div(
+                className="console-wrap",
+                children=[
+                    dcc.Store(id="store-job-id"),
+                    dcc.Store(id="store-progress-cursor", data=0),
+                    dcc.Store(id="store-stream"),
+                    dcc.Store(id="store-session-id", data=uuid.uuid4().hex),
+                    dcc.Store(id="store-result"),
+                    dcc.Store(id="store-df-meta"),
+                    dcc.Interval(id="poll", interval=600, n_intervals=0, disabled=True),
+
+                    html.Div(className="console-left", children=[left_console()]),
+                    html.Div(
+                        className="console-main",
+                        children=[
+                            stepper(),
+                            html.Div(className="spacer-12"),
+                            dbc.Tabs(
+                                [
+                                    dbc.Tab(detect_tab(), label="Detect", tab_id="tab-detect"),
+                                    dbc.Tab(flow_tab(), label="Build Flow", tab_id="tab-flow"),
+                                    dbc.Tab(messages_tab(), label="Messages + QA", tab_id="tab-messages"),
+                                    dbc.Tab(adoption_tab(), label="Adoption + ROI", tab_id="tab-adoption"),
+                                ],
+                                id="tabs",
+                                active_tab="tab-detect",
+                                className="heidi-tabs",
+                            ),
+                        ],
+                    ),
+                ],
+            ),
+            explain_drawer(),
+            toast_area(),
+            footer_credit(),
+        ],
+    )
+
+
+app.layout = serve_layout
 
 
 def _decode_upload(contents: str) -> bytes:
@@ -539,7 +569,7 @@ def _decode_upload(contents: str) -> bytes:
     return base64.b64decode(b64)
 
 
-def _preview_table(df: pd.DataFrame, n=7):
+def _preview_table(df: "pd.DataFrame", n=7):
     view = df.head(n).copy()
     # keep it compact
     cols = list(view.columns)[:6]
@@ -569,6 +599,8 @@ def on_upload(contents, filename):
     if not contents:
         return ("No file uploaded yet.", "—", "—", no_update)
 
+    import pandas as pd  # first upload pays for pandas, not app start-up
+
     try:
         raw = _decode_upload(contents)
         df = pd.read_csv(pd.io.common.BytesIO(raw))
@@ -590,6 +622,8 @@ def on_upload(contents, filename):
     Output("store-job-id", "data"),
     Output("poll", "disabled"),
     Output("tabs", "active_tab"),
+    Output("progress-lines", "children", allow_duplicate=True),
+    Output("store-progress-cursor", "data", allow_duplicate=True),
     Input("btn-generate", "n_clicks"),
     Input("cta-generate", "n_clicks"),
     Input("nav-generate", "n_clicks"),
@@ -597,72 +631,111 @@ def on_upload(contents, filename):
     State("goal", "value"),
     State("wedge", "value"),
     State("mode", "value"),
+    State("store-session-id", "data"),
     prevent_initial_call=True,
 )
-def start_job(n1, n2, n3, contents, goal, wedge, mode):
+def start_job(n1, n2, n3, contents, goal, wedge, mode, session_id):
     trigger = (n1 or 0) + (n2 or 0) + (n3 or 0)
-    if trigger <= 0:
-        return no_update, no_update, no_update
-    if not contents:
-        return no_update, no_update, no_update
+    if trigger <= 0 or not contents:
+        return no_update, no_update, no_update, no_update, no_update
 
     raw = _decode_upload(contents)
 
-    job_id = jobs.create_job()
-    job_fn = build_autopilot_job(
-        job_id=job_id,
+    job_id, _ = launch_autopilot_job(
+        jobs=jobs,
+        config=config,
         raw_csv=raw,
         goal=goal,
         wedge=wedge,
         mode=mode,
-        config=config,
         exports_dir=str(EXPORTS_DIR),
-        jobs=jobs,
+        session_id=session_id,
     )
-    jobs.run(job_id, job_fn)
 
-    # enable polling + jump to Detect tab
-    return job_id, False, "tab-detect"
+    # enable polling from a fresh cursor + jump to Detect tab
+    return job_id, False, "tab-detect", [], 0
+
+
+@app.callback(
+    Output("mode-badge", "children"),
+    Output("mode-badge", "className"),
+    Input("mode", "value"),
+)
+def update_mode_badge(mode):
+    return _mode_badge(mode)
+
+
+# Progress is pushed over SSE when the browser can (assets/job_stream.js); poll_job is the fallback.
+app.clientside_callback(
+    ClientsideFunction(namespace="jobStream", function_name="open"),
+    Output("store-stream", "data"),
+    Input("store-job-id", "data"),
+)
+
+
+def _progress_line(item: Dict[str, Any]):
+    css = "progress-line done" if item.get("done") else "progress-line"
+    if item.get("kind") == "error":
+        css = "progress-line error"
+    return html.Div(item.get("text", ""), className=css)
 
 
 @app.callback(
     Output("progress-lines", "children"),
+    Output("store-progress-cursor", "data"),
+    Output("queue-status", "children"),
     Output("store-result", "data"),
+    Output("poll", "disabled", allow_duplicate=True),
     Output("btn-export", "disabled"),
     Output("btn-slack", "disabled"),
-    Output("mode-badge", "children"),
-    Output("mode-badge", "className"),
     Input("poll", "n_intervals"),
     State("store-job-id", "data"),
-    State("mode", "value"),
+    State("store-progress-cursor", "data"),
+    prevent_initial_call="initial_duplicate",
 )
-def poll_job(_, job_id, mode):
-    label, klass = _mode_badge(mode)
+def poll_job(_, job_id, cursor):
+    """
+    Appends only the events after `cursor`; once the job is done, hands over
+    the result (exactly once) and switches the interval off.
+    """
+    no_slack = not bool(config.slack_webhook_url)
     if not job_id:
-        return [html.Div("Awaiting input…", className="progress-line")], no_update, True, (not bool(config.slack_webhook_url)), label, klass
+        return [html.Div("Awaiting input…", className="progress-line")], 0, None, no_update, True, True, no_slack
+
+    delta = jobs.progress_since(job_id, cursor or 0)
+    if delta is None:
+        return [html.Div("Job not found.", className="progress-line error")], 0, None, no_update, True, True, no_slack
+
+    lines = no_update
+    if delta.events:
+        lines = Patch()
+        for item in delta.events:
+            lines.append(_progress_line(item))
+    queue = None
+    if delta.state == "queued" and delta.queue_position:
+        queue = f"⏳ Queued • position {delta.queue_position} • ~{delta.eta_s:.0f}s estimated wait"
+
+    if not delta.done:
+        return lines, delta.cursor, queue, no_update, False, True, no_slack
 
     status = jobs.get(job_id)
-    if not status:
-        return [html.Div("Job not found.", className="progress-line error")], no_update, True, (not bool(config.slack_webhook_url)), label, klass
+    result = status.result if status else None
+    if not result:
+        return lines, delta.cursor, queue, no_update, True, True, no_slack
+    # the browser only keeps a reference; tabs resolve it server-side
+    ref = {"job_id": job_id, "key": _result_key(result)}
+    return lines, delta.cursor, queue, ref, True, False, no_slack
 
-    lines = []
-    for item in status.progress:
-        css = "progress-line done" if item.get("done") else "progress-line"
-        if item.get("kind") == "error":
-            css = "progress-line error"
-        lines.append(html.Div(item.get("text", ""), className=css))
 
-    export_enabled = False
-    slack_enabled = bool(config.slack_webhook_url)
+def _result_key(result: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(result, sort_keys=True, separators=(",", ":"), default=str).encode()).hexdigest()[:16]
 
-    result_data = no_update
-    if status.done and status.result:
-        export_enabled = True
-        # slack enabled only if webhook exists AND we have a result
-        slack_enabled = bool(config.slack_webhook_url)
-        result_data = status.result
 
-    return lines, result_data, (not export_enabled), (not slack_enabled), label, klass
+def _resolve_result(ref: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not ref:
+        return None
+    status = jobs.get(ref.get("job_id", ""))
+    return status.result if status else None
 
 
 def _safe_get(d: Dict[str, Any], path: str, default="—"):
@@ -737,69 +810,79 @@ def _render_messages(messages: Dict[str, Any]):
     return cards
 
 
-@app.callback(
-    Output("detected-cohort-title", "children"),
-    Output("detected-cohort-desc", "children"),
-    Output("metric-size", "children"),
-    Output("metric-rate", "children"),
-    Output("metric-urgency", "children"),
-    Output("flow-trigger", "children"),
-    Output("flow-timeline", "children"),
-    Output("flow-json", "children"),
-    Output("messages-grid", "children"),
-    Output("qa-summary", "children"),
-    Output("qa-flags", "children"),
-    Output("proof-math", "children"),
-    Output("proof-cards", "children"),
-    Output("adoption-plan", "children"),
-    Output("explain-content", "children"),
-    Input("store-result", "data"),
-    State("mode", "value"),
-)
-def render_result(result, mode):
-    if not result:
-        # Empty state
-        empty = "—"
-        return (
-            "Upload events and click Generate.",
-            "Autopilot will detect the highest-impact lifecycle bottleneck.",
-            empty, empty, empty,
-            empty, [], "—",
-            [],
-            "—", [],
-            "", [],
-            "",
-            html.Div("Generate a flow to see narrative reasoning here.", className="muted"),
-        )
+def _fmt_or_dash(value, fmt: str) -> str:
+    return fmt.format(value) if value is not None else "—"
+
+
+def _render_agent_usage(by_agent: Dict[str, Any]):
+    # per-agent measured cost/latency (from AutopilotResult.usage)
+    if not by_agent:
+        return html.Div()
+    header = html.Thead(html.Tr([html.Th(c) for c in ["Agent", "Calls", "Tokens", "Saved", "Latency", "Cost"]]))
+    body = html.Tbody(
+        [
+            html.Tr(
+                [
+                    html.Td(agent.replace("_", " ").title()),
+                    html.Td(str(u.get("calls", 0))),
+                    html.Td(f"{u.get('prompt_tokens', 0) + u.get('completion_tokens', 0):,}"),
+                    html.Td(f"{u.get('tokens_saved', 0):,}"),
+                    html.Td(f"{u.get('latency_s', 0):.1f} s"),
+                    html.Td(f"${u.get('cost_usd', 0):.4f}"),
+                ]
+            )
+            for agent, u in by_agent.items()
+        ]
+    )
+    return html.Div(
+        children=[
+            html.Div("Measured per agent (this flow)", className="panel-title"),
+            dbc.Table([header, body], bordered=False, hover=True, responsive=True, className="heidi-table"),
+        ]
+    )
+
+
+def _render_detect(result: Dict[str, Any], mode: str):
+    return (
+        _safe_get(result, "cohort.name"),
+        _safe_get(result, "cohort.story"),
+        str(_safe_get(result, "cohort.size")),
+        str(_safe_get(result, "cohort.dropoff_rate")),
+        str(_safe_get(result, "cohort.urgency")),
+    )
 
-    cohort_title = _safe_get(result, "cohort.name")
-    cohort_desc = _safe_get(result, "cohort.story")
-    size = _safe_get(result, "cohort.size")
-    rate = _safe_get(result, "cohort.dropoff_rate")
-    urgency = _safe_get(result, "cohort.urgency")
 
+def _render_flow(result: Dict[str, Any], mode: str):
     trigger = _safe_get(result, "flow.trigger")
     sequence = _safe_get(result, "flow.sequence", default=[])
     timeline = _render_timeline(sequence if isinstance(sequence, list) else [])
-
     export_json = json.dumps(result.get("deploy_payload", result), indent=2)
+    return f"Trigger: {trigger}", timeline, export_json
+
 
+def _render_messages_tab(result: Dict[str, Any], mode: str):
     msgs = result.get("messages", {})
     messages_grid = _render_messages(msgs if isinstance(msgs, dict) else {})
 
     qa = result.get("qa", {})
-    qa_summary = f"Score: {qa.get('score','—')} • Regenerations: {qa.get('regenerations','—')} • Mode: {mode}"
+    judge = "local checks" if qa.get("judged_by") == "local" else "LLM judge"
+    qa_summary = f"Score: {qa.get('score','—')} • Regenerations: {qa.get('regenerations','—')} • Judged by: {judge} • Mode: {mode}"
     flags = qa.get("flags", []) or []
     flag_elems = [html.Span(f, className="flag") for f in flags] if flags else [html.Span("No flags.", className="flag ok")]
+    return messages_grid, qa_summary, flag_elems
 
-    # hard numbers proof
-    metrics = compute_speedup_metrics()
+
+def _render_adoption(result: Dict[str, Any], mode: str):
+    # hard numbers proof (generate step + cost measured from this job's LLM usage)
+    usage = result.get("usage", {}) or {}
+    metrics = compute_speedup_metrics(usage)
     proof_math = html.Div(
         className="proof-math-inner",
         children=[
             html.Div(f"{metrics['speedup']:.1f}× faster", className="proof-big"),
             html.Div(
-                f"{metrics['manual_total_min']} min → {metrics['ai_total_min']} min per flow",
+                f"{metrics['manual_total_min']} min → {metrics['ai_total_min']} min per flow"
+                + (" (measured generate time + review)" if metrics["measured"] else ""),
                 className="muted",
             ),
         ],
@@ -809,23 +892,34 @@ def render_result(result, mode):
         children=[
             html.Div(className="proof-card", children=[html.Div("Manual / flow", className="metric-k"), html.Div(f"{metrics['manual_total_hr']} hrs", className="metric-v")]),
             html.Div(className="proof-card", children=[html.Div("AI / flow", className="metric-k"), html.Div(f"{metrics['ai_total_min']} min", className="metric-v")]),
+            html.Div(className="proof-card", children=[html.Div("Generate latency", className="metric-k"), html.Div(_fmt_or_dash(metrics["generate_latency_s"], "{:.1f} s"), className="metric-v")]),
+            html.Div(className="proof-card", children=[html.Div("LLM cost / flow", className="metric-k"), html.Div(_fmt_or_dash(metrics["cost_usd"], "${:.4f}"), className="metric-v")]),
             html.Div(className="proof-card", children=[html.Div("Throughput", className="metric-k"), html.Div("3 → 30 flows/week", className="metric-v")]),
             html.Div(className="proof-card", children=[html.Div("Result", className="metric-k"), html.Div(f"{metrics['speedup']:.2f}×", className="metric-v")]),
         ],
     )
+    agent_usage = _render_agent_usage(usage.get("by_agent", {}))
 
     adoption = result.get("adoption", {})
-    adoption_plan = html.Ul(
-        className="adoption-list",
+    adoption_plan = html.Div(
         children=[
-            html.Li([html.B("Shadow: "), adoption.get("shadow", "AI proposes; humans approve.")]),
-            html.Li([html.B("Assisted: "), adoption.get("assisted", "AI pre-fills; approval for deploy.")]),
-            html.Li([html.B("Auto: "), adoption.get("auto", "AI deploys low-risk flows; human spot-check weekly.")]),
-        ],
+            html.Ul(
+                className="adoption-list",
+                children=[
+                    html.Li([html.B("Shadow: "), adoption.get("shadow", "AI proposes; humans approve.")]),
+                    html.Li([html.B("Assisted: "), adoption.get("assisted", "AI pre-fills; approval for deploy.")]),
+                    html.Li([html.B("Auto: "), adoption.get("auto", "AI deploys low-risk flows; human spot-check weekly.")]),
+                ],
+            ),
+            agent_usage,
+        ]
     )
+    return proof_math, proof_cards, adoption_plan
+
 
+def _render_explain(result: Dict[str, Any], mode: str):
     explain = result.get("explain", {})
-    explain_content = html.Div(
+    return html.Div(
         className="explain-sections",
         children=[
             html.Div(className="explain-section", children=[html.Div("Why this cohort?", className="explain-h"), html.Div(explain.get("why_cohort", "—"), className="explain-p")]),
@@ -834,25 +928,152 @@ def render_result(result, mode):
         ],
     )
 
-    return (
-        cohort_title,
-        cohort_desc,
-        str(size),
-        str(rate),
-        str(urgency),
-        f"Trigger: {trigger}",
-        timeline,
-        export_json,
-        messages_grid,
-        qa_summary,
-        flag_elems,
-        proof_math,
-        proof_cards,
-        adoption_plan,
-        explain_content,
+
+_TAB_RENDERERS = {
+    "tab-detect": _render_detect,
+    "tab-flow": _render_flow,
+    "tab-messages": _render_messages_tab,
+    "tab-adoption": _render_adoption,
+    "explain": _render_explain,
+}
+
+_EMPTY = {
+    "tab-detect": (
+        "Upload events and click Generate.",
+        "Autopilot will detect the highest-impact lifecycle bottleneck.",
+        "—", "—", "—",
+    ),
+    "tab-flow": ("—", [], "—"),
+    "tab-messages": ([], "—", []),
+    "tab-adoption": ("", [], ""),
+    "explain": html.Div("Generate a flow to see narrative reasoning here.", className="muted"),
+}
+
+
+# The browser only holds {job_id, key}; once the server has dropped the job (JOBS_TTL_S / JOBS_MAX,
+# an unreadable spill file, another process's memory store) the result is gone.
+_EXPIRED_TEXT = "This result has expired on the server. Click Generate to run it again."
+_EXPIRED = {
+    "tab-detect": ("Result expired", _EXPIRED_TEXT, "—", "—", "—"),
+    "tab-flow": (_EXPIRED_TEXT, [], "—"),
+    "tab-messages": ([html.Div(_EXPIRED_TEXT, className="muted")], "—", []),
+    "tab-adoption": (_EXPIRED_TEXT, [], ""),
+    "explain": html.Div(_EXPIRED_TEXT, className="muted"),
+}
+
+
+class _ResultExpired(Exception):
+    pass
+
+
+def _expired_toast():
+    return dbc.Toast(
+        [_EXPIRED_TEXT],
+        header=f"Result expired • {human_dt(datetime.utcnow())}",
+        is_open=True,
+        dismissable=True,
+        icon="warning",
+        duration=6000,
+        className="heidi-toast",
     )
 
 
+_MODE_DEPENDENT = {"tab-messages"}
+
+
+@lru_cache(maxsize=64)
+def _render_memo(tab: str, job_id: str, key: str, mode: str):
+    result = _resolve_result({"job_id": job_id})
+    if not result:
+        raise _ResultExpired(job_id)  # not cached: lru_cache only keeps returned values
+    return _TAB_RENDERERS[tab](result, mode)
+
+
+def _render_cached(tab: str, ref: Dict[str, Any], mode: str = ""):
+    # component trees (and the indented export JSON) per result hash; a result never changes once done
+    return _render_memo(tab, ref["job_id"], ref["key"], mode if tab in _MODE_DEPENDENT else "")
+
+
+def _render_or_expired(tab: str, ref: Dict[str, Any], mode: str = ""):
+    try:
+        return _render_cached(tab, ref, mode)
+    except _ResultExpired:
+        dash.set_props("toast-area", {"children": [_expired_toast()]})
+        return _EXPIRED[tab]
+
+
+def _render_tab(tab: str, active_tab: Optional[str], ref: Optional[Dict[str, Any]], mode: str):
+    if not ref:
+        return _EMPTY[tab]
+    if active_tab != tab:
+        return tuple(no_update for _ in _EMPTY[tab])  # hidden: render when it becomes active
+    return _render_or_expired(tab, ref, mode)
+
+
+@app.callback(
+    Output("detected-cohort-title", "children"),
+    Output("detected-cohort-desc", "children"),
+    Output("metric-size", "children"),
+    Output("metric-rate", "children"),
+    Output("metric-urgency", "children"),
+    Input("store-result", "data"),
+    Input("tabs", "active_tab"),
+    State("mode", "value"),
+)
+def render_detect(ref, active_tab, mode):
+    return _render_tab("tab-detect", active_tab, ref, mode)
+
+
+@app.callback(
+    Output("flow-trigger", "children"),
+    Output("flow-timeline", "children"),
+    Output("flow-json", "children"),
+    Input("store-result", "data"),
+    Input("tabs", "active_tab"),
+    State("mode", "value"),
+)
+def render_flow(ref, active_tab, mode):
+    return _render_tab("tab-flow", active_tab, ref, mode)
+
+
+@app.callback(
+    Output("messages-grid", "children"),
+    Output("qa-summary", "children"),
+    Output("qa-flags", "children"),
+    Input("store-result", "data"),
+    Input("tabs", "active_tab"),
+    State("mode", "value"),
+)
+def render_messages(ref, active_tab, mode):
+    return _render_tab("tab-messages", active_tab, ref, mode)
+
+
+@app.callback(
+    Output("proof-math", "children"),
+    Output("proof-cards", "children"),
+    Output("adoption-plan", "children"),
+    Input("store-result", "data"),
+    Input("tabs", "active_tab"),
+    State("mode", "value"),
+)
+def render_adoption(ref, active_tab, mode):
+    return _render_tab("tab-adoption", active_tab, ref, mode)
+
+
+@app.callback(
+    Output("explain-content", "children"),
+    Input("store-result", "data"),
+    Input("explain-drawer", "is_open"),
+    State("mode", "value"),
+)
+def render_explain(ref, is_open, mode):
+    if not ref:
+        return _EMPTY["explain"]
+    if not is_open:
+        return no_update
+    return _render_or_expired("explain", ref)
+
+
 @app.callback(
     Output("explain-drawer", "is_open"),
     Input("btn-explain", "n_clicks"),
@@ -871,23 +1092,41 @@ def toggle_explain(btn, tab, is_open):
     Output("toast-area", "children"),
     Input("btn-export", "n_clicks"),
     Input("btn-slack", "n_clicks"),
+    Input("btn-cancel", "n_clicks"),
     State("store-result", "data"),
     State("store-job-id", "data"),
     prevent_initial_call=True,
 )
-def actions(export_clicks, slack_clicks, result, job_id):
+def actions(export_clicks, slack_clicks, cancel_clicks, result_ref, job_id):
     ctx = dash.callback_context
-    if not ctx.triggered or not result:
+    if not ctx.triggered:
         return no_update
     trig = ctx.triggered[0]["prop_id"].split(".")[0]
+    result = _resolve_result(result_ref)
+    if trig != "btn-cancel" and not result:
+        return [_expired_toast()] if result_ref else no_update
 
     toasts = []
     now = human_dt(datetime.utcnow())
-    if trig == "btn-export":
+    if trig == "btn-cancel":
+        cancelled = bool(job_id) and jobs.cancel(job_id)
+        toasts.append(
+            dbc.Toast(
+                ["Run will stop after the current step." if cancelled else "No run in progress."],
+                header=f"Cancel • {now}",
+                is_open=True,
+                dismissable=True,
+                icon="warning" if cancelled else "secondary",
+                duration=4500,
+                className="heidi-toast",
+            )
+        )
+    elif trig == "btn-export":
         out_path = EXPORTS_DIR / f"{job_id or 'latest'}_flow.json"
         latest_path = EXPORTS_DIR / "latest_flow.json"
-        out_path.write_text(json.dumps(result.get("deploy_payload", result), indent=2))
-        latest_path.write_text(json.dumps(result.get("deploy_payload", result), indent=2))
+        export_json = _render_cached("tab-flow", result_ref)[2]
+        out_path.write_text(export_json)
+        latest_path.write_text(export_json)
         toasts.append(
             dbc.Toast(
                 [html.Div("Exported deploy-ready JSON."), html.Div(str(out_path), className="muted-small")],
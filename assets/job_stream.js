@@ -0,0 +1,78 @@
+// Push-based job progress: feeds /jobs/<id>/events (server-sent events) into the
+// "Agents at work" stepper. The server ends long streams on purpose; EventSource
+// then reconnects by itself with Last-Event-ID. Interval polling stays as the
+// fallback: it is switched off while the stream is open and back on if the stream
+// is refused (503) or keeps failing, and for one final poll once the job is done
+// (which hands over the result).
+(function () {
+  var current = null;
+  var MAX_RECONNECTS = 3; // failed reconnects in a row before giving up on the stream
+
+  function progressLine(item) {
+    var css = item.kind === "error" ? "progress-line error" : item.done ? "progress-line done" : "progress-line";
+    return { namespace: "dash_html_components", type: "Div", props: { children: item.text, className: css } };
+  }
+
+  function queueText(d) {
+    if (d.state !== "queued" || !d.queue_position) return null;
+    return "⏳ Queued • position " + d.queue_position + " • ~" + Math.round(d.eta_s || 0) + "s estimated wait";
+  }
+
+  function poll(on) {
+    window.dash_clientside.set_props("poll", { disabled: !on });
+  }
+
+  function open(jobId) {
+    var dc = window.dash_clientside;
+    if (current) {
+      current.source.close();
+      current = null;
+    }
+    if (!jobId || typeof EventSource === "undefined" || !dc.set_props) {
+      return dc.no_update;
+    }
+
+    var state = { lines: [], done: false, errors: 0 };
+    var source = new EventSource("jobs/" + encodeURIComponent(jobId) + "/events?cursor=0");
+    state.source = source;
+    current = state;
+
+    source.addEventListener("open", function () {
+      state.errors = 0;
+      poll(false);
+    });
+    source.addEventListener("progress", function (e) {
+      var d = JSON.parse(e.data);
+      d.events.forEach(function (item) {
+        state.lines.push(progressLine(item));
+      });
+      dc.set_props("progress-lines", { children: state.lines.slice() });
+      dc.set_props("store-progress-cursor", { data: d.cursor });
+      dc.set_props("queue-status", { children: queueText(d) });
+      if (d.done) {
+        state.done = true;
+        source.close();
+        poll(true);
+      }
+    });
+    source.addEventListener("missing", function () {
+      source.close();
+      poll(true);
+    });
+    source.onerror = function () {
+      if (state.done) return;
+      state.errors += 1;
+      // CLOSED: the browser won't retry (503 too many streams, non-SSE reply); otherwise it is
+      // reconnecting (stream aged out, proxy cut) unless that keeps failing (server gone).
+      if (source.readyState === EventSource.CLOSED || state.errors > MAX_RECONNECTS) {
+        source.close();
+        poll(true);
+      }
+    };
+    return jobId;
+  }
+
+  window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    jobStream: { open: open },
+  });
+})();
@@ -0,0 +1,199 @@
+"""
+Headless batch generation: one flow per wedge × segment cell.
+
+    python batch.py --data sample_data/heidi_events.csv --segment-by role,clinic_id
+
+The log is parsed once and all cohorts come from a single CohortIndex pass;
+LLM work fans out under --concurrency. Each finished cell is appended to an
+NDJSON file in exports/, and a restart skips cells already written. The
+variant library stays off unless --variant-library is passed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.config import AppConfig
+from core.event_parser import WEDGES, CohortIndex, parse_csv_bytes
+from core.ratelimit import get_rate_limiter
+from agents.runner import make_backend, make_gateway, run_autopilot_pipeline
+
+
+def cell_key(wedge: str, segment: Optional[Dict[str, str]]) -> str:
+    seg = ",".join(f"{k}={v}" for k, v in sorted((segment or {}).items())) or "all"
+    return f"{wedge}|{seg}"
+
+
+def load_grid(path: Optional[str]) -> Dict[str, Any]:
+    """
+    Grid spec (JSON), every key optional:
+      {"wedges": [...], "segment_by": ["role", "clinic_id"], "include_overall": true,
+       "goal": "activation", "mode": "shadow", "min_cohort_size": 1}
+    """
+    grid: Dict[str, Any] = {
+        "wedges": list(WEDGES),
+        "segment_by": ["role", "clinic_id"],
+        "include_overall": True,
+        "goal": "activation",
+        "mode": "shadow",
+        "min_cohort_size": 1,
+    }
+    if path:
+        grid.update(json.loads(Path(path).read_text()))
+    return grid
+
+
+def expand_cells(index: CohortIndex, grid: Dict[str, Any]) -> List[Dict[str, Any]]:
+    unknown = set(grid["wedges"]) - set(WEDGES)
+    if unknown:
+        raise ValueError(f"Unknown wedge(s) in grid: {sorted(unknown)}")
+    segments: List[Optional[Dict[str, str]]] = [None] if grid["include_overall"] else []
+    for col in grid["segment_by"]:
+        segments += [{col: v} for v in index.segment_values(col)]
+    return [{"wedge": w, "segment": seg, "key": cell_key(w, seg)} for w in grid["wedges"] for seg in segments]
+
+
+def completed_keys(out_path: Path) -> set:
+    """
+    Keys already written (ok or skipped). Failed cells are retried on resume;
+    a truncated trailing line from a crash is ignored.
+    """
+    done = set()
+    if not out_path.exists():
+        return done
+    for line in out_path.read_text().splitlines():
+        try:
+            rec = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if rec.get("status") in ("ok", "skipped"):
+            done.add(rec["key"])
+    return done
+
+
+def run_batch(
+    *,
+    raw_csv: bytes,
+    grid: Dict[str, Any],
+    config: AppConfig,
+    out_path: Path,
+    concurrency: int = 4,
+    log=print,
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    parsed = parse_csv_bytes(raw_csv)
+    index = CohortIndex.build(parsed.df, tuple(grid["segment_by"]))
+    cells = expand_cells(index, grid)
+    done = completed_keys(out_path)
+    todo = [c for c in cells if c["key"] not in done]
+    log(
+        f"Parsed {parsed.total_users:,} users / {parsed.total_events:,} events in "
+        f"{time.perf_counter() - started:.1f}s • {len(cells)} cells, {len(done)} already done, {len(todo)} to run"
+    )
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    write_lock = threading.Lock()
+    backend = make_backend(config)  # shared connection pool; one gateway/ledger per cell
+    counts = {"ok": 0, "skipped": 0, "error": 0}
+    run_started = time.perf_counter()
+
+    def write(rec: Dict[str, Any]):
+        with write_lock, out_path.open("a") as fh:
+            fh.write(json.dumps(rec) + "\n")
+            fh.flush()
+
+    def run_cell(cell: Dict[str, Any]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        stats = index.stats(cell["wedge"], cell["segment"])
+        rec: Dict[str, Any] = {"key": cell["key"], "wedge": cell["wedge"], "segment": cell["segment"]}
+        if stats["cohort_size"] < grid["min_cohort_size"]:
+            return {**rec, "status": "skipped", "cohort_size": stats["cohort_size"]}
+        if cell["segment"]:
+            label = ", ".join(f"{k}={v}" for k, v in cell["segment"].items())
+            stats["cohort_name"] = f"{stats['cohort_name']} ({label})"
+        try:
+            result = run_autopilot_pipeline(
+                llm=make_gateway(config, backend=backend, lane="batch"),
+                config=config,
+                stats=stats,
+                goal=grid["goal"],
+                mode=grid["mode"],
+                progress=lambda *a, **k: None,
+                started=t0,
+            )
+            rec.update(status="ok", result=result.model_dump())
+        except Exception as e:
+            rec.update(status="error", error=str(e))
+        rec["elapsed_s"] = round(time.perf_counter() - t0, 3)
+        return rec
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [pool.submit(run_cell, c) for c in todo]
+        for i, fut in enumerate(as_completed(futures), start=1):
+            rec = fut.result()
+            write(rec)
+            counts[rec["status"]] += 1
+            minutes = (time.perf_counter() - run_started) / 60
+            log(
+                f"[{i}/{len(todo)}] {rec['key']} {rec['status']} • "
+                f"{counts['ok'] / minutes if minutes else 0:.1f} flows/min"
+            )
+
+    elapsed = time.perf_counter() - run_started
+    report = {
+        "cells": len(cells),
+        "resumed": len(done),
+        **counts,
+        "elapsed_s": round(elapsed, 2),
+        "flows_per_min": round(counts["ok"] / (elapsed / 60), 2) if elapsed else 0.0,
+        "out": str(out_path),
+        "rate_limiter": get_rate_limiter(config.openai_rpm, config.openai_tpm).stats(),
+    }
+    log(json.dumps(report))
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Batch-generate lifecycle flows over wedge × segment grids.")
+    ap.add_argument("--data", required=True, help="Event log CSV")
+    ap.add_argument("--grid", help="Grid spec JSON (see load_grid)")
+    ap.add_argument("--wedges", help="Comma-separated wedges (overrides grid)")
+    ap.add_argument("--segment-by", help="Comma-separated segment columns, e.g. role,clinic_id (overrides grid)")
+    ap.add_argument("--goal", help="Goal (overrides grid)")
+    ap.add_argument("--mode", choices=["shadow", "assisted", "auto"], help="Adoption mode (overrides grid)")
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--out", default="exports/batch_flows.ndjson", help="NDJSON output (appended; resumable)")
+    ap.add_argument("--variant-library", action="store_true", help="Reuse QA-approved variants across cells")
+    args = ap.parse_args(argv)
+
+    grid = load_grid(args.grid)
+    if args.wedges:
+        grid["wedges"] = [w.strip() for w in args.wedges.split(",") if w.strip()]
+    if args.segment_by is not None:
+        grid["segment_by"] = [c.strip() for c in args.segment_by.split(",") if c.strip()]
+    if args.goal:
+        grid["goal"] = args.goal
+    if args.mode:
+        grid["mode"] = args.mode
+
+    report = run_batch(
+        raw_csv=Path(args.data).read_bytes(),
+        grid=grid,
+        config=dataclasses.replace(AppConfig.load(), variant_library=args.variant_library),
+        out_path=Path(args.out),
+        concurrency=args.concurrency,
+        log=lambda msg: print(msg, file=sys.stderr),
+    )
+    return 0 if report["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Offline end-to-end benchmark of build_autopilot_job.
+
+Record fixtures once against the live API (any run with LLM_BACKEND=record),
+then time the full pipeline with no network and reproducible latency:
+
+    python bench.py --data sample_data/heidi_events.csv --runs 50 \\
+        --latency "lognormal:p50=2500,p95=7000,seed=7"
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.config import AppConfig
+from core.metrics import HEDGING, percentile
+from core.utils import JobManager
+from agents.runner import build_autopilot_job
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "mean": round(sum(values) / len(values), 3) if values else 0.0,
+        "max": round(max(values), 3) if values else 0.0,
+    }
+
+
+def run_bench(
+    *,
+    raw_csv: bytes,
+    config: AppConfig,
+    runs: int,
+    concurrency: int = 1,
+    wedge: str = "no_consult_48h",
+    goal: str = "activation",
+    mode: str = "shadow",
+) -> Dict[str, Any]:
+    jobs = JobManager()
+    walls: List[float] = []
+    per_agent: Dict[str, List[float]] = {}
+    failures: List[str] = []
+
+    with tempfile.TemporaryDirectory() as exports_dir:
+
+        def one(_: int):
+            job_id = jobs.create_job()
+            job_fn = build_autopilot_job(
+                job_id=job_id,
+                raw_csv=raw_csv,
+                goal=goal,
+                wedge=wedge,
+                mode=mode,
+                config=config,
+                exports_dir=exports_dir,
+                jobs=jobs,
+            )
+            t0 = time.perf_counter()
+            try:
+                result = job_fn()
+            except Exception as e:
+                failures.append(str(e))
+                return
+            walls.append(time.perf_counter() - t0)
+            for agent, u in result["usage"]["by_agent"].items():
+                per_agent.setdefault(agent, []).append(u["latency_s"])
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            list(pool.map(one, range(runs)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "runs": runs,
+        "concurrency": concurrency,
+        "latency_model": config.llm_replay_latency,
+        "ok": len(walls),
+        "failed": len(failures),
+        "errors": sorted(set(failures))[:5],
+        "job_wall_s": _summary(walls),
+        "agent_latency_s": {agent: _summary(v) for agent, v in per_agent.items()},
+        "jobs_per_min": round(len(walls) / (elapsed / 60), 2) if elapsed else 0.0,
+        "hedging": HEDGING.snapshot() if config.llm_hedging else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Time the autopilot pipeline offline against recorded LLM fixtures.")
+    ap.add_argument("--data", default="sample_data/heidi_events.csv")
+    ap.add_argument("--runs", type=int, default=20)
+    ap.add_argument("--concurrency", type=int, default=1)
+    ap.add_argument("--wedge", default="no_consult_48h")
+    ap.add_argument("--fixtures", default="fixtures/llm")
+    ap.add_argument("--latency", default="lognormal:p50=2500,p95=7000,seed=7", help="none | recorded | lognormal:p50=ms,p95=ms,seed=n")
+    ap.add_argument("--strict", action="store_true", help="Fail on requests with no exact fixture")
+    ap.add_argument("--hedge", action="store_true", help="Enable hedged requests (see LLM_HEDGING)")
+    ap.add_argument("--out", help="Also write the report JSON here")
+    args = ap.parse_args(argv)
+
+    config = AppConfig(
+        openai_api_key="",
+        llm_backend="replay",
+        llm_fixtures_dir=args.fixtures,
+        llm_replay_latency=args.latency,
+        llm_replay_strict=args.strict,
+        llm_hedging=args.hedge,
+        variant_library=False,  # every run should exercise the Copywriter
+    )
+    report = run_bench(
+        raw_csv=Path(args.data).read_bytes(),
+        config=config,
+        runs=args.runs,
+        concurrency=args.concurrency,
+        wedge=args.wedge,
+    )
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text)
+    return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Import-time benchmark for the web app and worker entry points.
+
+Each run imports the module in a fresh interpreter, so the numbers are what a
+new gunicorn / worker.py process pays before it can take traffic:
+
+    python bench_imports.py --runs 7
+    python bench_imports.py --target app=1500 --target worker=500 --out import_times.json
+
+Exits 1 when a module's median import time is over its target or it pulls in
+one of the heavy dependencies that are meant to load on first use (pandas,
+the OpenAI SDK, requests). `-X importtime` from one extra run supplies the
+slowest imports for the report.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.metrics import percentile
+
+ROOT = Path(__file__).resolve().parent
+
+# median ms per entry point; generous enough for a cold CI runner
+DEFAULT_TARGETS_MS = {"app": 1500.0, "worker": 500.0}
+LAZY_MODULES = ("pandas", "openai", "requests")
+
+_TIMED = "import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    # AppConfig.load() needs a key at import; nothing here calls the API.
+    env.setdefault("OPENAI_API_KEY", "sk-import-bench")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    proc = subprocess.run([sys.executable, *args], cwd=ROOT, env=_env(), capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}")
+    return proc
+
+
+def time_import(module: str) -> float:
+    """Milliseconds to import `module` in a fresh interpreter."""
+    return float(_run(["-c", _TIMED.format(module=module)]).stdout.strip().splitlines()[-1])
+
+
+def import_profile(module: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for every import `module` triggers, from -X importtime."""
+    rows = []
+    for line in _run(["-X", "importtime", "-c", f"import {module}"]).stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cum_us, name = (part.strip() for part in line[len("import time:"):].split("|", 2))
+        if self_us.isdigit():
+            rows.append((name, int(self_us), int(cum_us)))
+    return rows
+
+
+def bench_module(module: str, *, runs: int, target_ms: float, top: int = 10) -> Dict[str, Any]:
+    times = [time_import(module) for _ in range(runs)]
+    profile = import_profile(module)
+    loaded = {name.split(".")[0] for name, _, _ in profile}
+    eager = [m for m in LAZY_MODULES if m in loaded]
+    median = percentile(times, 50)
+    return {
+        "module": module,
+        "runs": runs,
+        "median_ms": round(median, 1),
+        "min_ms": round(min(times), 1),
+        "max_ms": round(max(times), 1),
+        "target_ms": target_ms,
+        "eager_heavy_imports": eager,
+        "slowest": [
+            {"module": name, "cumulative_ms": round(cum / 1000, 1), "self_ms": round(self_us / 1000, 1)}
+            for name, self_us, cum in sorted(profile, key=lambda r: r[2], reverse=True)[:top]
+        ],
+        "ok": median <= target_ms and not eager,
+    }
+
+
+def _parse_target(value: str) -> Tuple[str, float]:
+    module, _, ms = value.partition("=")
+    if not module or not ms:
+        raise argparse.ArgumentTypeError(f"Expected module=ms, got {value!r}")
+    return module, float(ms)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Track cold-start import time of the app and worker entry points.")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--target", type=_parse_target, action="append", default=[], help="module=ms (default: app=1500, worker=500)")
+    ap.add_argument("--top", type=int, default=10, help="Slowest imports to list per module")
+    ap.add_argument("--out", help="Also write the report JSON here")
+    args = ap.parse_args(argv)
+
+    targets = dict(args.target) or dict(DEFAULT_TARGETS_MS)
+    results = [bench_module(m, runs=args.runs, target_ms=ms, top=args.top) for m, ms in targets.items()]
+    report = {"python": sys.version.split()[0], "results": results, "ok": all(r["ok"] for r in results)}
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text)
+    for r in results:
+        if r["eager_heavy_imports"]:
+            print(f"{r['module']}: imports {', '.join(r['eager_heavy_imports'])} at start-up", file=sys.stderr)
+        if r["median_ms"] > r["target_ms"]:
+            print(f"{r['module']}: median {r['median_ms']} ms over target {r['target_ms']} ms", file=sys.stderr)
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
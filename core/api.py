@@ -0,0 +1,163 @@
+"""
+JSON API for orchestration systems, mounted on the Dash Flask server.
+
+    POST   /api/v1/jobs                  {"dataset", "wedge", "goal", "mode", "profile"} -> 202
+    GET    /api/v1/jobs/<job_id>         status, queue position, progress
+    GET    /api/v1/jobs/<job_id>/events  live progress (server-sent events)
+    GET    /api/v1/jobs/<job_id>/result  AutopilotResult (409 until done)
+    GET    /api/v1/jobs/<job_id>/deploy  deploy payload only
+    DELETE /api/v1/jobs/<job_id>         cancel
+
+Jobs go through the same job store and scheduler as the UI, always at batch
+priority, so API traffic queues behind interactive runs and a full queue
+answers 429. `dataset` is a CSV path under API_DATASETS_DIR; nothing outside
+that directory is readable. Every request needs `Authorization: Bearer
+<API_TOKEN>`; without API_TOKEN the API is not mounted at all.
+"""
+
+from __future__ import annotations
+
+import hmac
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from flask import Blueprint, Flask, jsonify, request
+
+from core.config import AppConfig
+from agents.runner import launch_autopilot_job
+
+if TYPE_CHECKING:
+    from core.schemas import JobView
+
+
+def _error(status: int, message: str, **extra: Any):
+    return jsonify({"error": message, **extra}), status
+
+
+def resolve_dataset(root: Path, name: str) -> Optional[Path]:
+    """CSV under `root`, or None (missing, not a .csv, or escaping the directory)."""
+    root = root.resolve()
+    path = (root / name).resolve()
+    if not path.is_relative_to(root) or path.suffix.lower() != ".csv" or not path.is_file():
+        return None
+    return path
+
+
+def job_view(job) -> JobView:
+    from core.schemas import JobView
+
+    errors = [e["text"] for e in job.progress if e.get("kind") == "error"]
+    base = f"/api/v1/jobs/{job.job_id}"
+    links = {"self": base, "events": f"{base}/events"}
+    if job.done and job.result is not None:
+        links.update(result=f"{base}/result", deploy=f"{base}/deploy")
+    return JobView(
+        job_id=job.job_id,
+        state=job.state,
+        done=job.done,
+        cancelled=job.cancelled,
+        error=errors[-1] if errors else None,
+        queue_position=job.queue_position,
+        eta_s=job.eta_s,
+        progress=[e["text"] for e in job.progress],
+        links=links,
+    )
+
+
+def register_api(server: Flask, jobs: Any, config: AppConfig, exports_dir: str, events: Optional[Callable[[str], Any]] = None):
+    """
+    Mount /api/v1 on `server` (None when API_TOKEN is unset). `events` is the
+    SSE view from register_sse, served again behind the token check.
+    """
+    if not config.api_token:
+        return None
+    api = Blueprint("api_v1", __name__, url_prefix="/api/v1")
+    datasets = Path(config.api_datasets_dir)
+
+    @api.before_request
+    def authenticate():
+        header = request.headers.get("Authorization", "")
+        token = header[7:] if header.startswith("Bearer ") else ""
+        if not hmac.compare_digest(token.encode(), config.api_token.encode()):
+            return _error(401, "Missing or invalid bearer token.")
+        return None
+
+    @api.post("/jobs")
+    def submit_job():
+        from pydantic import ValidationError
+
+        from core.schemas import JobRequest
+
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return _error(400, "Expected a JSON object body.")
+        try:
+            req = JobRequest.model_validate(body)
+        except ValidationError as e:
+            return _error(400, "Invalid job request.", details=json.loads(e.json(include_url=False)))
+        path = resolve_dataset(datasets, req.dataset)
+        if path is None:
+            return _error(404, f"Dataset not found: {req.dataset}")
+
+        job_id, admitted = launch_autopilot_job(
+            jobs=jobs,
+            config=config,
+            raw_csv=path.read_bytes(),
+            goal=req.goal,
+            wedge=req.wedge,
+            mode=req.mode,
+            exports_dir=exports_dir,
+            priority="batch",
+            profile=req.profile,
+        )
+        job = jobs.get(job_id)
+        view = job_view(job).model_dump() if job else {"job_id": job_id}
+        if not admitted:
+            return _error(429, view.get("error") or "Job queue is full; retry later.", job=view)
+        return jsonify(view), 202, {"Location": f"/api/v1/jobs/{job_id}"}
+
+    @api.get("/jobs/<job_id>")
+    def job_status(job_id: str):
+        job = jobs.get(job_id)
+        if job is None:
+            return _error(404, f"Unknown job: {job_id}")
+        return jsonify(job_view(job).model_dump())
+
+    @api.get("/jobs/<job_id>/events")
+    def job_events(job_id: str):
+        if events is None:
+            return _error(404, "Live progress is not available; poll the job instead.")
+        if jobs.get(job_id) is None:
+            return _error(404, f"Unknown job: {job_id}")
+        return events(job_id)
+
+    def finished(job_id: str):
+        job = jobs.get(job_id)
+        if job is None:
+            return None, _error(404, f"Unknown job: {job_id}")
+        if not job.done or job.result is None:
+            view = job_view(job)
+            return None, _error(409, view.error or "Job has no result yet.", job=view.model_dump())
+        return job.result, None
+
+    @api.get("/jobs/<job_id>/result")
+    def job_result(job_id: str):
+        result, err = finished(job_id)
+        return err or jsonify(result)
+
+    @api.get("/jobs/<job_id>/deploy")
+    def job_deploy(job_id: str):
+        result, err = finished(job_id)
+        return err or jsonify(result.get("deploy_payload") or {})
+
+    @api.delete("/jobs/<job_id>")
+    def cancel_job(job_id: str):
+        if jobs.get(job_id) is None:
+            return _error(404, f"Unknown job: {job_id}")
+        if not jobs.cancel(job_id, reason="Cancelled via API"):
+            return _error(409, "Job already finished.")
+        return jsonify(job_view(jobs.get(job_id)).model_dump()), 202
+
+    server.register_blueprint(api)
+    return api
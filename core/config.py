@@ -4,6 +4,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+QA_STRATEGIES = ("sequential", "best_of_n")
+
 
 @dataclass(frozen=True)
 class AppConfig:
@@ -12,13 +14,123 @@ class AppConfig:
     model_fast: str = "gpt-4o-mini"
     model_quality: str = "gpt-4o-mini"  # can upgrade to "gpt-4o" if you want
     slack_webhook_url: str | None = None
+    # LLM gateway: per-call timeout and attempts (repairs + transient retries)
+    llm_timeout_s: float = 45.0
+    llm_max_attempts: int = 3
+    # Provider limits shared by every agent call in this process
+    openai_rpm: int = 500
+    openai_tpm: int = 200_000
+    # LLM backend: "openai" (live), "record" (live + save fixtures), "replay" (offline), "stub" (canned, load tests)
+    llm_backend: str = "openai"
+    llm_fixtures_dir: str = "fixtures/llm"
+    llm_replay_latency: str = "recorded"
+    llm_replay_strict: bool = False  # False: unmatched requests reuse a fixture of the same agent
+    # Draft copy against the wedge's default sequence while Flow Architect runs
+    # (off by default: every miss is a wasted Copywriter call)
+    speculative_copy: bool = False
+    speculation_tolerance_h: float = 12.0
+    # Local pre-QA decides confident pass/fail; the LLM judge only sees borderline copy
+    local_qa: bool = True
+    # QA strategy: "sequential" (regenerate up to 2x) or "best_of_n" (N concurrent candidates)
+    qa_strategy: str = "sequential"
+    best_of_n: int = 3
+    qa_latency_budget_s: float = 30.0
+    # Reuse QA-approved variants across jobs (SQLite library); off by default
+    variant_library: bool = False
+    variant_library_path: str = "exports/variant_library.sqlite3"
+    # Job deadlines (seconds): whole job and each agent stage
+    job_timeout_s: float = 300.0
+    stage_timeout_s: float = 120.0
+    # Job retention: max jobs kept, TTL after completion, results held in memory (rest spilled to disk)
+    jobs_max: int = 200
+    jobs_ttl_s: float = 3600.0
+    jobs_memory_mb: float = 64.0
+    jobs_spill_dir: str = "exports/jobs"
+    # Job store: "memory" (jobs run in the web process) or "sqlite" (shared store; run worker.py)
+    job_store: str = "memory"
+    job_store_path: str = "exports/jobs.sqlite3"
+    # Scheduler: concurrent pipelines per process and jobs allowed to wait (admission control)
+    job_workers: int = 4
+    job_queue_max: int = 32
+    # Server-sent progress streams open at once per web process (beyond this, clients poll);
+    # the lower cap applies without gevent, where each open stream holds a thread
+    sse_max_streams: int = 500
+    sse_max_thread_streams: int = 32
+    # Per-job Chrome/Perfetto traces in exports/: share of jobs sampled, plus any job slower than trace_slow_s (0 = off)
+    trace_sample_rate: float = 0.0
+    trace_slow_s: float = 0.0
+    # Profile parse / wedge stats of every job (cProfile + tracemalloc into exports/); jobs can also opt in
+    profile_jobs: bool = False
+    profile_top_n: int = 5
+    # REST API (/api/v1): bearer token (the API is off without one); datasets are CSVs under this directory
+    api_token: str | None = None
+    api_datasets_dir: str = "sample_data"
+    # Hedged requests for idempotent agents: duplicate after the observed p90, first reply wins
+    llm_hedging: bool = False
+    hedge_agents: str = "cohort_detective,flow_architect,evaluator,explain"
+    hedge_quantile: float = 90.0
+    hedge_max_ratio: float = 0.1  # max duplicates as a share of that agent's requests
+    # Adaptive routing: per-agent model from this pool (comma-separated; empty = static models above)
+    model_pool: str = ""
+    model_strong: str = "gpt-4o"  # Copywriter escalation target
+    agent_slos_s: str = ""  # e.g. "copywriter=20,evaluator=6" (defaults in core/routing.py)
+    copy_escalate_p: float = 0.5  # escalate when P(regeneration) on the base model reaches this
 
     @staticmethod
     def load() -> "AppConfig":
         key = os.getenv("OPENAI_API_KEY", "").strip()
-        if not key:
+        backend = os.getenv("LLM_BACKEND", "openai").strip().lower()
+        if not key and backend not in ("replay", "stub"):
             raise RuntimeError(
                 "OPENAI_API_KEY is not set. Create a .env file from .env.example and add your key."
             )
         slack = os.getenv("SLACK_WEBHOOK_URL", "").strip() or None
-        return AppConfig(openai_api_key=key, slack_webhook_url=slack)
+        qa_strategy = os.getenv("QA_STRATEGY", "sequential").strip().lower()
+        if qa_strategy not in QA_STRATEGIES:
+            raise ValueError(f"Unknown QA_STRATEGY: {qa_strategy} (expected one of {', '.join(QA_STRATEGIES)})")
+        return AppConfig(
+            openai_api_key=key,
+            slack_webhook_url=slack,
+            llm_timeout_s=float(os.getenv("LLM_TIMEOUT_S", "45")),
+            llm_max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "3")),
+            openai_rpm=int(os.getenv("OPENAI_RPM", "500")),
+            openai_tpm=int(os.getenv("OPENAI_TPM", "200000")),
+            llm_backend=backend,
+            llm_fixtures_dir=os.getenv("LLM_FIXTURES_DIR", "fixtures/llm"),
+            llm_replay_latency=os.getenv("LLM_REPLAY_LATENCY", "recorded"),
+            llm_replay_strict=os.getenv("LLM_REPLAY_STRICT", "0") == "1",
+            speculative_copy=os.getenv("SPECULATIVE_COPY", "0") == "1",
+            speculation_tolerance_h=float(os.getenv("SPECULATION_TOLERANCE_H", "12")),
+            local_qa=os.getenv("LOCAL_QA", "1") == "1",
+            qa_strategy=qa_strategy,
+            best_of_n=max(1, int(os.getenv("QA_BEST_OF_N", "3"))),
+            qa_latency_budget_s=float(os.getenv("QA_LATENCY_BUDGET_S", "30")),
+            variant_library=os.getenv("VARIANT_LIBRARY", "0") == "1",
+            variant_library_path=os.getenv("VARIANT_LIBRARY_PATH", "exports/variant_library.sqlite3"),
+            job_timeout_s=float(os.getenv("JOB_TIMEOUT_S", "300")),
+            stage_timeout_s=float(os.getenv("STAGE_TIMEOUT_S", "120")),
+            jobs_max=int(os.getenv("JOBS_MAX", "200")),
+            jobs_ttl_s=float(os.getenv("JOBS_TTL_S", "3600")),
+            jobs_memory_mb=float(os.getenv("JOBS_MEMORY_MB", "64")),
+            jobs_spill_dir=os.getenv("JOBS_SPILL_DIR", "exports/jobs"),
+            job_store=os.getenv("JOB_STORE", "memory").strip().lower(),
+            job_store_path=os.getenv("JOB_STORE_PATH", "exports/jobs.sqlite3"),
+            job_workers=max(1, int(os.getenv("JOB_WORKERS", "4"))),
+            job_queue_max=max(1, int(os.getenv("JOB_QUEUE_MAX", "32"))),
+            sse_max_streams=int(os.getenv("SSE_MAX_STREAMS", "500")),
+            sse_max_thread_streams=int(os.getenv("SSE_MAX_THREAD_STREAMS", "32")),
+            trace_sample_rate=min(1.0, max(0.0, float(os.getenv("TRACE_SAMPLE_RATE", "0")))),
+            trace_slow_s=float(os.getenv("TRACE_SLOW_S", "0")),
+            profile_jobs=os.getenv("PROFILE_JOBS", "0") == "1",
+            profile_top_n=max(1, int(os.getenv("PROFILE_TOP_N", "5"))),
+            api_token=os.getenv("API_TOKEN", "").strip() or None,
+            api_datasets_dir=os.getenv("API_DATASETS_DIR", "sample_data"),
+            llm_hedging=os.getenv("LLM_HEDGING", "0") == "1",
+            hedge_agents=os.getenv("HEDGE_AGENTS", "cohort_detective,flow_architect,evaluator,explain"),
+            hedge_quantile=float(os.getenv("HEDGE_QUANTILE", "90")),
+            hedge_max_ratio=float(os.getenv("HEDGE_MAX_RATIO", "0.1")),
+            model_pool=os.getenv("MODEL_POOL", "").strip(),
+            model_strong=os.getenv("MODEL_STRONG", "gpt-4o").strip(),
+            agent_slos_s=os.getenv("AGENT_SLOS_S", "").strip(),
+            copy_escalate_p=float(os.getenv("COPY_ESCALATE_P", "0.5")),
+        )
@@ -3,7 +3,7 @@ from __future__ import annotations
 import io
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 
@@ -46,71 +46,121 @@ def parse_csv_bytes(raw_csv: bytes) -> ParsedEvents:
     return ParsedEvents(df=df, total_users=total_users, total_events=total_events)
 
 
+# Wedge definitions: start event(s) (first match wins), the event that should
+# follow, and the window after which a missing follow-up counts as drop-off.
+# `trigger` / `default_sequence` (t_plus, channel, goal, cta) are the likely flow
+# for the wedge, on the default T+48h/T+60h/T+96h timing; speculative copy is
+# drafted against it (Flow Architect never sees it).
+WEDGES: Dict[str, Dict] = {
+    "no_consult_48h": {
+        "start": ("signup_completed", "email_verified"),
+        "expected": "consult_created",
+        "window": timedelta(hours=48),
+        "cohort_name": "No first consult created within 48h",
+        "urgency": "High",
+        "trigger": "signup_completed and no consult_created within 48h",
+        "default_sequence": (
+            ("T+48h", "email", "Remove setup friction", "Create your first consult"),
+            ("T+60h", "sms", "Short reminder", "Finish setup"),
+            ("T+96h", "in_app", "Gentle safety net with help", "Get help setting up"),
+        ),
+    },
+    "note_not_finalized_2h": {
+        "start": ("consult_completed",),
+        "expected": "note_finalized",
+        "window": timedelta(hours=2),
+        "cohort_name": "Consult completed but note not finalized within 2h",
+        "urgency": "Medium",
+        "trigger": "consult_completed and no note_finalized within 2h",
+        "default_sequence": (
+            ("T+48h", "email", "Bring the draft note back into view", "Review your note"),
+            ("T+60h", "sms", "Short reminder", "Finalize your note"),
+            ("T+96h", "in_app", "Show how quick review and sign-off is", "See how to finalize"),
+        ),
+    },
+    "followup_not_booked_14d": {
+        "start": ("followup_due",),
+        "expected": "followup_booked",
+        "window": timedelta(days=14),
+        "cohort_name": "Follow-up due but not booked within 14 days",
+        "urgency": "Medium",
+        "trigger": "followup_due and no followup_booked within 14 days",
+        "default_sequence": (
+            ("T+48h", "email", "Make booking the follow-up easy", "Book the follow-up"),
+            ("T+60h", "sms", "Short reminder", "Book now"),
+            ("T+96h", "in_app", "Offer help with scheduling", "Get help booking"),
+        ),
+    },
+}
+
+
+@dataclass(frozen=True)
+class CohortIndex:
+    """
+    One analytics pass over the event log: first timestamp per (user, event)
+    plus per-user segment attributes. All wedge/segment cohorts are cheap
+    boolean masks over this.
+    """
+    first_times: pd.DataFrame  # index=user_id, columns=event_name
+    attributes: pd.DataFrame  # index=user_id, columns=segment cols (first value seen)
+    max_ts: pd.Timestamp
+
+    @staticmethod
+    def build(df: pd.DataFrame, segment_cols: Tuple[str, ...] = ()) -> "CohortIndex":
+        first_times = df.groupby(["user_id", "event_name"])["timestamp"].min().unstack("event_name")
+        cols = [c for c in segment_cols if c in df.columns]
+        attributes = df.groupby("user_id")[cols].first().astype(str) if cols else pd.DataFrame(index=first_times.index)
+        return CohortIndex(first_times=first_times, attributes=attributes, max_ts=df["timestamp"].max())
+
+    def _event(self, event: str) -> pd.Series:
+        if event in self.first_times.columns:
+            return self.first_times[event]
+        return pd.Series(pd.NaT, index=self.first_times.index, dtype="datetime64[ns, UTC]")
+
+    def cohort_mask(self, wedge: str) -> pd.Series:
+        spec = WEDGES.get(wedge)
+        if spec is None:
+            raise ValueError(f"Unknown wedge: {wedge}")
+        t_start = self._event(spec["start"][0])
+        for alt in spec["start"][1:]:
+            t_start = t_start.fillna(self._event(alt))
+        return t_start.notna() & self._event(spec["expected"]).isna() & ((t_start + spec["window"]) < self.max_ts)
+
+    def segment_values(self, col: str) -> List[str]:
+        if col not in self.attributes.columns:
+            return []
+        return sorted(self.attributes[col].dropna().unique().tolist())
+
+    def stats(self, wedge: str, segment: Optional[Dict[str, str]] = None) -> Dict:
+        in_cohort = self.cohort_mask(wedge)
+        population = pd.Series(True, index=in_cohort.index)
+        for col, value in (segment or {}).items():
+            population &= self.attributes[col] == value
+        cohort = in_cohort[in_cohort & population].index.tolist()
+
+        spec = WEDGES[wedge]
+        total_users = int(population.sum())
+        size = len(cohort)
+        rate = (size / total_users) if total_users else 0.0
+        out = {
+            "wedge": wedge,
+            "cohort_name": spec["cohort_name"],
+            "cohort_size": size,
+            "total_users": total_users,
+            "dropoff_rate": f"{round(rate * 100)}%",
+            "urgency_hint": spec["urgency"],
+            "cohort_user_ids": cohort[:500],  # keep bounded
+        }
+        if segment:
+            out["segment"] = dict(segment)
+        return out
+
+
 def wedge_stats(df: pd.DataFrame, wedge: str) -> Dict:
     """
     Compute cohort size / rate for a selected wedge.
     Wedges are intentionally Heidi-ish: consult/note/follow-up.
     """
-    users = df["user_id"].unique().tolist()
-    total_users = len(users)
-
-    # helpful helpers
-    def has_event(u: str, event: str) -> bool:
-        return (df[(df["user_id"] == u) & (df["event_name"] == event)].shape[0]) > 0
-
-    def first_time(u: str, event: str):
-        sub = df[(df["user_id"] == u) & (df["event_name"] == event)]
-        if sub.empty:
-            return None
-        return sub["timestamp"].min().to_pydatetime()
-
-    cohort = []
-
-    if wedge == "no_consult_48h":
-        for u in users:
-            t_signup = first_time(u, "signup_completed") or first_time(u, "email_verified")
-            if not t_signup:
-                continue
-            t_consult = first_time(u, "consult_created")
-            if not t_consult and (t_signup + timedelta(hours=48)) < df["timestamp"].max().to_pydatetime():
-                cohort.append(u)
-
-        cohort_name = "No first consult created within 48h"
-        urgency = "High"
-
-    elif wedge == "note_not_finalized_2h":
-        for u in users:
-            t_consult_done = first_time(u, "consult_completed")
-            if not t_consult_done:
-                continue
-            t_note_final = first_time(u, "note_finalized")
-            if not t_note_final and (t_consult_done + timedelta(hours=2)) < df["timestamp"].max().to_pydatetime():
-                cohort.append(u)
-        cohort_name = "Consult completed but note not finalized within 2h"
-        urgency = "Medium"
-
-    elif wedge == "followup_not_booked_14d":
-        for u in users:
-            t_due = first_time(u, "followup_due")
-            if not t_due:
-                continue
-            t_booked = first_time(u, "followup_booked")
-            if not t_booked and (t_due + timedelta(days=14)) < df["timestamp"].max().to_pydatetime():
-                cohort.append(u)
-        cohort_name = "Follow-up due but not booked within 14 days"
-        urgency = "Medium"
-
-    else:
+    if wedge not in WEDGES:
         raise ValueError(f"Unknown wedge: {wedge}")
-
-    size = len(set(cohort))
-    rate = (size / total_users) if total_users else 0.0
-    return {
-        "wedge": wedge,
-        "cohort_name": cohort_name,
-        "cohort_size": size,
-        "total_users": total_users,
-        "dropoff_rate": f"{round(rate * 100)}%",
-        "urgency_hint": urgency,
-        "cohort_user_ids": cohort[:500],  # keep bounded
-    }
+    return CohortIndex.build(df).stats(wedge)
@@ -0,0 +1,383 @@
+"""
+Job store shared by several processes (SQLite in WAL mode).
+
+Web workers enqueue jobs and read progress/results; execution workers
+(worker.py) claim queued jobs, run them and write progress back. Exposes the
+same methods the UI and build_autopilot_job use on the in-process JobManager,
+so either can back the app.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from core.ratelimit import LANES
+from core.telemetry import JOB_SECONDS, JOBS, QUEUE_WAIT_SECONDS
+from core.utils import CancelToken, JobCancelled, JobStatus, ProgressDelta
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    session_id TEXT,
+    state TEXT NOT NULL DEFAULT 'created',  -- created | queued | running | done | error | cancelled
+    priority INTEGER NOT NULL DEFAULT 0,  -- index into LANES (0 = interactive)
+    spec TEXT,
+    payload BLOB,
+    result BLOB,
+    result_bytes INTEGER NOT NULL DEFAULT 0,
+    cancel_reason TEXT,
+    worker_id TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (state, priority, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_session ON jobs (session_id, state);
+CREATE TABLE IF NOT EXISTS job_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    kind TEXT NOT NULL DEFAULT 'info'
+);
+CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events (job_id, seq);
+"""
+
+_FINISHED = ("done", "error", "cancelled")
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class SQLiteJobStore:
+    def __init__(
+        self,
+        path: str,
+        *,
+        job_timeout_s: Optional[float] = None,
+        max_jobs: int = 200,
+        ttl_s: float = 3600.0,
+        max_progress: int = 200,
+        stale_after_s: float = 30.0,
+        max_queue: int = 32,
+    ):
+        self.path = Path(path)
+        self.job_timeout_s = job_timeout_s
+        self.max_jobs = max_jobs
+        self.ttl_s = ttl_s
+        self.max_progress = max_progress
+        self.stale_after_s = stale_after_s
+        self.max_queue = max(1, max_queue)
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._ready = False
+        self._tokens: Dict[str, CancelToken] = {}  # jobs executing in this process
+        self._tokens_lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread; autocommit, explicit BEGIN IMMEDIATE where atomicity matters
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            with self._init_lock:
+                if not self._ready:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    columns = {r[1] for r in conn.execute("PRAGMA table_info(jobs)")}
+                    if columns and "priority" not in columns:  # store created before priorities
+                        conn.execute("ALTER TABLE jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+                    conn.executescript(_SCHEMA)
+                    self._ready = True
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---- JobManager interface (web side) ----
+
+    def create_job(self, session_id: Optional[str] = None) -> str:
+        """
+        New job; unfinished jobs from the same session are asked to cancel.
+        """
+        job_id = uuid.uuid4().hex[:10]
+        self._evict()
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO jobs (job_id, session_id, created_at) VALUES (?, ?, ?)", (job_id, session_id, time.time())
+        )
+        if session_id:
+            rows = conn.execute(
+                "SELECT job_id FROM jobs WHERE session_id = ? AND job_id != ? AND state NOT IN (?, ?, ?)",
+                (session_id, job_id, *_FINISHED),
+            ).fetchall()
+            for row in rows:
+                self.cancel(row["job_id"], "Superseded by a newer run")
+        return job_id
+
+    def enqueue(self, job_id: str, spec: Dict[str, Any], payload: bytes = b"", priority: str = "interactive") -> bool:
+        """
+        Hand a job to the execution workers (spec: JSON-able job args, payload:
+        the raw CSV). Same admission control as JobManager.run: False (and the
+        job fails as busy) once `max_queue` jobs wait, half that for batch.
+        """
+        if priority not in LANES:
+            raise ValueError(f"Unknown priority: {priority}")
+        conn = self._conn()
+        limit = self.max_queue if priority == "interactive" else self.max_queue // 2
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            waiting = conn.execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued'").fetchone()[0]
+            if waiting < limit:
+                conn.execute(
+                    "UPDATE jobs SET state = 'queued', priority = ?, spec = ?, payload = ? WHERE job_id = ?",
+                    (LANES.index(priority), json.dumps(spec), payload, job_id),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if waiting >= limit:
+            JOBS.inc(outcome="rejected")
+            self.set_error(job_id, f"Busy: {waiting} runs already queued. Try again in a minute.")
+            return False
+        return True
+
+    def _queue_eta(self, conn: sqlite3.Connection, job_id: str) -> Tuple[int, float]:
+        ahead = conn.execute(
+            """
+            SELECT COUNT(*) FROM jobs q, jobs me WHERE me.job_id = ? AND q.state = 'queued'
+              AND (q.priority < me.priority OR (q.priority = me.priority AND q.created_at < me.created_at))
+            """,
+            (job_id,),
+        ).fetchone()[0]
+        row = conn.execute(
+            """
+            SELECT (SELECT COUNT(*) FROM jobs WHERE state = 'running') AS running,
+                   (SELECT AVG(finished_at - started_at) FROM (
+                        SELECT finished_at, started_at FROM jobs WHERE state = 'done'
+                        ORDER BY finished_at DESC LIMIT 50)) AS avg_s
+            """
+        ).fetchone()
+        slots, avg = max(1, row["running"]), row["avg_s"] or 30.0
+        position = ahead + 1
+        return position, round(avg * (math.ceil(position / slots) - 0.5), 1)
+
+    def cancel(self, job_id: str, reason: str = "Cancelled by user") -> bool:
+        conn = self._conn()
+        cur = conn.execute(
+            "UPDATE jobs SET cancel_reason = ? WHERE job_id = ? AND cancel_reason IS NULL AND state NOT IN (?, ?, ?)",
+            (reason, job_id, *_FINISHED),
+        )
+        if not cur.rowcount:
+            return False
+        # a job nobody has claimed yet is cancelled right away
+        queued = conn.execute(
+            "UPDATE jobs SET state = 'cancelled', payload = NULL, finished_at = ? WHERE job_id = ? AND state IN ('created', 'queued')",
+            (time.time(), job_id),
+        ).rowcount
+        self.update(job_id, f"⨯ Cancelled: {reason}" if queued else f"⨯ Cancelling: {reason}…", kind="error")
+        self._sync_token(job_id, reason)
+        return True
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT job_id, session_id, state, priority, result FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        events = conn.execute(
+            "SELECT seq, text, done, kind FROM job_events WHERE job_id = ? ORDER BY seq", (job_id,)
+        ).fetchall()
+        if len(events) > self.max_progress:
+            events = events[:1] + events[-(self.max_progress - 1) :]  # job start + most recent
+        position, eta = self._queue_eta(conn, job_id) if row["state"] == "queued" else (None, None)
+        return JobStatus(
+            job_id=row["job_id"],
+            session_id=row["session_id"],
+            state="done" if row["state"] in _FINISHED else row["state"],
+            priority=LANES[row["priority"]],
+            queue_position=position,
+            eta_s=eta,
+            done=row["state"] in _FINISHED,
+            cancelled=row["state"] == "cancelled",
+            result=json.loads(gzip.decompress(row["result"])) if row["result"] else None,
+            progress=[{"seq": e["seq"], "text": e["text"], "done": bool(e["done"]), "kind": e["kind"]} for e in events],
+        )
+
+    def progress_since(self, job_id: str, cursor: int = 0) -> Optional[ProgressDelta]:
+        """Events after `cursor` (seq is store-wide, so cursors only move forward); no result."""
+        conn = self._conn()
+        row = conn.execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        events = conn.execute(
+            "SELECT seq, text, done, kind FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, cursor)
+        ).fetchall()
+        position, eta = self._queue_eta(conn, job_id) if row["state"] == "queued" else (None, None)
+        return ProgressDelta(
+            events=[{"seq": e["seq"], "text": e["text"], "done": bool(e["done"]), "kind": e["kind"]} for e in events],
+            cursor=events[-1]["seq"] if events else cursor,
+            done=row["state"] in _FINISHED,
+            state="done" if row["state"] in _FINISHED else row["state"],
+            cancelled=row["state"] == "cancelled",
+            queue_position=position,
+            eta_s=eta,
+        )
+
+    def wait_progress(
+        self, job_id: str, cursor: int = 0, timeout: float = 15.0, poll_s: float = 0.5
+    ) -> Optional[ProgressDelta]:
+        """Like JobManager.wait_progress; other processes write here, so it polls the (indexed) events table."""
+        deadline = time.monotonic() + timeout
+        seen = None
+        while True:
+            delta = self.progress_since(job_id, cursor)
+            if delta is None or delta.done or delta.events or time.monotonic() >= deadline:
+                return delta
+            queue = (delta.state, delta.queue_position)
+            if seen is not None and queue != seen:
+                return delta  # started, or moved up in the queue
+            seen = queue
+            time.sleep(min(poll_s, max(0.0, deadline - time.monotonic())))
+
+    def stats(self) -> Dict[str, Any]:
+        rows = self._conn().execute(
+            "SELECT state, COUNT(*) AS n, SUM(result_bytes) AS result_bytes, SUM(LENGTH(payload)) AS payload_bytes "
+            "FROM jobs GROUP BY state"
+        ).fetchall()
+        return {r["state"]: {"jobs": r["n"], "result_bytes": r["result_bytes"] or 0, "payload_bytes": r["payload_bytes"] or 0} for r in rows}
+
+    def counts(self) -> Dict[str, int]:
+        """Jobs waiting for a worker / running now, across all processes (read by the /metrics gauges)."""
+        rows = self._conn().execute(
+            "SELECT state, COUNT(*) AS n FROM jobs WHERE state IN ('queued', 'running') GROUP BY state"
+        ).fetchall()
+        counts = {"queued": 0, "running": 0}
+        counts.update({r["state"]: r["n"] for r in rows})
+        return counts
+
+    # ---- progress / results (worker side) ----
+
+    def update(self, job_id: str, text: str, done: bool = False, kind: str = "info"):
+        self._conn().execute(
+            "INSERT INTO job_events (job_id, text, done, kind) VALUES (?, ?, ?, ?)", (job_id, text, int(done), kind)
+        )
+
+    def set_result(self, job_id: str, result: Dict[str, Any]):
+        blob = gzip.compress(json.dumps(result, separators=(",", ":"), default=str).encode(), compresslevel=5)
+        self._finish(job_id, "done", result=blob)
+
+    def set_error(self, job_id: str, text: str, cancelled: bool = False):
+        self.update(job_id, text, done=False, kind="error")
+        self._finish(job_id, "cancelled" if cancelled else "error")
+
+    def _finish(self, job_id: str, state: str, result: Optional[bytes] = None):
+        self._conn().execute(
+            "UPDATE jobs SET state = ?, result = ?, result_bytes = ?, payload = NULL, finished_at = ? WHERE job_id = ?",
+            (state, result, len(result or b""), time.time(), job_id),
+        )
+        with self._tokens_lock:
+            self._tokens.pop(job_id, None)
+
+    def token(self, job_id: str) -> Optional[CancelToken]:
+        with self._tokens_lock:
+            return self._tokens.get(job_id)
+
+    def _sync_token(self, job_id: str, reason: str):
+        token = self.token(job_id)
+        if token is not None:
+            token.cancel(reason)
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the oldest queued job. Returns {job_id, spec, payload} or None.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT job_id, spec, payload, created_at FROM jobs WHERE state = 'queued' ORDER BY priority, created_at LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                now = time.time()
+                conn.execute(
+                    "UPDATE jobs SET state = 'running', worker_id = ?, started_at = ?, heartbeat_at = ? WHERE job_id = ?",
+                    (worker, now, now, row["job_id"]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        QUEUE_WAIT_SECONDS.observe(now - row["created_at"])
+        with self._tokens_lock:
+            self._tokens[row["job_id"]] = CancelToken(self.job_timeout_s)
+        return {"job_id": row["job_id"], "spec": json.loads(row["spec"] or "{}"), "payload": row["payload"] or b""}
+
+    def execute(self, job_id: str, fn: Callable[[], Dict[str, Any]]):
+        """Run a claimed job to completion in the calling thread (same outcomes as JobManager.run)."""
+        started = time.perf_counter()
+        outcome = "done"
+        try:
+            self.set_result(job_id, fn())
+        except JobCancelled as e:
+            outcome = "cancelled"
+            self.set_error(job_id, f"⨯ Cancelled: {e}", cancelled=True)
+        except Exception as e:
+            outcome = "error"
+            self.set_error(job_id, f"Error: {e}")
+        JOBS.inc(outcome=outcome)
+        JOB_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+
+    def heartbeat(self, worker: str):
+        """
+        Keep this worker's running jobs alive, pass cancellations on to their
+        tokens, and fail jobs whose worker stopped heartbeating.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE worker_id = ? AND state = 'running'", (now, worker))
+        with self._tokens_lock:
+            running = list(self._tokens)
+        if running:
+            marks = ",".join("?" * len(running))
+            for row in conn.execute(
+                f"SELECT job_id, cancel_reason FROM jobs WHERE cancel_reason IS NOT NULL AND job_id IN ({marks})", running
+            ).fetchall():
+                self._sync_token(row["job_id"], row["cancel_reason"])
+        stale = conn.execute(
+            "SELECT job_id FROM jobs WHERE state = 'running' AND heartbeat_at < ?", (now - self.stale_after_s,)
+        ).fetchall()
+        for row in stale:
+            self.set_error(row["job_id"], "Error: worker stopped responding")
+
+    def _evict(self):
+        conn = self._conn()
+        conn.execute(
+            "DELETE FROM jobs WHERE state IN (?, ?, ?) AND finished_at < ?", (*_FINISHED, time.time() - self.ttl_s)
+        )
+        conn.execute(
+            """
+            DELETE FROM jobs WHERE job_id IN (
+                SELECT job_id FROM jobs WHERE state IN (?, ?, ?)
+                ORDER BY finished_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (*_FINISHED, self.max_jobs),
+        )
+        conn.execute("DELETE FROM job_events WHERE job_id NOT IN (SELECT job_id FROM jobs)")
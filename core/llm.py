@@ -0,0 +1,360 @@
+"""
+Single gateway for every agent LLM call.
+
+Agents describe *what* they need (system prompt, user content, target schema);
+the gateway owns *how*: JSON mode, fence stripping, schema validation,
+repair-or-retry of the failed call only, jittered backoff and per-call timeouts,
+and (optionally) hedged duplicates for slow idempotent calls.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from core.llm_backends import LLMBackend
+from core.metrics import HEDGING, HedgeTracker, LLMCall, UsageLedger
+from core.prompt_assembly import assemble_user_prompt, estimate_tokens
+from core.ratelimit import RateLimiter, RateLimitTimeout
+from core.routing import ModelRouter
+from core.telemetry import LLM_CALL_SECONDS, LLM_FAILURES
+from core.tracing import NULL_TRACER, Tracer
+from core.utils import CancelToken, JobCancelled
+
+
+T = TypeVar("T", bound=BaseModel)
+
+
+@lru_cache(maxsize=1)
+def _openai():
+    # The SDK takes ~0.4s to import; load it on the first error check, not at boot.
+    import openai
+
+    return openai
+
+
+def retryable_api_errors() -> tuple:
+    """Transient provider errors worth another attempt (same request, after backoff)."""
+    openai = _openai()
+    return (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+
+# Completion-size guess used to reserve tokens/min capacity before a call.
+EXPECTED_COMPLETION_TOKENS = 600
+
+_FENCE_RE = re.compile(r"```[\w-]*\s*(.*?)```", re.DOTALL)
+
+# Hedge-eligible calls run here so the caller can wait on the first of two.
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-hedge")
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """
+    Fire a duplicate request once a call outlives the agent's observed latency
+    quantile; the first valid response wins. Only for idempotent, low-temperature
+    agents. `max_ratio` caps duplicates as a share of that agent's requests.
+    """
+
+    agents: FrozenSet[str]
+    quantile: float = 90.0
+    max_ratio: float = 0.1
+    min_samples: int = 20
+    min_delay_s: float = 1.0
+    tracker: HedgeTracker = field(default=HEDGING, compare=False)
+
+
+class LLMError(RuntimeError):
+    """Raised when an agent call still fails after all attempts."""
+
+
+def extract_json(text: str) -> Dict[str, Any]:
+    """
+    Parse a model reply into a JSON object.
+    Handles fenced blocks (with or without a language tag) and stray prose
+    around the object.
+    """
+    t = (text or "").strip()
+    m = _FENCE_RE.search(t)
+    if m:
+        t = m.group(1).strip()
+    try:
+        data = json.loads(t)
+    except json.JSONDecodeError:
+        start, end = t.find("{"), t.rfind("}")
+        if start == -1 or end <= start:
+            raise
+        data = json.loads(t[start : end + 1])
+    if not isinstance(data, dict):
+        raise ValueError(f"Expected a JSON object, got {type(data).__name__}")
+    return data
+
+
+def _add_usage(call: LLMCall, resp: Any):
+    # Every attempt is billed, so tokens accumulate across repairs.
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return
+    call.prompt_tokens += usage.prompt_tokens or 0
+    call.completion_tokens += usage.completion_tokens or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    call.cached_tokens += (getattr(details, "cached_tokens", 0) or 0) if details else 0
+
+
+def _retry_after_s(err: Exception, default: float = 1.0) -> float:
+    response = getattr(err, "response", None)
+    try:
+        return float(response.headers.get("retry-after", default))
+    except (AttributeError, TypeError, ValueError):
+        return default
+
+
+class LLMGateway:
+    """
+    Shared call path for all agents (one instance per job).
+    """
+
+    def __init__(
+        self,
+        backend: LLMBackend,
+        *,
+        timeout_s: float = 45.0,
+        max_attempts: int = 3,
+        backoff_base_s: float = 0.8,
+        backoff_max_s: float = 8.0,
+        ledger: Optional[UsageLedger] = None,
+        limiter: Optional[RateLimiter] = None,
+        lane: str = "interactive",
+        cancel: Optional[CancelToken] = None,
+        hedge: Optional[HedgePolicy] = None,
+        router: Optional[ModelRouter] = None,
+        tracer: Tracer = NULL_TRACER,
+    ):
+        self.backend = backend
+        self.cancel = cancel
+        self.tracer = tracer
+        self.hedge = hedge
+        self.router = router
+        self.ledger = ledger if ledger is not None else UsageLedger()
+        self.limiter = limiter
+        self.lane = lane
+        self.timeout_s = timeout_s
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": uniform in [0, min(cap, base * 2^attempt)]
+        cap = min(self.backoff_max_s, self.backoff_base_s * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    def _attempt_timeout(self) -> float:
+        """Per-call timeout, clipped to the job's remaining stage/total deadline."""
+        if self.cancel is None:
+            return self.timeout_s
+        self.cancel.check()
+        remaining = self.cancel.remaining()
+        return self.timeout_s if remaining is None else max(0.5, min(self.timeout_s, remaining))
+
+    def _sleep(self, seconds: float):
+        if self.cancel is not None:
+            self.cancel.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    def _timed_create(self, agent: str, request: Dict[str, Any]) -> Any:
+        t0 = time.perf_counter()
+        with self.tracer.span("provider_request", agent=agent, model=request["model"]):
+            resp = self.backend.create(**request)
+        if self.hedge is not None:
+            self.hedge.tracker.observe(agent, time.perf_counter() - t0)
+        return resp
+
+    def _create(self, call: LLMCall, request: Dict[str, Any], reserved: int) -> Any:
+        """
+        One provider request, hedged when the policy covers this agent and the
+        call outlives the observed latency quantile.
+        """
+        policy = self.hedge
+        if policy is None or call.agent not in policy.agents:
+            with self.tracer.span("provider_request", agent=call.agent, model=request["model"]):
+                return self.backend.create(**request)
+        policy.tracker.count_request(call.agent)
+        delay = policy.tracker.delay_s(call.agent, policy.quantile, policy.min_samples)
+        if delay is None:
+            return self._timed_create(call.agent, request)  # still warming up the window
+
+        primary = _HEDGE_POOL.submit(self._timed_create, call.agent, request)
+        try:
+            return primary.result(timeout=max(policy.min_delay_s, delay))
+        except FutureTimeout:
+            pass
+        if self.cancel is not None:
+            self.cancel.check()
+        if not policy.tracker.try_fire(call.agent, policy.max_ratio):
+            return primary.result()
+        if self.limiter:
+            try:
+                self.limiter.acquire(reserved, lane=self.lane, timeout=0.0)
+            except RateLimitTimeout:
+                return primary.result()  # no spare capacity; don't queue a duplicate
+
+        call.hedged = True
+        hedge = _HEDGE_POOL.submit(self._timed_create, call.agent, request)
+        done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+        first = hedge if hedge in done and primary not in done else primary
+        if first.exception() is not None:
+            first = hedge if first is primary else primary  # a failure doesn't win; wait for the other
+        loser = hedge if first is primary else primary
+        loser.add_done_callback(lambda f: self._settle_duplicate(f, call, reserved))
+        resp = first.result()  # raises only if both failed
+        if first is hedge:
+            call.hedge_won = True
+            policy.tracker.record_win(call.agent)
+        return resp
+
+    def _settle_duplicate(self, fut: Future, call: LLMCall, reserved: int):
+        # The losing request is still billed: return its reservation, count its cost.
+        dup = LLMCall(agent=call.agent, model=call.model)
+        if fut.exception() is None:
+            _add_usage(dup, fut.result())
+        used = dup.prompt_tokens + dup.completion_tokens
+        if self.limiter:
+            self.limiter.reconcile(reserved, used or reserved)
+        if used:
+            self.hedge.tracker.add_extra_cost(dup.cost_usd)
+            self.ledger.record(dup)
+
+    def _finish(self, call: LLMCall, started: float, ok: bool):
+        finished = time.perf_counter()
+        call.latency_s = finished - started
+        call.ok = ok
+        self.ledger.record(call)
+        self.tracer.record(
+            f"llm.{call.agent}",
+            started,
+            finished,
+            model=call.model,
+            ok=ok,
+            retries=call.retries,
+            prompt_tokens=call.prompt_tokens,
+            completion_tokens=call.completion_tokens,
+            cached_tokens=call.cached_tokens,
+            queue_wait_s=round(call.queue_wait_s, 4),
+            hedged=call.hedged,
+        )
+        LLM_CALL_SECONDS.observe(call.latency_s, agent=call.agent)
+        if self.router is not None:
+            self.router.observe(call)
+
+    def complete_json(
+        self,
+        *,
+        agent: str,
+        model: str,
+        system: str,
+        payload: Any,
+        schema: Type[T],
+        temperature: float,
+        prepare: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+        preamble: str = "",
+    ) -> T:
+        """
+        Run one chat completion and return it validated as `schema`.
+
+        `system` must be a static prompt constant (cacheable prefix); `payload`
+        is serialized compactly and fit to the agent's token budget.
+
+        Malformed / invalid replies are repaired by sending the bad reply back
+        with the validation error; rate limits, timeouts and 5xx are retried
+        with jittered backoff. Only this call is retried, never the whole job.
+        A cancelled job (or one past its deadline) raises JobCancelled.
+        """
+        prompt = assemble_user_prompt(agent, payload, preamble=preamble)
+        messages: List[Dict[str, str]] = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt.content},
+        ]
+        last_error: Optional[Exception] = None
+        call = LLMCall(agent=agent, model=model, tokens_saved=prompt.tokens_saved)
+        started = time.perf_counter()
+
+        try:
+            for attempt in range(self.max_attempts):
+                call.retries = attempt
+                if attempt:
+                    self._sleep(self._backoff(attempt - 1))
+                timeout_s = self._attempt_timeout()
+                reserved = sum(estimate_tokens(m["content"]) for m in messages) + EXPECTED_COMPLETION_TOKENS
+                if self.limiter:
+                    try:
+                        call.queue_wait_s += self.limiter.acquire(reserved, lane=self.lane, timeout=timeout_s)
+                    except RateLimitTimeout as e:
+                        last_error = e
+                        continue
+                    timeout_s = self._attempt_timeout()
+                try:
+                    resp = self._create(
+                        call,
+                        dict(
+                            model=model,
+                            temperature=temperature,
+                            messages=messages,
+                            response_format={"type": "json_object"},
+                            timeout=timeout_s,
+                        ),
+                        reserved,
+                    )
+                except retryable_api_errors() as e:
+                    last_error = e
+                    if self.limiter:
+                        # nothing was generated: hand the reserved tokens back before retrying
+                        self.limiter.reconcile(reserved, 0)
+                        if isinstance(e, _openai().RateLimitError):
+                            self.limiter.pause(_retry_after_s(e))
+                    continue
+
+                used_before = call.prompt_tokens + call.completion_tokens
+                _add_usage(call, resp)
+                if self.limiter:
+                    used = call.prompt_tokens + call.completion_tokens - used_before
+                    self.limiter.reconcile(reserved, used or reserved)
+                content = resp.choices[0].message.content or "{}"
+                try:
+                    data = extract_json(content)
+                    if prepare:
+                        data = prepare(data)
+                    out = schema(**data)
+                    self._finish(call, started, ok=True)
+                    return out
+                except (ValueError, TypeError, ValidationError) as e:
+                    # json.JSONDecodeError is a ValueError
+                    last_error = e
+                    messages = messages[:2] + [
+                        {"role": "assistant", "content": content},
+                        {
+                            "role": "user",
+                            "content": (
+                                f"Your previous reply was not valid for the required schema: {e}. "
+                                "Return only the corrected JSON object."
+                            ),
+                        },
+                    ]
+            if self.cancel is not None:
+                self.cancel.check()  # a deadline hit during the last attempt is a cancellation
+        except JobCancelled:
+            self._finish(call, started, ok=False)
+            raise
+
+        self._finish(call, started, ok=False)
+        LLM_FAILURES.inc(agent=agent)
+        raise LLMError(f"{agent} failed after {self.max_attempts} attempts: {last_error}")
@@ -0,0 +1,255 @@
+"""
+Pluggable backends behind LLMGateway.
+
+- OpenAIBackend: live `chat.completions` calls.
+- RecordingBackend: live calls, each response also written to a fixture store.
+- ReplayBackend: serves recorded fixtures offline with a synthetic latency
+  distribution, so the full pipeline can be timed reproducibly without network.
+- StubBackend: canned schema-valid replies per agent (no fixtures needed),
+  same latency models; for load tests of the app itself.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Protocol
+
+from core.prompts import (
+    COHORT_DETECTIVE_SYSTEM,
+    COPYWRITER_SYSTEM,
+    EVALUATOR_SYSTEM,
+    EXPLAIN_SYSTEM,
+    FLOW_ARCHITECT_SYSTEM,
+)
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+class LLMBackend(Protocol):
+    def create(self, **request) -> Any: ...
+
+
+class FixtureMissing(LookupError):
+    """Replay found no recorded response for a request."""
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    canonical = {k: request.get(k) for k in ("model", "temperature", "messages", "response_format")}
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()[:24]
+
+
+def _system_key(request: Dict[str, Any]) -> str:
+    system = next((m["content"] for m in request.get("messages", []) if m["role"] == "system"), "")
+    return hashlib.sha256(system.encode()).hexdigest()[:16]
+
+
+def _as_response(fixture: Dict[str, Any]) -> Any:
+    # Minimal ChatCompletion look-alike: what the gateway reads.
+    usage = fixture.get("usage") or {}
+    return SimpleNamespace(
+        model=fixture.get("model"),
+        choices=[SimpleNamespace(message=SimpleNamespace(content=fixture.get("content")))],
+        usage=SimpleNamespace(
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            prompt_tokens_details=SimpleNamespace(cached_tokens=usage.get("cached_tokens", 0)),
+        ),
+    )
+
+
+class OpenAIBackend:
+    def __init__(self, client: OpenAI):
+        self.client = client
+
+    def create(self, **request) -> Any:
+        return self.client.chat.completions.create(**request)
+
+
+class FixtureStore:
+    """
+    One JSON file per recorded request: <dir>/<request_key>.json
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._exact: Optional[Dict[str, Dict[str, Any]]] = None
+        self._by_system: Dict[str, List[Dict[str, Any]]] = {}
+
+    def save(self, request: Dict[str, Any], resp: Any, latency_s: float):
+        usage = getattr(resp, "usage", None)
+        details = getattr(usage, "prompt_tokens_details", None)
+        fixture = {
+            "key": request_key(request),
+            "system_key": _system_key(request),
+            "model": request.get("model"),
+            "latency_s": round(latency_s, 4),
+            "content": resp.choices[0].message.content,
+            "usage": {
+                "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+                "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+                "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details else 0,
+            },
+            "request": {k: request.get(k) for k in ("model", "temperature", "messages")},
+        }
+        self.root.mkdir(parents=True, exist_ok=True)
+        (self.root / f"{fixture['key']}.json").write_text(json.dumps(fixture, indent=2))
+        with self._lock:
+            self._exact = None  # re-index on next lookup
+
+    def _index(self):
+        with self._lock:
+            if self._exact is None:
+                exact, by_system = {}, {}
+                for path in sorted(self.root.glob("*.json")) if self.root.exists() else []:
+                    fixture = json.loads(path.read_text())
+                    exact[fixture["key"]] = fixture
+                    by_system.setdefault(fixture["system_key"], []).append(fixture)
+                self._exact, self._by_system = exact, by_system
+            return self._exact, self._by_system
+
+    def lookup(self, request: Dict[str, Any], strict: bool = True) -> Dict[str, Any]:
+        exact, by_system = self._index()
+        key = request_key(request)
+        if key in exact:
+            return exact[key]
+        candidates = by_system.get(_system_key(request), [])
+        if strict or not candidates:
+            raise FixtureMissing(f"No recorded response for request {key} in {self.root}")
+        # Same agent (system prompt), different data: deterministic pick by request key.
+        return candidates[int(key, 16) % len(candidates)]
+
+
+class RecordingBackend:
+    def __init__(self, inner: OpenAIBackend, store: FixtureStore):
+        self.inner = inner
+        self.store = store
+
+    def create(self, **request) -> Any:
+        started = time.perf_counter()
+        resp = self.inner.create(**request)
+        self.store.save(request, resp, time.perf_counter() - started)
+        return resp
+
+
+class LatencyModel:
+    """
+    Synthetic replay latency.
+      "none"                               no delay
+      "recorded"                           the latency captured at record time
+      "lognormal:p50=2000,p95=6000,seed=7" lognormal fitted to p50/p95 (ms)
+    """
+
+    def __init__(self, spec: str = "none"):
+        kind, _, params = (spec or "none").partition(":")
+        self.kind = kind.strip()
+        opts = dict(p.split("=", 1) for p in params.split(",") if "=" in p)
+        self.p50_s = float(opts.get("p50", 2000)) / 1000
+        p95_s = float(opts.get("p95", 6000)) / 1000
+        # For a lognormal, p95 = median * exp(1.645 * sigma)
+        self.sigma = math.log(max(p95_s, self.p50_s) / self.p50_s) / 1.645 if self.p50_s > 0 else 0.0
+        self._rng = random.Random(int(opts.get("seed", 7)))
+        self._lock = threading.Lock()
+        if self.kind not in ("none", "recorded", "lognormal"):
+            raise ValueError(f"Unknown replay latency spec: {spec}")
+
+    def sample(self, recorded_s: float = 0.0) -> float:
+        if self.kind == "recorded":
+            return recorded_s
+        if self.kind == "lognormal":
+            with self._lock:
+                return self._rng.lognormvariate(math.log(self.p50_s), self.sigma)
+        return 0.0
+
+
+class ReplayBackend:
+    def __init__(self, store: FixtureStore, latency: LatencyModel, strict: bool = True):
+        self.store = store
+        self.latency = latency
+        self.strict = strict
+
+    def create(self, **request) -> Any:
+        fixture = self.store.lookup(request, strict=self.strict)
+        delay = self.latency.sample(fixture.get("latency_s", 0.0))
+        if delay > 0:
+            time.sleep(delay)
+        return _as_response(fixture)
+
+
+def _stub_pack(title: str, text: str) -> Dict[str, Any]:
+    return {
+        "title": title,
+        "notes": "Calm, clinician-friendly tone.",
+        "variants": [
+            {"tone": "calm", "cta": "Start your first consult", "text": text},
+            {"tone": "supportive", "cta": "Book a consult", "text": text},
+            {"tone": "direct", "cta": "Open Heidi", "text": text},
+        ],
+    }
+
+
+_STUB_REPLIES: Dict[str, Dict[str, Any]] = {
+    COHORT_DETECTIVE_SYSTEM: {
+        "name": "New signups without a first consult",
+        "story": "Clinicians sign up but stall before their first consult, so they never see a finished note.",
+        "size": 0,
+        "dropoff_rate": "0%",
+        "urgency": "High",
+    },
+    FLOW_ARCHITECT_SYSTEM: {
+        "trigger": "signup_completed and no consult_created within 48h",
+        "sequence": [
+            {"t_plus": "T+48h", "channel": "email", "goal": "Start the first consult", "cta": "Start your first consult"},
+            {"t_plus": "T+60h", "channel": "sms", "goal": "Nudge to try a short consult", "cta": "Book a consult"},
+            {"t_plus": "T+96h", "channel": "in_app", "goal": "Show a guided first consult", "cta": "Open Heidi"},
+        ],
+    },
+    COPYWRITER_SYSTEM: {
+        "email": _stub_pack("Your first consult takes two minutes", "Set up your first consult in two minutes and see a finished note."),
+        "sms": _stub_pack("Quick start", "Your first Heidi consult takes two minutes. Start when you are ready."),
+        "in_app": _stub_pack("Try a guided consult", "Run a short guided consult to see how your notes come together."),
+    },
+    EVALUATOR_SYSTEM: {"score": 0.9, "flags": []},
+    EXPLAIN_SYSTEM: {
+        "why_cohort": "This is the largest group stalling before the first value moment.",
+        "why_timing": "48h leaves room for a natural first consult before nudging.",
+        "why_message": "Short, calm copy lowers the effort of trying one consult.",
+    },
+}
+
+
+class StubBackend:
+    """
+    Canned replies keyed by the agent's system prompt, with token usage
+    estimated from the request size. Output is valid but not realistic copy.
+    """
+
+    def __init__(self, latency: LatencyModel):
+        self.latency = latency
+        self._bodies = {system: json.dumps(reply) for system, reply in _STUB_REPLIES.items()}
+
+    def create(self, **request) -> Any:
+        messages = request.get("messages", [])
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        body = self._bodies.get(system)
+        if body is None:
+            raise FixtureMissing("StubBackend has no reply for this system prompt")
+        delay = self.latency.sample()
+        if delay > 0:
+            time.sleep(delay)
+        prompt_chars = sum(len(m["content"]) for m in messages)
+        return _as_response(
+            {
+                "model": request.get("model"),
+                "content": body,
+                "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(body) // 4},
+            }
+        )
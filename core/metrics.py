@@ -1,7 +1,217 @@
-def compute_speedup_metrics():
+from __future__ import annotations
+
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from core.schemas import AgentUsage, UsageSummary
+
+
+# USD per 1M tokens: (input, cached input, output)
+MODEL_PRICING = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+}
+
+
+def estimate_cost_usd(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    # Dated snapshots ("gpt-4o-mini-2024-07-18") price like their base model.
+    base = next((m for m in sorted(MODEL_PRICING, key=len, reverse=True) if model.startswith(m)), None)
+    if base is None:
+        return 0.0
+    p_in, p_cached, p_out = MODEL_PRICING[base]
+    fresh = max(0, prompt_tokens - cached_tokens)
+    return (fresh * p_in + cached_tokens * p_cached + completion_tokens * p_out) / 1_000_000
+
+
+@dataclass
+class LLMCall:
+    agent: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    latency_s: float = 0.0
+    retries: int = 0
+    tokens_saved: int = 0
+    queue_wait_s: float = 0.0
+    ok: bool = True
+    hedged: bool = False  # a duplicate request was fired for this call
+    hedge_won: bool = False  # ...and the duplicate answered first
+
+    @property
+    def cache_hit(self) -> bool:
+        return self.cached_tokens > 0
+
+    @property
+    def cost_usd(self) -> float:
+        return estimate_cost_usd(self.model, self.prompt_tokens, self.completion_tokens, self.cached_tokens)
+
+
+class UsageLedger:
+    """
+    Per-job record of every LLM call (thread-safe; agents may run concurrently).
+    """
+
+    def __init__(self):
+        self._calls: List[LLMCall] = []
+        self._lock = threading.Lock()
+
+    def record(self, call: LLMCall):
+        with self._lock:
+            self._calls.append(call)
+
+    def calls(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{**asdict(c), "cache_hit": c.cache_hit, "cost_usd": c.cost_usd} for c in self._calls]
+
+    def summary(self, wall_time_s: float = 0.0) -> UsageSummary:
+        from core.schemas import AgentUsage, UsageSummary
+
+        with self._lock:
+            calls = list(self._calls)
+
+        def _add(acc: AgentUsage, c: LLMCall):
+            acc.calls += 1
+            acc.prompt_tokens += c.prompt_tokens
+            acc.completion_tokens += c.completion_tokens
+            acc.cached_tokens += c.cached_tokens
+            acc.retries += c.retries
+            acc.tokens_saved += c.tokens_saved
+            acc.failures += 0 if c.ok else 1
+            acc.latency_s += c.latency_s
+            acc.queue_wait_s += c.queue_wait_s
+            acc.cost_usd += c.cost_usd
+            acc.hedges += int(c.hedged)
+            acc.hedge_wins += int(c.hedge_won)
+            if c.model not in acc.models:
+                acc.models.append(c.model)
+
+        total = UsageSummary(wall_time_s=round(wall_time_s, 3))
+        for c in calls:
+            _add(total, c)
+            _add(total.by_agent.setdefault(c.agent, AgentUsage()), c)
+
+        for acc in [total, *total.by_agent.values()]:
+            acc.latency_s = round(acc.latency_s, 3)
+            acc.queue_wait_s = round(acc.queue_wait_s, 3)
+            acc.cost_usd = round(acc.cost_usd, 6)
+        return total
+
+
+class SpeculationTracker:
+    """
+    Process-wide hit rate / latency saved for speculative copywriting.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_s = 0.0
+
+    def record(self, hit: bool, saved_s: float = 0.0):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.saved_s += saved_s
+            else:
+                self.misses += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "hits": self.hits,
+                "misses": self.misses,
+                "total_saved_s": round(self.saved_s, 3),
+            }
+
+
+SPECULATION = SpeculationTracker()
+
+
+class HedgeTracker:
+    """
+    Process-wide per-agent latency windows (for the hedge delay) and hedge
+    outcomes: how often a duplicate was fired, how often it won, what it cost.
+    """
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._latency: Dict[str, Deque[float]] = {}
+        self._window = window
+        self.requests: Dict[str, int] = {}
+        self.fired: Dict[str, int] = {}
+        self.wins: Dict[str, int] = {}
+        self.extra_cost_usd = 0.0
+
+    def observe(self, agent: str, latency_s: float):
+        with self._lock:
+            self._latency.setdefault(agent, deque(maxlen=self._window)).append(latency_s)
+
+    def delay_s(self, agent: str, quantile: float, min_samples: int) -> Optional[float]:
+        """Observed latency quantile for `agent`; None until there are enough samples."""
+        with self._lock:
+            window = list(self._latency.get(agent, ()))
+        if len(window) < min_samples:
+            return None
+        return percentile(window, quantile)
+
+    def count_request(self, agent: str):
+        with self._lock:
+            self.requests[agent] = self.requests.get(agent, 0) + 1
+
+    def try_fire(self, agent: str, max_ratio: float) -> bool:
+        """Reserve one hedge unless `agent` already used its share (hedges / requests)."""
+        with self._lock:
+            fired = self.fired.get(agent, 0)
+            if fired + 1 > max_ratio * self.requests.get(agent, 0):
+                return False
+            self.fired[agent] = fired + 1
+            return True
+
+    def record_win(self, agent: str):
+        with self._lock:
+            self.wins[agent] = self.wins.get(agent, 0) + 1
+
+    def add_extra_cost(self, cost_usd: float):
+        with self._lock:
+            self.extra_cost_usd += cost_usd
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            fired, wins = sum(self.fired.values()), sum(self.wins.values())
+            return {
+                "fired": fired,
+                "wins": wins,
+                "win_rate": round(wins / fired, 3) if fired else 0.0,
+                "hedge_rate": round(fired / sum(self.requests.values()), 3) if self.requests else 0.0,
+                "extra_cost_usd": round(self.extra_cost_usd, 6),
+                "by_agent": {a: {"fired": n, "wins": self.wins.get(a, 0)} for a, n in self.fired.items()},
+            }
+
+
+HEDGING = HedgeTracker()
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100); 0.0 for no data."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), int(-(-q * len(ordered) // 100))))
+    return ordered[rank - 1]
+
+
+def compute_speedup_metrics(usage: Optional[Dict[str, Any]] = None):
     """
     Hard numbers for the 10× proof panel.
-    Values are intentionally explicit and demo-friendly.
+    Manual timings are explicit baselines; the AI generate step and cost come from
+    the job's measured usage when available (static demo value otherwise).
     """
     manual_research = 45
     manual_design = 90
@@ -12,7 +222,10 @@ def compute_speedup_metrics():
     ai_upload = 0.5
     ai_generate = 1
     ai_review = 10
-    ai_total_min = ai_upload + ai_generate + ai_review  # 11.5
+    measured = bool(usage and usage.get("wall_time_s"))
+    if measured:
+        ai_generate = round(usage["wall_time_s"] / 60, 2)
+    ai_total_min = round(ai_upload + ai_generate + ai_review, 2)  # 11.5 with demo values
 
     manual_total_hr = round(manual_total_min / 60, 2)  # 4.75
     speedup = manual_total_min / ai_total_min
@@ -22,4 +235,9 @@ def compute_speedup_metrics():
         "manual_total_hr": manual_total_hr,
         "ai_total_min": ai_total_min,
         "speedup": speedup,
+        "measured": measured,
+        "generate_latency_s": (usage or {}).get("wall_time_s"),
+        "llm_latency_s": (usage or {}).get("latency_s"),
+        "cost_usd": (usage or {}).get("cost_usd"),
+        "total_tokens": ((usage or {}).get("prompt_tokens", 0) + (usage or {}).get("completion_tokens", 0)) or None,
     }
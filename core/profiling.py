@@ -0,0 +1,119 @@
+"""
+On-demand profiling of the ingestion stages (PROFILE_JOBS=1 or a job's
+`profile` flag).
+
+Each profiled stage writes, next to the job's flow JSON:
+
+    exports/<job_id>_<stage>.prof         cProfile stats (snakeviz / pstats)
+    exports/<job_id>_<stage>.tracemalloc  allocation snapshot (tracemalloc.Snapshot.load)
+
+and returns a short hotspot summary for the progress stepper. cProfile only
+sees the job's own thread; tracemalloc is process-wide, so allocations from
+other jobs running at the same time show up too. One stage is profiled at a
+time per process; a stage that finds the profiler busy just runs unprofiled.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+_BUSY = threading.Lock()
+
+
+def _where(filename: str, line: int) -> str:
+    return f"{os.path.basename(filename)}:{line}"
+
+
+def cpu_hotspots(profile: cProfile.Profile, top_n: int) -> List[Dict[str, Any]]:
+    """Functions with the most self time."""
+    stats = pstats.Stats(profile).stats  # {(file, line, func): (cc, nc, tottime, cumtime, callers)}
+    ranked = sorted(stats.items(), key=lambda kv: kv[1][2], reverse=True)[:top_n]
+    return [
+        {"func": func, "where": _where(file, line), "self_s": round(tt, 4), "cum_s": round(ct, 4), "calls": nc}
+        for (file, line, func), (_, nc, tt, ct, _) in ranked
+    ]
+
+
+def alloc_hotspots(snapshot: tracemalloc.Snapshot, top_n: int) -> List[Dict[str, Any]]:
+    """Source lines holding the most memory at the end of the stage."""
+    return [
+        {"where": _where(s.traceback[0].filename, s.traceback[0].lineno), "mb": round(s.size / 2**20, 2), "blocks": s.count}
+        for s in snapshot.statistics("lineno")[:top_n]
+    ]
+
+
+class StageProfiler:
+    def __init__(self, job_id: str, exports_dir: Path, *, top_n: int = 5):
+        self.job_id = job_id
+        self.exports_dir = exports_dir
+        self.top_n = top_n
+        self.reports: Dict[str, Dict[str, Any]] = {}
+
+    @contextmanager
+    def stage(self, name: str, progress: Optional[Callable[..., None]] = None):
+        if not _BUSY.acquire(blocking=False):
+            if progress:
+                progress(f"🔬 {name}: profiler busy with another job; not profiled.")
+            yield
+            return
+        started_tracing = not tracemalloc.is_tracing()
+        try:
+            if started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            profile = cProfile.Profile()
+            t0 = time.perf_counter()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+            wall = time.perf_counter() - t0
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                (
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+                )
+            )
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+            _BUSY.release()
+
+        report = self._save(name, profile, snapshot, wall, peak)
+        if progress:
+            progress(self.summary(name, report))
+
+    def _save(self, name: str, profile: cProfile.Profile, snapshot: tracemalloc.Snapshot, wall: float, peak: int) -> Dict[str, Any]:
+        self.exports_dir.mkdir(exist_ok=True)
+        prof_path = self.exports_dir / f"{self.job_id}_{name}.prof"
+        mem_path = self.exports_dir / f"{self.job_id}_{name}.tracemalloc"
+        profile.dump_stats(str(prof_path))
+        snapshot.dump(str(mem_path))
+        report = {
+            "wall_s": round(wall, 4),
+            "peak_mb": round(peak / 2**20, 2),
+            "cpu": cpu_hotspots(profile, self.top_n),
+            "alloc": alloc_hotspots(snapshot, self.top_n),
+            "files": [str(prof_path), str(mem_path)],
+        }
+        self.reports[name] = report
+        return report
+
+    @staticmethod
+    def summary(name: str, report: Dict[str, Any]) -> str:
+        cpu = ", ".join(f"{h['func']} ({h['where']}) {h['self_s']:.3f}s" for h in report["cpu"])
+        alloc = ", ".join(f"{h['where']} {h['mb']:.1f} MB" for h in report["alloc"])
+        return (
+            f"🔬 {name}: {report['wall_s']:.2f}s • peak {report['peak_mb']:.1f} MB • "
+            f"CPU hotspots: {cpu or 'none'} • allocations: {alloc or 'none'}"
+        )
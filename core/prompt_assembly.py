@@ -0,0 +1,91 @@
+"""
+Prompt assembly: compact serialization + per-agent input token budgets.
+
+System prompts stay module constants (byte-stable prefix, so provider-side
+prompt caching can hit); everything job-specific goes into the user message,
+serialized compactly and trimmed to the agent's budget.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+
+# Rough input budgets (tokens) for the dynamic user message of each agent.
+AGENT_TOKEN_BUDGETS: Dict[str, int] = {
+    "cohort_detective": 300,
+    "flow_architect": 300,
+    "copywriter": 600,
+    "evaluator": 1200,
+    "explain": 500,
+}
+DEFAULT_TOKEN_BUDGET = 800
+
+# Top-level payload keys sent verbatim, even over budget: what the agent judges
+# has to be the copy that ships (trimmed variant text would be scored instead).
+# The evaluator's "variants" carries each channel's title (subject line) too.
+AGENT_VERBATIM_KEYS: Dict[str, Tuple[str, ...]] = {
+    "evaluator": ("variants",),
+}
+
+# Trimming never drops below this many list items (e.g. 3 variants per channel).
+MIN_LIST_ITEMS = 3
+
+
+def compact_json(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 chars/token for English + JSON; good enough for budgeting without a tokenizer.
+    return (len(text) + 3) // 4
+
+
+@dataclass(frozen=True)
+class AssembledPrompt:
+    content: str
+    tokens: int
+    tokens_saved: int
+    trimmed: bool
+
+
+def _shrink(obj: Any, max_str: int, max_items: int) -> Any:
+    if isinstance(obj, str):
+        return obj if len(obj) <= max_str else obj[: max_str - 1].rstrip() + "…"
+    if isinstance(obj, list):
+        return [_shrink(v, max_str, max_items) for v in obj[:max_items]]
+    if isinstance(obj, dict):
+        return {k: _shrink(v, max_str, max_items) for k, v in obj.items()}
+    return obj
+
+
+def _shrink_payload(payload: Any, keep: Tuple[str, ...], max_str: int, max_items: int) -> Any:
+    if not keep or not isinstance(payload, dict):
+        return _shrink(payload, max_str, max_items)
+    return {k: v if k in keep else _shrink(v, max_str, max_items) for k, v in payload.items()}
+
+
+def assemble_user_prompt(agent: str, payload: Any, preamble: str = "") -> AssembledPrompt:
+    """
+    Serialize `payload` compactly and fit it to the agent's token budget by
+    progressively truncating long strings and long lists (except the agent's
+    AGENT_VERBATIM_KEYS, which can leave the prompt over budget).
+    tokens_saved is measured against the legacy `json.dumps(payload, indent=2)`.
+    """
+    budget = AGENT_TOKEN_BUDGETS.get(agent, DEFAULT_TOKEN_BUDGET)
+    keep = AGENT_VERBATIM_KEYS.get(agent, ())
+    baseline = estimate_tokens(preamble + json.dumps(payload, indent=2))
+
+    content = preamble + compact_json(payload)
+    trimmed = False
+    max_str, max_items = 1200, 12
+    while estimate_tokens(content) > budget and (max_str > 60 or max_items > MIN_LIST_ITEMS):
+        max_str = max(60, max_str // 2)
+        max_items = max(MIN_LIST_ITEMS, max_items // 2)
+        content = preamble + compact_json(_shrink_payload(payload, keep, max_str, max_items))
+        trimmed = True
+
+    tokens = estimate_tokens(content)
+    return AssembledPrompt(content=content, tokens=tokens, tokens_saved=max(0, baseline - tokens), trimmed=trimmed)
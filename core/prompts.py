@@ -1,6 +1,8 @@
 """
 Prompt templates for each agent.
 We keep them short, strict, and schema-driven.
+Static context (rubrics, intents) lives here so the system prefix is byte-stable
+across jobs; only job data goes into the user message.
 """
 
 HEALTHCARE_GUARDRAILS = """
@@ -76,6 +78,14 @@ Score the content for:
 3) brand tone
 4) healthcare safety (no medical claims/advice)
 
+Rubric:
+- clarity: clear, short, actionable
+- spam_risk: no pushy language, no excessive punctuation
+- brand_tone: calm, confident, time-saving workflow
+- healthcare_safety: no outcomes promises, no medical advice
+
+Input: wedge_name, per channel the title (email subject line) and variants (tone, cta, text), known_flags from rule checks.
+
 Return STRICT JSON:
 score: float between 0 and 1
 flags: list of short strings
@@ -85,6 +95,11 @@ EXPLAIN_SYSTEM = f"""
 You are an Explainability narrator for non-technical stakeholders.
 Given cohort, flow timing, and message intent, write short narrative explanations.
 
+Message intent per channel:
+- email: remove friction and prompt first consult setup
+- sms: short reminder with low barrier CTA
+- in_app: gentle safety net with help option
+
 {BRAND_TONE}
 {HEALTHCARE_GUARDRAILS}
 
@@ -0,0 +1,141 @@
+"""
+Process-wide rate limiter for provider calls.
+
+Two token buckets (requests/min and tokens/min) refill continuously. Waiters
+queue in priority lanes: a lower lane is only served when every higher lane
+is empty, so interactive UI jobs go ahead of batch work.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+LANES = ("interactive", "batch")  # highest priority first
+
+
+class RateLimitTimeout(TimeoutError):
+    """Raised when a caller waits longer than its timeout for capacity."""
+
+
+class RateLimiter:
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = max(1, int(rpm))
+        self.tpm = max(1, int(tpm))
+        self._req = float(self.rpm)
+        self._tok = float(self.tpm)
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._lanes: Dict[str, Deque[object]] = {lane: deque() for lane in LANES}
+        self._granted = {lane: 0 for lane in LANES}
+        self._wait_total = {lane: 0.0 for lane in LANES}
+        self._wait_max = {lane: 0.0 for lane in LANES}
+
+    def _refill(self, now: float):
+        elapsed = now - self._last
+        self._last = now
+        self._req = min(self.rpm, self._req + elapsed * self.rpm / 60)
+        self._tok = min(self.tpm, self._tok + elapsed * self.tpm / 60)
+
+    def _is_next(self, lane: str, ticket: object) -> bool:
+        for name in LANES:
+            if self._lanes[name]:
+                return name == lane and self._lanes[name][0] is ticket
+        return False
+
+    def _eta(self, tokens: float, now: float) -> float:
+        need_req = max(0.0, 1 - self._req) * 60 / self.rpm
+        need_tok = max(0.0, tokens - self._tok) * 60 / self.tpm
+        return max(need_req, need_tok, self._paused_until - now, 0.005)
+
+    def acquire(self, tokens: int, lane: str = "interactive", timeout: Optional[float] = None) -> float:
+        """
+        Block until one request + `tokens` fit under the limits. Returns seconds waited.
+        """
+        if lane not in self._lanes:
+            raise ValueError(f"Unknown lane: {lane}")
+        tokens = float(min(max(tokens, 1), self.tpm))
+        ticket = object()
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+
+        with self._cond:
+            self._lanes[lane].append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if (
+                        self._is_next(lane, ticket)
+                        and now >= self._paused_until
+                        and self._req >= 1
+                        and self._tok >= tokens
+                    ):
+                        self._req -= 1
+                        self._tok -= tokens
+                        break
+                    wait = self._eta(tokens, now) if self._is_next(lane, ticket) else 1.0
+                    if deadline is not None:
+                        if now >= deadline:
+                            raise RateLimitTimeout(f"No provider capacity within {timeout:.1f}s ({lane} lane)")
+                        wait = min(wait, deadline - now)
+                    self._cond.wait(timeout=wait)
+            finally:
+                self._lanes[lane].remove(ticket)
+                self._cond.notify_all()
+
+            waited = time.monotonic() - started
+            self._granted[lane] += 1
+            self._wait_total[lane] += waited
+            self._wait_max[lane] = max(self._wait_max[lane], waited)
+        return waited
+
+    def reconcile(self, estimated: int, actual: int):
+        """Return (or charge) the difference once real token usage is known."""
+        with self._cond:
+            self._tok = min(self.tpm, self._tok + (estimated - actual))
+            self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        """Hold every lane after a provider 429 instead of letting all callers retry at once."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._cond:
+            self._refill(time.monotonic())
+            out: Dict[str, Dict[str, float]] = {
+                lane: {
+                    "queue_depth": len(self._lanes[lane]),
+                    "granted": self._granted[lane],
+                    "avg_wait_s": round(self._wait_total[lane] / self._granted[lane], 4) if self._granted[lane] else 0.0,
+                    "max_wait_s": round(self._wait_max[lane], 4),
+                }
+                for lane in LANES
+            }
+            out["capacity"] = {
+                "requests_available": round(self._req, 2),
+                "tokens_available": round(self._tok),
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+            }
+            return out
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter(rpm: int, tpm: int) -> RateLimiter:
+    """
+    The shared limiter for this process (created on first use; later calls reuse it).
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(rpm=rpm, tpm=tpm)
+        return _limiter
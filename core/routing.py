@@ -0,0 +1,169 @@
+"""
+Per-agent model routing from a configured pool.
+
+Every finished LLM call feeds rolling per-(agent, model) windows of latency,
+failures and cost; the Copywriter's models also get the QA score of what they
+wrote. `choose` keeps each agent on the fastest model that meets its latency
+SLO (cheapest on ties) and `choose_copy` escalates the Copywriter to the strong
+model only when the base model's recent QA scores say regeneration is likely.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from core.metrics import MODEL_PRICING, LLMCall, percentile
+
+
+DEFAULT_SLOS_S = {
+    "cohort_detective": 8.0,
+    "flow_architect": 8.0,
+    "copywriter": 20.0,
+    "evaluator": 6.0,
+    "explain": 8.0,
+}
+
+
+def parse_slos(spec: str) -> Dict[str, float]:
+    """ "copywriter=20,evaluator=6" -> {...}, on top of DEFAULT_SLOS_S."""
+    slos = dict(DEFAULT_SLOS_S)
+    for part in (spec or "").split(","):
+        agent, _, value = part.partition("=")
+        if agent.strip() and value.strip():
+            slos[agent.strip()] = float(value)
+    return slos
+
+
+@dataclass
+class _Window:
+    latency: Deque[float] = field(default_factory=lambda: deque(maxlen=100))
+    ok: Deque[bool] = field(default_factory=lambda: deque(maxlen=100))
+    cost: Deque[float] = field(default_factory=lambda: deque(maxlen=100))
+    qa: Deque[float] = field(default_factory=lambda: deque(maxlen=50))
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        pool: Tuple[str, ...],
+        *,
+        slos_s: Dict[str, float],
+        strong_model: str,
+        qa_threshold: float = 0.78,
+        escalate_p: float = 0.5,
+        max_failure_rate: float = 0.2,
+        min_samples: int = 10,
+        explore_every: int = 25,
+    ):
+        self.pool = tuple(pool)
+        self.slos_s = slos_s
+        self.strong_model = strong_model
+        self.qa_threshold = qa_threshold
+        self.escalate_p = escalate_p
+        self.max_failure_rate = max_failure_rate
+        self.min_samples = min_samples
+        self.explore_every = explore_every
+        self._lock = threading.Lock()
+        self._windows: Dict[Tuple[str, str], _Window] = {}
+        self._routed: Dict[str, int] = {}
+
+    def _window(self, agent: str, model: str) -> _Window:
+        return self._windows.setdefault((agent, model), _Window())
+
+    def observe(self, call: LLMCall):
+        with self._lock:
+            w = self._window(call.agent, call.model)
+            w.latency.append(call.latency_s)
+            w.ok.append(call.ok)
+            w.cost.append(call.cost_usd)
+
+    def observe_quality(self, agent: str, model: str, score: float):
+        with self._lock:
+            self._window(agent, model).qa.append(score)
+
+    def _cost(self, w: _Window, model: str) -> float:
+        if w.cost:
+            return sum(w.cost) / len(w.cost)
+        base = next((m for m in sorted(MODEL_PRICING, key=len, reverse=True) if model.startswith(m)), None)
+        return MODEL_PRICING[base][0] if base else float("inf")
+
+    def _regen_p(self, w: _Window) -> Optional[float]:
+        if len(w.qa) < self.min_samples:
+            return None
+        return sum(1 for s in w.qa if s < self.qa_threshold) / len(w.qa)
+
+    def choose(self, agent: str, default: str) -> str:
+        """
+        Fastest (p50) pool model whose p90 meets the agent's SLO and whose
+        failure rate is acceptable; cheapest breaks ties. Models without enough
+        samples get an occasional probe call; with no data at all, `default`.
+        """
+        if not self.pool:
+            return default
+        with self._lock:
+            n = self._routed[agent] = self._routed.get(agent, 0) + 1
+            unmeasured = [m for m in self.pool if len(self._window(agent, m).latency) < self.min_samples]
+            if unmeasured and n % self.explore_every == 0:
+                return unmeasured[(n // self.explore_every) % len(unmeasured)]
+
+            slo = self.slos_s.get(agent)
+            ranked: List[Tuple[bool, float, float, str]] = []
+            for model in self.pool:
+                w = self._window(agent, model)
+                if len(w.latency) < self.min_samples:
+                    continue
+                failure_rate = 1 - sum(w.ok) / len(w.ok)
+                if failure_rate > self.max_failure_rate:
+                    continue
+                within_slo = slo is None or percentile(list(w.latency), 90) <= slo
+                ranked.append((not within_slo, percentile(list(w.latency), 50), self._cost(w, model), model))
+        return min(ranked)[-1] if ranked else default
+
+    def choose_copy(self, default: str, regenerating: bool = False) -> str:
+        """
+        Copywriter model: the routed base model, escalated to the strong model
+        for a regeneration or when the base model's recent outputs fail QA
+        often enough that a regeneration is likely.
+        """
+        base = self.choose("copywriter", default)
+        if regenerating:
+            return self.strong_model
+        with self._lock:
+            p = self._regen_p(self._window("copywriter", base))
+        return self.strong_model if p is not None and p >= self.escalate_p else base
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {}
+            for (agent, model), w in sorted(self._windows.items()):
+                if not w.latency and not w.qa:
+                    continue
+                out.setdefault(agent, {})[model] = {
+                    "calls": len(w.latency),
+                    "p50_s": round(percentile(list(w.latency), 50), 3),
+                    "p90_s": round(percentile(list(w.latency), 90), 3),
+                    "failure_rate": round(1 - sum(w.ok) / len(w.ok), 3) if w.ok else 0.0,
+                    "avg_cost_usd": round(sum(w.cost) / len(w.cost), 6) if w.cost else 0.0,
+                    "regen_p": self._regen_p(w),
+                }
+            return out
+
+
+_routers: Dict[Tuple[Any, ...], ModelRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def get_model_router(pool: Tuple[str, ...], slos_spec: str, strong_model: str, escalate_p: float) -> ModelRouter:
+    """
+    The shared router for this pool/SLO setup (measurements persist across jobs).
+    """
+    key = (pool, slos_spec, strong_model, escalate_p)
+    with _routers_lock:
+        if key not in _routers:
+            _routers[key] = ModelRouter(
+                pool, slos_s=parse_slos(slos_spec), strong_model=strong_model, escalate_p=escalate_p
+            )
+        return _routers[key]
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from typing import List, Optional, Literal, Dict, Any
-from pydantic import BaseModel, Field, conlist
+from pydantic import BaseModel, ConfigDict, Field, conlist
 
 
 # ---- Cohort ----
@@ -50,6 +50,7 @@ class QAGate(BaseModel):
     score: float = Field(..., ge=0.0, le=1.0)
     flags: List[str] = Field(default_factory=list)
     regenerations: int = 0
+    judged_by: Literal["local", "llm"] = "llm"
 
 
 # ---- Explain narrative ----
@@ -59,6 +60,28 @@ class ExplainBundle(BaseModel):
     why_message: str
 
 
+# ---- Usage / cost accounting ----
+class AgentUsage(BaseModel):
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    retries: int = 0
+    tokens_saved: int = 0
+    failures: int = 0
+    latency_s: float = 0.0
+    queue_wait_s: float = 0.0
+    cost_usd: float = 0.0
+    hedges: int = 0
+    hedge_wins: int = 0
+    models: List[str] = Field(default_factory=list)
+
+
+class UsageSummary(AgentUsage):
+    wall_time_s: float = 0.0
+    by_agent: Dict[str, AgentUsage] = Field(default_factory=dict)
+
+
 # ---- Full result ----
 class AutopilotResult(BaseModel):
     cohort: CohortInsight
@@ -68,3 +91,29 @@ class AutopilotResult(BaseModel):
     explain: ExplainBundle
     adoption: Dict[str, str]
     deploy_payload: Dict[str, Any]
+    usage: UsageSummary = Field(default_factory=UsageSummary)
+    perf: Dict[str, Any] = Field(default_factory=dict)  # pipeline optimizations (speculation, ...)
+
+
+# ---- REST API (core/api.py) ----
+class JobRequest(BaseModel):
+    # unknown keys are rejected (API jobs always run at batch priority; there is no "priority" field)
+    model_config = ConfigDict(extra="forbid")
+
+    dataset: str = Field(..., description="CSV path relative to API_DATASETS_DIR, e.g. 'heidi_events.csv'")
+    wedge: Literal["no_consult_48h", "note_not_finalized_2h", "followup_not_booked_14d"]
+    goal: Literal["activation", "followup", "reengage"] = "activation"
+    mode: Literal["shadow", "assisted", "auto"] = "shadow"
+    profile: bool = False  # CPU + allocation profiles of parse / wedge stats in exports/
+
+
+class JobView(BaseModel):
+    job_id: str
+    state: str
+    done: bool
+    cancelled: bool = False
+    error: Optional[str] = None
+    queue_position: Optional[int] = None
+    eta_s: Optional[float] = None
+    progress: List[str] = Field(default_factory=list)
+    links: Dict[str, str] = Field(default_factory=dict)
@@ -0,0 +1,93 @@
+"""
+Server-sent events for job progress, mounted on the Dash Flask server.
+
+    GET /jobs/<job_id>/events        (Last-Event-ID or ?cursor= resumes)
+
+Each message is one ProgressDelta as JSON; the event id is its cursor, so a
+reconnecting EventSource picks up where it left off. A stream ends once the
+job is done, and otherwise after `max_age_s` (the browser reconnects with
+Last-Event-ID). Waiting is on JobManager's shared condition variable (no
+per-viewer polling); with `gunicorn -k gevent` each open stream is a greenlet
+rather than a thread. Under a threaded server (`python app.py`, sync gunicorn
+workers) every stream holds a thread, so the cap drops to `max_thread_streams`.
+Past the cap the endpoint answers 503 and the client stays on interval polling.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import threading
+import time
+from dataclasses import asdict
+from typing import Any, Iterator
+
+from flask import Flask, Response, request
+
+
+def _message(delta, event: str = "progress") -> str:
+    return f"id: {delta.cursor}\nevent: {event}\ndata: {json.dumps(asdict(delta), separators=(',', ':'))}\n\n"
+
+
+def cooperative() -> bool:
+    """True when threads are gevent greenlets (gunicorn -k gevent), so an open stream costs no OS thread."""
+    if "gevent" not in sys.modules:
+        return False
+    from gevent import monkey
+
+    return monkey.is_module_patched("threading")
+
+
+def stream_progress(jobs: Any, job_id: str, cursor: int, *, heartbeat_s: float = 15.0, max_age_s: float = 300.0) -> Iterator[str]:
+    started = time.monotonic()
+    last_queue = None
+    yield "retry: 2000\n\n"
+    while time.monotonic() - started < max_age_s:
+        if last_queue is None:
+            delta = jobs.progress_since(job_id, cursor)  # first message right away (state, queue position)
+        else:
+            delta = jobs.wait_progress(job_id, cursor, timeout=heartbeat_s)
+        if delta is None:
+            yield "event: missing\ndata: {}\n\n"
+            return
+        queue = (delta.state, delta.queue_position)
+        if delta.events or delta.done or queue != last_queue:
+            cursor, last_queue = delta.cursor, queue
+            yield _message(delta)
+            if delta.done:
+                return
+        else:
+            yield ": ping\n\n"  # keeps proxies from closing an idle stream
+    # past max_age the client reconnects with Last-Event-ID
+
+
+def register_sse(server: Flask, jobs: Any, max_streams: int = 500, max_thread_streams: int = 32):
+    open_streams = [0]
+    lock = threading.Lock()
+
+    @server.route("/jobs/<job_id>/events")
+    def job_events(job_id: str):
+        try:
+            cursor = int(request.headers.get("Last-Event-ID") or request.args.get("cursor") or 0)
+        except ValueError:
+            cursor = 0
+        limit = max_streams if cooperative() else min(max_streams, max_thread_streams)
+        with lock:
+            if open_streams[0] >= limit:
+                return Response("Too many open streams; poll instead.", status=503)
+            open_streams[0] += 1
+
+        def body():
+            try:
+                yield from stream_progress(jobs, job_id, cursor)
+            finally:
+                with lock:
+                    open_streams[0] -= 1
+
+        return Response(
+            body(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    return job_events
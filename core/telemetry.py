@@ -0,0 +1,217 @@
+"""
+Process-wide metrics registry, rendered in the Prometheus text format.
+
+    GET /metrics          (web process; worker.py --metrics-port for workers)
+
+Recording is a dict update under a per-metric lock (histograms add a bisect),
+so it is cheap enough for every stage and LLM call. Gauges that mirror job
+store state are read by a callback at scrape time instead of being kept up to
+date on the hot path.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[Any, ...]:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[Any, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_num(value)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[Any, ...], float] = {}
+        self._fn: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: Any):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, fn: Optional[Callable[[], float]]):
+        """Read the (unlabelled) value from `fn` at scrape time."""
+        self._fn = fn
+
+    def _samples(self) -> Iterator[str]:
+        if self._fn is not None:
+            try:
+                yield f"{self.name} {_num(self._fn())}"
+            except Exception:
+                pass  # a failing source (e.g. locked SQLite) just skips this scrape
+            return
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_num(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[Any, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any):
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][i] += 1
+            series[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: Any):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: Any) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return sum(series[0]) if series else 0
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted((k, (list(c), s[0])) for k, (c, s) in self._series.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else _num(bound)
+                labels = _labels(self.labelnames, key, 'le="%s"' % le)
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_num(round(total, 6))}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _get(self, cls, name: str, help: str, **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._get(Counter, name, help, labels=labels)
+
+    def gauge(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._get(Gauge, name, help, labels=labels)
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, labels=labels, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        return "\n".join(line for m in metrics for line in m.render()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "autopilot_stage_seconds", "Pipeline stage latency (parse, wedge_stats, agents, export).", ("stage",)
+)
+LLM_CALL_SECONDS = REGISTRY.histogram("autopilot_llm_call_seconds", "LLM call latency per agent.", ("agent",))
+LLM_FAILURES = REGISTRY.counter("autopilot_llm_failures_total", "LLM calls that failed after retries.", ("agent",))
+JOB_SECONDS = REGISTRY.histogram("autopilot_job_seconds", "Job run time, from start to result.", ("outcome",))
+QUEUE_WAIT_SECONDS = REGISTRY.histogram("autopilot_queue_wait_seconds", "Time jobs spent queued before starting.")
+JOBS = REGISTRY.counter("autopilot_jobs_total", "Finished jobs by outcome (done, error, cancelled, rejected).", ("outcome",))
+REGENERATIONS = REGISTRY.counter("autopilot_regenerations_total", "Copy regenerations triggered by the QA gate.")
+CACHE_LOOKUPS = REGISTRY.counter(
+    "autopilot_cache_lookups_total", "Variant library / speculative copy lookups.", ("cache", "result")
+)
+ACTIVE_JOBS = REGISTRY.gauge("autopilot_jobs_active", "Jobs running right now.")
+QUEUE_DEPTH = REGISTRY.gauge("autopilot_queue_depth", "Jobs waiting for a worker.")
+
+
+def watch_jobs(jobs: Any):
+    """Feed the active/queued gauges from a JobManager or SQLiteJobStore (read at scrape time)."""
+    ACTIVE_JOBS.set_function(lambda: jobs.counts()["running"])
+    QUEUE_DEPTH.set_function(lambda: jobs.counts()["queued"])
+
+
+def register_metrics(server: Any, jobs: Any):
+    watch_jobs(jobs)
+
+    @server.route("/metrics")
+    def metrics():
+        return server.response_class(REGISTRY.render(), headers={"Content-Type": CONTENT_TYPE})
+
+    return metrics
@@ -0,0 +1,145 @@
+"""
+Per-job span tracing, saved as Chrome trace / Perfetto JSON
+(open exports/<job_id>_trace.json in ui.perfetto.dev or chrome://tracing).
+
+Spans are complete ("X") events on the thread that ran them, so nesting comes
+from time containment and parallel work (speculative copy, hedges, best-of-N)
+shows up on its own track. Jobs are sampled up front (TRACE_SAMPLE_RATE); with
+TRACE_SLOW_S set every job is recorded and slow ones are kept as well. An
+unsampled job gets NULL_TRACER, whose spans are shared no-op objects.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class Span:
+    __slots__ = ("tracer", "name", "attrs", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+
+    def set(self, **attrs: Any):
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer.record(self.name, self.start, time.perf_counter(), **self.attrs)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **attrs: Any):
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    def __init__(self, job_id: str, *, sampled: bool = True, slow_s: Optional[float] = None):
+        self.job_id = job_id
+        self.sampled = sampled
+        self.slow_s = slow_s
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, str] = {}
+
+    def start(self):
+        """Restart the clock (a job's trace begins when it runs, not when it was queued)."""
+        self._t0 = time.perf_counter()
+
+    def span(self, name: str, **attrs: Any) -> Span:
+        return Span(self, name, attrs)
+
+    def record(self, name: str, start: float, end: float, **attrs: Any):
+        """Add a finished span (perf_counter timestamps)."""
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": round((start - self._t0) * 1e6, 1),
+            "dur": round((end - start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": attrs,
+        }
+        with self._lock:
+            self._events.append(event)
+            self._threads.setdefault(thread.ident, thread.name)
+
+    def elapsed_s(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def should_save(self) -> bool:
+        return self.sampled or (self.slow_s is not None and self.elapsed_s() >= self.slow_s)
+
+    def to_chrome(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        meta = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"job {self.job_id}"}}]
+        meta += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": n}} for tid, n in threads.items()]
+        return {"traceEvents": meta + events, "displayTimeUnit": "ms", "otherData": {"job_id": self.job_id}}
+
+    def save(self, exports_dir: Path) -> Optional[Path]:
+        """Write <job_id>_trace.json if this job was sampled (or ran slow); returns the path."""
+        if not self.should_save():
+            return None
+        exports_dir.mkdir(exist_ok=True)
+        path = exports_dir / f"{self.job_id}_trace.json"
+        path.write_text(json.dumps(self.to_chrome(), separators=(",", ":"), default=str))
+        return path
+
+
+class _NullTracer(Tracer):
+    def __init__(self):
+        super().__init__("", sampled=False)
+
+    def start(self):
+        pass
+
+    def span(self, name: str, **attrs: Any):
+        return _NULL_SPAN
+
+    def record(self, name: str, start: float, end: float, **attrs: Any):
+        pass
+
+    def save(self, exports_dir: Path) -> Optional[Path]:
+        return None
+
+
+NULL_TRACER = _NullTracer()
+
+
+def start_trace(job_id: str, sample_rate: float, slow_s: float = 0.0) -> Tracer:
+    """Tracer for a new job: sampled with probability `sample_rate`, or kept if it outlives `slow_s`."""
+    sampled = sample_rate > 0 and random.random() < sample_rate
+    if not sampled and slow_s <= 0:
+        return NULL_TRACER
+    return Tracer(job_id, sampled=sampled, slow_s=slow_s if slow_s > 0 else None)
@@ -1,56 +1,290 @@
 from __future__ import annotations
 
+import gzip
+import heapq
+import itertools
 import json
+import math
 import threading
+import time
 import uuid
+from contextlib import contextmanager
 from dataclasses import dataclass, field
+from collections import deque
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Optional
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 
-import requests
+from core.ratelimit import LANES
+from core.telemetry import JOB_SECONDS, JOBS, QUEUE_WAIT_SECONDS
 
 
 def human_dt(dt: datetime) -> str:
     return dt.strftime("%Y-%m-%d %H:%M:%S UTC")
 
 
+class JobCancelled(RuntimeError):
+    """Raised at a cancellation point once a job is cancelled or past a deadline."""
+
+
+class CancelToken:
+    """
+    Cooperative cancellation + deadlines for one job.
+    Checked between agent stages and before/while waiting on LLM calls.
+    """
+
+    def __init__(self, total_timeout_s: Optional[float] = None):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+        self._total_timeout_s = total_timeout_s
+        self._deadline = time.monotonic() + total_timeout_s if total_timeout_s else None
+        self._stage: Optional[str] = None
+        self._stage_deadline: Optional[float] = None
+
+    def start(self):
+        """Restart the job deadline (time spent queued doesn't count)."""
+        if self._total_timeout_s:
+            self._deadline = time.monotonic() + self._total_timeout_s
+
+    def cancel(self, reason: str = "Cancelled"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def remaining(self) -> Optional[float]:
+        deadlines = [d for d in (self._deadline, self._stage_deadline) if d is not None]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+
+    def check(self):
+        if self._event.is_set():
+            raise JobCancelled(self.reason or "Cancelled")
+        now = time.monotonic()
+        if self._stage_deadline is not None and now >= self._stage_deadline:
+            self.cancel(f"Stage '{self._stage}' timed out")
+            raise JobCancelled(self.reason)
+        if self._deadline is not None and now >= self._deadline:
+            self.cancel("Job timed out")
+            raise JobCancelled(self.reason)
+
+    def sleep(self, seconds: float):
+        """Interruptible sleep (e.g. retry backoff)."""
+        remaining = self.remaining()
+        if self._event.wait(min(seconds, remaining) if remaining is not None else seconds):
+            self.check()
+
+    @contextmanager
+    def stage(self, name: str, timeout_s: Optional[float] = None):
+        self.check()
+        self._stage = name
+        self._stage_deadline = time.monotonic() + timeout_s if timeout_s else None
+        try:
+            yield self
+            self.check()  # an overrun stage fails here, even if its last call came back
+        finally:
+            self._stage = None
+            self._stage_deadline = None
+
+
 @dataclass
 class JobStatus:
     job_id: str
     progress: List[Dict[str, Any]] = field(default_factory=list)
     done: bool = False
     result: Optional[Dict[str, Any]] = None
+    session_id: Optional[str] = None
+    cancelled: bool = False
+    cancel: CancelToken = field(default_factory=CancelToken, repr=False)
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    last_access: float = field(default_factory=time.monotonic)
+    progress_bytes: int = 0
+    result_bytes: int = 0  # compact JSON size of the result (in memory or not)
+    result_path: Optional[str] = None  # spilled copy; result is reloaded from here on get()
+    state: str = "created"  # created | queued | running | done
+    priority: str = "interactive"
+    queue_position: Optional[int] = None  # 1-based, while queued
+    eta_s: Optional[float] = None  # estimated wait before it starts, while queued
+    event_seq: int = 0  # seq of the last progress event (events are numbered from 1)
+
+
+@dataclass
+class ProgressDelta:
+    """Progress events after a client's cursor, plus what the stepper needs to show."""
+
+    events: List[Dict[str, Any]]
+    cursor: int  # pass back on the next call
+    done: bool
+    state: str
+    cancelled: bool = False
+    queue_position: Optional[int] = None
+    eta_s: Optional[float] = None
 
 
 class JobManager:
     """
     Tiny in-process job runner so Dash can show live progress.
+
+    Retention: finished jobs are dropped after `ttl_s` and beyond `max_jobs`
+    (least recently read first). Results are spilled to compact gzip JSON in
+    `spill_dir` on completion; when results held in memory exceed
+    `max_memory_bytes`, the least recently read are released and reloaded
+    lazily by get(). Running jobs are never evicted.
+
+    Scheduling: a fixed pool of `workers` threads takes queued jobs in priority
+    order (interactive before batch, FIFO within a class). Admission control
+    rejects a job once `max_queue` are waiting (batch only gets half of it).
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        job_timeout_s: Optional[float] = None,
+        *,
+        max_jobs: int = 200,
+        ttl_s: float = 3600.0,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+        max_progress: int = 200,
+        spill_dir: Optional[str] = None,
+        workers: int = 4,
+        max_queue: int = 32,
+    ):
         self._jobs: Dict[str, JobStatus] = {}
         self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)  # queue → workers
+        self._changed = threading.Condition(self._lock)  # any job progress/state change → stream waiters
+        self._queue: List[Tuple[int, int, str, Callable[[], Dict[str, Any]]]] = []
+        self._seq = itertools.count()
+        self._queue_version = 0  # bumped on every queue change; wakes queued viewers (their position moved)
+        self._workers: List[threading.Thread] = []
+        self._durations: Deque[float] = deque(maxlen=50)
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.job_timeout_s = job_timeout_s
+        self.max_jobs = max_jobs
+        self.ttl_s = ttl_s
+        self.max_memory_bytes = max_memory_bytes
+        self.max_progress = max_progress
+        self.spill_dir = Path(spill_dir) if spill_dir else None
 
-    def create_job(self) -> str:
+    def create_job(self, session_id: Optional[str] = None) -> str:
+        """
+        New job; any still-running job from the same session is superseded and cancelled.
+        """
         job_id = uuid.uuid4().hex[:10]
+        self._evict()
         with self._lock:
-            self._jobs[job_id] = JobStatus(job_id=job_id, progress=[])
+            superseded = [
+                j for j in self._jobs.values() if session_id and j.session_id == session_id and not j.done
+            ]
+            self._jobs[job_id] = JobStatus(
+                job_id=job_id,
+                progress=[],
+                session_id=session_id,
+                cancel=CancelToken(self.job_timeout_s),
+            )
+        for job in superseded:
+            self.cancel(job.job_id, "Superseded by a newer run")
         return job_id
 
+    def token(self, job_id: str) -> Optional[CancelToken]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.cancel if job else None
+
+    def cancel(self, job_id: str, reason: str = "Cancelled by user") -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.done:
+                return False
+            job.cancel.cancel(reason)
+            queued = job.state in ("created", "queued")
+            if queued:
+                # never started: done now, and its slot goes back to admission control
+                job.cancelled = True
+                job.done = True
+                job.state = "done"
+                job.finished_at = time.time()
+                self._dequeue_locked(job_id)
+                self._queue_changed_locked()
+        self.update(job_id, f"⨯ Cancelled: {reason}" if queued else f"⨯ Cancelling: {reason}…", kind="error")
+        return True
+
     def update(self, job_id: str, text: str, done: bool = False, kind: str = "info"):
         with self._lock:
             job = self._jobs.get(job_id)
             if not job:
                 return
-            job.progress.append({"text": text, "done": done, "kind": kind})
+            job.event_seq += 1
+            job.progress.append({"seq": job.event_seq, "text": text, "done": done, "kind": kind})
+            job.progress_bytes += len(text.encode())
+            if len(job.progress) > self.max_progress:
+                # keep the first line (job start) and the most recent ones
+                dropped = job.progress.pop(1)
+                job.progress_bytes -= len(dropped.get("text", "").encode())
+            self._changed.notify_all()
 
     def set_result(self, job_id: str, result: Dict[str, Any]):
+        payload = json.dumps(result, separators=(",", ":"), default=str).encode()
+        path = self._spill(job_id, payload)
         with self._lock:
             job = self._jobs.get(job_id)
             if not job:
                 return
             job.result = result
+            job.result_bytes = len(payload)
+            job.result_path = path
             job.done = True
+            job.state = "done"
+            job.finished_at = time.time()
+            job.last_access = time.monotonic()
+            self._release_memory_locked()
+            self._changed.notify_all()
+
+    def _spill(self, job_id: str, payload: bytes) -> Optional[str]:
+        if self.spill_dir is None:
+            return None
+        try:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            path = self.spill_dir / f"{job_id}.json.gz"
+            path.write_bytes(gzip.compress(payload, compresslevel=5))
+            return str(path)
+        except OSError:
+            return None  # keep it in memory only; never released
+
+    def _release_memory_locked(self):
+        held = sum(j.result_bytes for j in self._jobs.values() if j.result is not None)
+        if held <= self.max_memory_bytes:
+            return
+        spilled = sorted(
+            (j for j in self._jobs.values() if j.result is not None and j.result_path),
+            key=lambda j: j.last_access,
+        )
+        for job in spilled:
+            if held <= self.max_memory_bytes:
+                break
+            job.result = None
+            held -= job.result_bytes
+
+    def _evict(self):
+        now = time.time()
+        removed: List[JobStatus] = []
+        with self._lock:
+            finished = [j for j in self._jobs.values() if j.done]
+            expired = {j.job_id for j in finished if j.finished_at and now - j.finished_at > self.ttl_s}
+            overflow = len(self._jobs) + 1 - len(expired) - self.max_jobs  # room for the job being created
+            if overflow > 0:
+                lru = sorted((j for j in finished if j.job_id not in expired), key=lambda j: j.last_access)
+                expired |= {j.job_id for j in lru[:overflow]}
+            for job_id in expired:
+                removed.append(self._jobs.pop(job_id))
+        for job in removed:
+            if job.result_path:
+                Path(job.result_path).unlink(missing_ok=True)
 
     def set_error(self, job_id: str, text: str):
         self.update(job_id, text, done=False, kind="error")
@@ -58,24 +292,205 @@ class JobManager:
             job = self._jobs.get(job_id)
             if job:
                 job.done = True
+                job.state = "done"
+                job.finished_at = time.time()
+                self._changed.notify_all()
 
     def get(self, job_id: str) -> Optional[JobStatus]:
         with self._lock:
-            return self._jobs.get(job_id)
-
-    def run(self, job_id: str, fn: Callable[[], Dict[str, Any]]):
-        def _target():
+            job = self._jobs.get(job_id)
+            if job:
+                job.last_access = time.monotonic()
+                if job.state == "queued":
+                    job.queue_position, job.eta_s = self._queue_eta_locked(job_id)
+            needs_load = bool(job and job.done and job.result is None and job.result_path)
+        if needs_load:
             try:
-                res = fn()
-                self.set_result(job_id, res)
-            except Exception as e:
-                self.set_error(job_id, f"Error: {e}")
+                result = json.loads(gzip.decompress(Path(job.result_path).read_bytes()))
+            except (OSError, ValueError):
+                result = None
+            with self._lock:
+                if job.result is None:
+                    job.result = result
+                self._release_memory_locked()
+        return job
+
+    def progress_since(self, job_id: str, cursor: int = 0) -> Optional[ProgressDelta]:
+        """
+        Events with seq > `cursor` (never the result; fetch that once via get()
+        when `done`). Cheap enough to call on every poll.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return None
+            job.last_access = time.monotonic()
+            events: List[Dict[str, Any]] = []
+            for event in reversed(job.progress):
+                if event["seq"] <= cursor:
+                    break
+                events.append(dict(event))
+            position, eta = self._queue_eta_locked(job_id) if job.state == "queued" else (None, None)
+            return ProgressDelta(
+                events=events[::-1],
+                cursor=max(cursor, job.event_seq),
+                done=job.done,
+                state=job.state,
+                cancelled=job.cancelled,
+                queue_position=position,
+                eta_s=eta,
+            )
+
+    def wait_progress(self, job_id: str, cursor: int = 0, timeout: float = 15.0) -> Optional[ProgressDelta]:
+        """
+        Block until there are events after `cursor`, the job finishes, or
+        `timeout` passes; then progress_since(). Waiters share one condition
+        variable, so a streaming viewer costs no polling.
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            job = self._jobs.get(job_id)
+            state, version = (job.state, self._queue_version) if job else (None, None)
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job.done or job.event_seq > cursor:
+                    break
+                if job.state != state or (state == "queued" and self._queue_version != version):
+                    break  # started, or moved up in the queue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+        return self.progress_since(job_id, cursor)
 
-        t = threading.Thread(target=_target, daemon=True)
-        t.start()
+    def stats(self) -> Dict[str, Any]:
+        """Memory held per job (approximate: progress text + compact result JSON)."""
+        with self._lock:
+            per_job = {
+                j.job_id: {
+                    "done": j.done,
+                    "progress_lines": len(j.progress),
+                    "progress_bytes": j.progress_bytes,
+                    "result_bytes": j.result_bytes,
+                    "result_in_memory": j.result is not None,
+                    "spilled": bool(j.result_path),
+                }
+                for j in self._jobs.values()
+            }
+        in_memory = sum(
+            s["progress_bytes"] + (s["result_bytes"] if s["result_in_memory"] else 0) for s in per_job.values()
+        )
+        return {
+            "jobs": len(per_job),
+            "running": sum(1 for s in per_job.values() if not s["done"]),
+            "memory_bytes": in_memory,
+            "max_memory_bytes": self.max_memory_bytes,
+            "per_job": per_job,
+        }
+
+    def counts(self) -> Dict[str, int]:
+        """Jobs waiting for a worker / running now (cheap; read by the /metrics gauges)."""
+        with self._lock:
+            states = [j.state for j in self._jobs.values() if not j.done]
+        return {"queued": states.count("queued"), "running": states.count("running")}
+
+    def run(self, job_id: str, fn: Callable[[], Dict[str, Any]], priority: str = "interactive") -> bool:
+        """
+        Queue a job for the worker pool. Returns False (and fails the job with
+        a "busy" message) when admission control rejects it.
+        """
+        if priority not in LANES:
+            raise ValueError(f"Unknown priority: {priority}")
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if not job or job.done:
+                return False
+            waiting = len(self._live_queue_locked())
+            limit = self.max_queue if priority == "interactive" else self.max_queue // 2
+            admitted = waiting < limit
+            if admitted:
+                heapq.heappush(self._queue, (LANES.index(priority), next(self._seq), job_id, fn))
+                job.state = "queued"
+                job.priority = priority
+                self._ensure_workers_locked()
+                self._cond.notify()
+                self._queue_changed_locked()  # an interactive run can push batch jobs back
+        if not admitted:
+            JOBS.inc(outcome="rejected")
+            self.set_error(job_id, f"Busy: {waiting} runs already queued. Try again in a minute.")
+        return admitted
+
+    def _live_queue_locked(self) -> List[Tuple[int, int, str, Callable[[], Dict[str, Any]]]]:
+        # entries of jobs that finished while queued are skipped by the workers; don't count them
+        return [e for e in self._queue if (j := self._jobs.get(e[2])) is not None and not j.done]
+
+    def _queue_changed_locked(self):
+        self._queue_version += 1
+        self._changed.notify_all()
+
+    def _dequeue_locked(self, job_id: str):
+        kept = [entry for entry in self._queue if entry[2] != job_id]
+        if len(kept) != len(self._queue):
+            heapq.heapify(kept)
+            self._queue = kept
+
+    def _ensure_workers_locked(self):
+        while len(self._workers) < self.workers:
+            t = threading.Thread(target=self._worker, name=f"job-worker-{len(self._workers)}", daemon=True)
+            self._workers.append(t)
+            t.start()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                _, _, job_id, fn = heapq.heappop(self._queue)
+                self._queue_changed_locked()
+                job = self._jobs.get(job_id)
+                if job is None or job.done:
+                    continue  # evicted (or failed) while queued
+                job.state = "running"
+                job.queue_position = job.eta_s = None
+                job.cancel.start()
+                QUEUE_WAIT_SECONDS.observe(time.time() - job.created_at)
+            started = time.monotonic()
+            self._execute(job_id, fn)
+            with self._lock:
+                self._durations.append(time.monotonic() - started)
+
+    def _execute(self, job_id: str, fn: Callable[[], Dict[str, Any]]):
+        started = time.perf_counter()
+        outcome = "done"
+        try:
+            res = fn()
+            self.set_result(job_id, res)
+        except JobCancelled as e:
+            outcome = "cancelled"
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job:
+                    job.cancelled = True
+            self.set_error(job_id, f"⨯ Cancelled: {e}")
+        except Exception as e:
+            outcome = "error"
+            self.set_error(job_id, f"Error: {e}")
+        JOBS.inc(outcome=outcome)
+        JOB_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+
+    def _queue_eta_locked(self, job_id: str) -> Tuple[Optional[int], Optional[float]]:
+        order = [entry[2] for entry in sorted(self._live_queue_locked(), key=lambda e: e[:2])]
+        if job_id not in order:
+            return None, None
+        position = order.index(job_id) + 1
+        avg = sum(self._durations) / len(self._durations) if self._durations else 30.0
+        # every worker busy: this job starts after ceil(position / workers) job lengths (≈ half the first)
+        return position, round(avg * (math.ceil(position / self.workers) - 0.5), 1)
 
 
 def send_slack(webhook_url: str, text: str) -> bool:
+    import requests  # only jobs with a webhook pay for the import
+
     try:
         resp = requests.post(webhook_url, json={"text": text}, timeout=5)
         return 200 <= resp.status_code < 300
@@ -0,0 +1,263 @@
+"""
+Library of QA-approved message variants, reused across jobs.
+
+Variants that passed the QA gate are stored in SQLite, keyed by
+(wedge, channel, goal) and the CTA of the flow step they were written for.
+Once Flow Architect has produced a flow, a job whose steps ask for CTAs the
+library already covers can take variants per channel, lightly adapted to the
+new cohort name, instead of calling the Copywriter. Picks rotate through the
+least-used entries, and entries whose reused copy fails QA are discarded.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from core.schemas import FlowStep, MessagesBundle
+
+CHANNELS = ("email", "sms", "in_app")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS variants (
+    id INTEGER PRIMARY KEY,
+    wedge TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    goal TEXT NOT NULL,
+    tone TEXT NOT NULL,
+    cta TEXT NOT NULL,
+    text TEXT NOT NULL,
+    title TEXT NOT NULL,
+    notes TEXT NOT NULL,
+    wedge_name TEXT NOT NULL,
+    score REAL NOT NULL,
+    uses INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    text_hash TEXT NOT NULL UNIQUE
+);
+CREATE INDEX IF NOT EXISTS idx_variants_lookup ON variants (wedge, channel, goal, score DESC);
+CREATE INDEX IF NOT EXISTS idx_variants_tone ON variants (wedge, channel, goal, tone);
+CREATE INDEX IF NOT EXISTS idx_variants_age ON variants (last_used_at);
+"""
+
+# added after the first release; rows from before it have no step CTA and never match
+_MIGRATION = """
+ALTER TABLE variants ADD COLUMN step_cta TEXT NOT NULL DEFAULT '';
+"""
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_variants_step ON variants (wedge, channel, goal, step_cta, uses);
+CREATE INDEX IF NOT EXISTS idx_variants_created ON variants (created_at);
+"""
+
+
+def _norm(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def step_ctas(sequence: Sequence[FlowStep]) -> Optional[Dict[str, str]]:
+    """
+    Channel -> normalized CTA of the flow step on that channel. None unless the
+    flow has exactly one step per library channel.
+    """
+    ctas = {s.channel: _norm(s.cta) for s in sequence}
+    if len(sequence) != len(CHANNELS) or set(ctas) != set(CHANNELS):
+        return None
+    return ctas
+
+
+class VariantLibrary:
+    def __init__(
+        self,
+        path: str,
+        *,
+        min_score: float = 0.78,
+        max_age_days: float = 30.0,
+        max_per_key: int = 30,
+    ):
+        self.path = Path(path)
+        self.min_score = min_score
+        self.max_age_s = max_age_days * 86400
+        self.max_per_key = max_per_key
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        with self._init_lock:
+            if not self._ready:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                columns = {r["name"] for r in conn.execute("PRAGMA table_info(variants)")}
+                if "step_cta" not in columns:
+                    conn.executescript(_MIGRATION)
+                conn.executescript(_INDEXES)
+                self._ready = True
+        return conn
+
+    def add_bundle(
+        self,
+        *,
+        wedge: str,
+        goal: str,
+        wedge_name: str,
+        ctas: Dict[str, str],
+        messages: MessagesBundle,
+        score: float,
+    ) -> int:
+        """
+        Store every variant of a QA-passed bundle under the step CTAs (see
+        `step_ctas`) it was written for. Returns rows written. Re-adding the
+        same text keeps the higher score.
+        """
+        if score < self.min_score:
+            return 0
+        now = time.time()
+        rows = []
+        for ch in CHANNELS:
+            pack = getattr(messages, ch)
+            for v in pack.variants:
+                if not v.text.strip():
+                    continue
+                key = hashlib.sha1(f"{wedge}|{ch}|{goal}|{ctas[ch]}|{v.text}".encode()).hexdigest()
+                rows.append(
+                    (wedge, ch, goal, ctas[ch], v.tone, v.cta, v.text, pack.title, pack.notes, wedge_name, score, now, now, key)
+                )
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO variants (wedge, channel, goal, step_cta, tone, cta, text, title, notes, wedge_name,
+                                          score, created_at, last_used_at, text_hash)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(text_hash) DO UPDATE SET score = MAX(score, excluded.score)
+                    """,
+                    rows,
+                )
+                self._evict(conn, now)
+        finally:
+            conn.close()
+        return len(rows)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        # stale (written more than max_age ago, however often reused), below the bar,
+        # or beyond the top-K per key
+        conn.execute("DELETE FROM variants WHERE created_at < ?", (now - self.max_age_s,))
+        conn.execute("DELETE FROM variants WHERE score < ?", (self.min_score,))
+        conn.execute(
+            """
+            DELETE FROM variants WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY wedge, channel, goal, step_cta ORDER BY score DESC, created_at DESC
+                    ) AS rn FROM variants
+                ) WHERE rn > ?
+            )
+            """,
+            (self.max_per_key,),
+        )
+
+    def find_bundle(
+        self,
+        *,
+        wedge: str,
+        goal: str,
+        wedge_name: str,
+        ctas: Dict[str, str],
+        per_channel: int = 3,
+        tone: Optional[str] = None,
+    ) -> Optional[Tuple[MessagesBundle, List[int]]]:
+        """
+        Variants per channel written for the same step CTA, adapted to
+        `wedge_name`, plus the row ids picked (for `discard`). Least-used
+        first, so repeat jobs rotate through the passing entries; distinct
+        tones first within that. None unless every channel has `per_channel`.
+        """
+        conn = self._connect()
+        try:
+            picked: Dict[str, List[sqlite3.Row]] = {}
+            for ch in CHANNELS:
+                sql = "SELECT * FROM variants WHERE wedge = ? AND channel = ? AND goal = ? AND step_cta = ?"
+                args: List[Any] = [wedge, ch, goal, ctas[ch]]
+                if tone:
+                    sql += " AND tone = ?"
+                    args.append(tone)
+                rows = conn.execute(sql + " ORDER BY uses ASC, score DESC LIMIT ?", (*args, per_channel * 4)).fetchall()
+                picked[ch] = _diverse(rows, per_channel)
+                if len(picked[ch]) < per_channel:
+                    return None
+
+            ids = [r["id"] for rows in picked.values() for r in rows]
+            with conn:
+                conn.executemany(
+                    "UPDATE variants SET uses = uses + 1, last_used_at = ? WHERE id = ?",
+                    [(time.time(), i) for i in ids],
+                )
+        finally:
+            conn.close()
+
+        from core.schemas import MessagesBundle
+
+        return MessagesBundle(**{ch: _adapt(rows, wedge_name) for ch, rows in picked.items()}), ids
+
+    def discard(self, ids: List[int]) -> int:
+        """Drop entries whose reused copy failed QA. Returns rows deleted."""
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.executemany("DELETE FROM variants WHERE id = ?", [(i,) for i in ids]).rowcount
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT COUNT(*) AS n, AVG(score) AS avg_score, SUM(uses) AS uses FROM variants").fetchone()
+            return {"variants": row["n"], "avg_score": round(row["avg_score"] or 0.0, 3), "uses": row["uses"] or 0}
+        finally:
+            conn.close()
+
+
+def _diverse(rows: List[sqlite3.Row], k: int) -> List[sqlite3.Row]:
+    # one per distinct tone first, then fill in the order given
+    out, tones = [], set()
+    for r in rows:
+        if r["tone"] not in tones:
+            out.append(r)
+            tones.add(r["tone"])
+    out += [r for r in rows if r not in out]
+    return out[:k]
+
+
+def _adapt(rows: List[sqlite3.Row], wedge_name: str) -> Dict[str, Any]:
+    def sub(text: str, old: str) -> str:
+        return text.replace(old, wedge_name) if old and old != wedge_name else text
+
+    first = rows[0]
+    return {
+        "title": sub(first["title"], first["wedge_name"]),
+        "notes": first["notes"],
+        "variants": [
+            {"tone": r["tone"], "cta": r["cta"], "text": sub(r["text"], r["wedge_name"])} for r in rows
+        ],
+    }
+
+
+_libraries: Dict[str, VariantLibrary] = {}
+_libraries_lock = threading.Lock()
+
+
+def get_variant_library(path: str) -> VariantLibrary:
+    with _libraries_lock:
+        if path not in _libraries:
+            _libraries[path] = VariantLibrary(path)
+        return _libraries[path]
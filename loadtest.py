@@ -0,0 +1,345 @@
+"""
+Load test of the Dash app through its real callback endpoint, with the LLM stubbed.
+
+Each virtual user posts the same `/_dash-update-component` requests the
+browser does: on_upload -> start_job -> poll_job every --poll-interval until
+the result reference arrives -> the tab renderers. The server runs in this
+process (Flask test client, one thread per user) with LLM_BACKEND=stub, so
+what is measured is the app: parsing, scheduling, polling and rendering.
+
+    python loadtest.py --users 40 --concurrency 8
+    python loadtest.py --ramp 1,2,4,8,16,32 --users 24 --latency "lognormal:p50=1500,p95=4000,seed=7"
+    python loadtest.py --rate 2 --concurrency 64 --users 120     # open loop: 2 new users/s
+
+With --ramp, each step runs --users sessions at that concurrency and the
+report names the first step where throughput stops growing (<10% over the
+best so far), p95 time-to-result doubles, or runs get rejected/fail.
+Exports, job spills and the variant library go to a temporary directory.
+The variant library is off unless --variant-library is given: with the stub's
+fixed, passing copy every run after the first would be a library hit and skip
+the Copywriter and Evaluator. Each step reports its library hit rate.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.metrics import percentile
+from core.telemetry import CACHE_LOOKUPS
+
+RENDER_TABS = ("tab-detect", "tab-flow", "tab-messages", "tab-adoption")
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "mean": round(sum(values) / len(values), 3) if values else 0.0,
+        "max": round(max(values), 3) if values else 0.0,
+    }
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # peak, Linux KiB
+
+
+class ResourceSampler:
+    """Process CPU (% of one core), RSS and job store load, sampled in the background."""
+
+    def __init__(self, jobs: Any, interval_s: float = 0.5):
+        self.jobs = jobs
+        self.interval_s = interval_s
+        self.samples: List[Dict[str, float]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        wall, cpu = time.perf_counter(), time.process_time()
+        while not self._stop.wait(self.interval_s):
+            now_wall, now_cpu = time.perf_counter(), time.process_time()
+            counts = self.jobs.counts()
+            self.samples.append(
+                {
+                    "cpu_pct": 100 * (now_cpu - cpu) / max(now_wall - wall, 1e-9),
+                    "rss_mb": _rss_mb(),
+                    "running": counts["running"],
+                    "queued": counts["queued"],
+                }
+            )
+            wall, cpu = now_wall, now_cpu
+
+    def __enter__(self) -> "ResourceSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self) -> Dict[str, float]:
+        if not self.samples:
+            return {}
+        cpu = [s["cpu_pct"] for s in self.samples]
+        return {
+            "cpu_pct_mean": round(sum(cpu) / len(cpu), 1),
+            "cpu_pct_max": round(max(cpu), 1),
+            "rss_mb_max": round(max(s["rss_mb"] for s in self.samples), 1),
+            "running_max": max(s["running"] for s in self.samples),
+            "queued_max": max(s["queued"] for s in self.samples),
+        }
+
+
+class DashClient:
+    """Posts callback requests the way dash-renderer does, looked up by callback function name."""
+
+    def __init__(self, dash_app: Any):
+        self.server = dash_app.server
+        self.prefix = dash_app.config.requests_pathname_prefix
+        self.callbacks: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        for key, spec in dash_app.callback_map.items():
+            fn = spec.get("callback")
+            if fn is not None:
+                self.callbacks[fn.__name__] = (key, spec)
+
+    @staticmethod
+    def _outputs(key: str):
+        def split(part: str) -> Dict[str, str]:
+            cid, prop = part.split(".", 1)
+            return {"id": cid, "property": prop}
+
+        if key.startswith(".."):
+            return [split(p) for p in key[2:-2].split("...")]
+        return split(key)
+
+    def call(self, http: Any, name: str, inputs: Dict[str, Any], state: Optional[Dict[str, Any]] = None, changed: str = "") -> Dict[str, Dict[str, Any]]:
+        """
+        Run one callback; `inputs`/`state` map "id.prop" to values. Returns
+        {component_id: {prop: value}} ({} when the callback did not update).
+        """
+        key, spec = self.callbacks[name]
+        values = {**inputs, **(state or {})}
+
+        def items(deps):
+            return [{**d, "value": values.get(f"{d['id']}.{d['property']}")} for d in deps]
+
+        body = {
+            "output": key,
+            "outputs": self._outputs(key),
+            "inputs": items(spec["inputs"]),
+            "state": items(spec["state"]),
+            "changedPropIds": [changed or next(iter(inputs))],
+        }
+        resp = http.post(f"{self.prefix}_dash-update-component", json=body)
+        if resp.status_code == 204:
+            return {}
+        if resp.status_code != 200:
+            raise RuntimeError(f"{name}: HTTP {resp.status_code}")
+        return json.loads(resp.data)["response"]
+
+
+def run_session(client: DashClient, *, contents: str, filename: str, wedge: str, goal: str, mode: str, poll_interval_s: float, timeout_s: float) -> Dict[str, Any]:
+    http = client.server.test_client()
+    out: Dict[str, Any] = {"ok": False}
+    client.call(http, "on_upload", {"upload-events.contents": contents}, {"upload-events.filename": filename})
+
+    started = time.perf_counter()
+    resp = client.call(
+        http,
+        "start_job",
+        {"btn-generate.n_clicks": 1, "cta-generate.n_clicks": None, "nav-generate.n_clicks": None},
+        {
+            "upload-events.contents": contents,
+            "goal.value": goal,
+            "wedge.value": wedge,
+            "mode.value": mode,
+            "store-session-id.data": uuid.uuid4().hex,
+        },
+        changed="btn-generate.n_clicks",
+    )
+    job_id = resp["store-job-id"]["data"]
+    out["start_s"] = time.perf_counter() - started
+
+    cursor, ref, polls = 0, None, 0
+    while time.perf_counter() - started < timeout_s:
+        time.sleep(poll_interval_s)
+        polls += 1
+        resp = client.call(
+            http,
+            "poll_job",
+            {"poll.n_intervals": polls},
+            {"store-job-id.data": job_id, "store-progress-cursor.data": cursor},
+        )
+        cursor = resp.get("store-progress-cursor", {}).get("data", cursor)
+        ref = resp.get("store-result", {}).get("data")
+        if ref or resp.get("poll", {}).get("disabled"):
+            break
+    out["polls"] = polls
+    if not ref:
+        out["error"] = "timeout" if time.perf_counter() - started >= timeout_s else "no result (rejected, cancelled or failed)"
+        return out
+    out["time_to_result_s"] = time.perf_counter() - started
+
+    t0 = time.perf_counter()
+    renderers = {"tab-detect": "render_detect", "tab-flow": "render_flow", "tab-messages": "render_messages", "tab-adoption": "render_adoption"}
+    for tab in RENDER_TABS:
+        client.call(http, renderers[tab], {"store-result.data": ref, "tabs.active_tab": tab}, {"mode.value": mode})
+    out["render_s"] = time.perf_counter() - t0
+    out["session_s"] = time.perf_counter() - started
+    out["ok"] = True
+    return out
+
+
+def run_step(client: DashClient, jobs: Any, *, users: int, concurrency: int, rate: float, **session) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+
+    def one():
+        try:
+            res = run_session(client, **session)
+        except Exception as e:
+            res = {"ok": False, "error": str(e)}
+        with lock:
+            results.append(res)
+
+    lookups_before = {r: CACHE_LOOKUPS.value(cache="variant_library", result=r) for r in ("hit", "miss")}
+    started = time.perf_counter()
+    with ResourceSampler(jobs) as sampler, ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        rng = random.Random(7)
+        for _ in range(users):
+            pool.submit(one)
+            if rate > 0:
+                time.sleep(rng.expovariate(rate))  # Poisson arrivals (capped by --concurrency)
+    elapsed = time.perf_counter() - started
+    hits, misses = (CACHE_LOOKUPS.value(cache="variant_library", result=r) - lookups_before[r] for r in ("hit", "miss"))
+
+    ok = [r for r in results if r["ok"]]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if not r["ok"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    return {
+        "concurrency": concurrency,
+        "arrival_rate": rate or None,
+        "users": users,
+        "ok": len(ok),
+        "failed": users - len(ok),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_s": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "time_to_result_s": _summary([r["time_to_result_s"] for r in ok]),
+        "start_job_s": _summary([r["start_s"] for r in ok]),
+        "render_s": _summary([r["render_s"] for r in ok]),
+        "polls_per_job": round(sum(r["polls"] for r in ok) / len(ok), 1) if ok else 0.0,
+        "library_hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+        "server": sampler.report(),
+    }
+
+
+def find_saturation(steps: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """First step whose throughput stops growing, whose p95 doubles, or that loses runs."""
+    if not steps:
+        return None
+    base_p95 = steps[0]["time_to_result_s"]["p95"]
+    best = steps[0]["throughput_per_s"]
+    for prev, step in zip(steps, steps[1:]):
+        reasons = []
+        if step["failed"]:
+            reasons.append(f"{step['failed']} runs failed or were rejected")
+        if step["throughput_per_s"] < 1.1 * best:
+            reasons.append(f"throughput {step['throughput_per_s']}/s vs best {best}/s")
+        if base_p95 and step["time_to_result_s"]["p95"] > 2 * base_p95:
+            reasons.append(f"p95 time-to-result {step['time_to_result_s']['p95']}s vs {base_p95}s at concurrency {steps[0]['concurrency']}")
+        if reasons:
+            return {"concurrency": step["concurrency"], "max_sustainable_concurrency": prev["concurrency"], "reasons": reasons}
+        best = max(best, step["throughput_per_s"])
+    return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Load-test the Dash callback flow with a stubbed LLM.")
+    ap.add_argument("--data", default="sample_data/heidi_events.csv")
+    ap.add_argument("--users", type=int, default=20, help="Sessions per step")
+    ap.add_argument("--concurrency", type=int, default=4, help="Simultaneous sessions")
+    ap.add_argument("--ramp", help="Comma-separated concurrency steps, e.g. 1,2,4,8,16 (overrides --concurrency)")
+    ap.add_argument("--rate", type=float, default=0.0, help="Open-loop arrivals per second (0 = closed loop)")
+    ap.add_argument("--wedge", default="no_consult_48h")
+    ap.add_argument("--mode", default="shadow")
+    ap.add_argument("--latency", default="lognormal:p50=1500,p95=4000,seed=7", help="Stub LLM latency: none | lognormal:p50=ms,p95=ms,seed=n")
+    ap.add_argument("--poll-interval", type=float, default=0.6, help="Seconds between polls (the app's dcc.Interval)")
+    ap.add_argument("--timeout", type=float, default=300.0, help="Give up on a session after this many seconds")
+    ap.add_argument("--variant-library", action="store_true", help="Keep the variant library on (measures the cache-hit path)")
+    ap.add_argument("--out", help="Also write the report JSON here")
+    args = ap.parse_args(argv)
+
+    raw = Path(args.data).read_bytes()
+    out_path = Path(args.out).resolve() if args.out else None
+    contents = "data:text/csv;base64," + base64.b64encode(raw).decode()
+
+    # The app reads its config at import: stub the LLM and keep runtime files out of the repo.
+    os.environ["LLM_BACKEND"] = "stub"
+    os.environ["LLM_REPLAY_LATENCY"] = args.latency
+    os.environ["VARIANT_LIBRARY"] = "1" if args.variant_library else "0"
+    workdir = tempfile.mkdtemp(prefix="autopilot-loadtest-")
+    os.chdir(workdir)
+    import app as dash_app_module
+
+    client = DashClient(dash_app_module.app)
+    session = dict(
+        contents=contents,
+        filename=Path(args.data).name,
+        wedge=args.wedge,
+        goal="activation",
+        mode=args.mode,
+        poll_interval_s=args.poll_interval,
+        timeout_s=args.timeout,
+    )
+    levels = [int(c) for c in args.ramp.split(",")] if args.ramp else [args.concurrency]
+    steps = []
+    for level in levels:
+        step = run_step(client, dash_app_module.jobs, users=args.users, concurrency=level, rate=args.rate, **session)
+        steps.append(step)
+        print(
+            f"concurrency {level:>3}: {step['ok']}/{step['users']} ok • {step['throughput_per_s']}/s • "
+            f"p50 {step['time_to_result_s']['p50']}s p95 {step['time_to_result_s']['p95']}s p99 {step['time_to_result_s']['p99']}s • "
+            f"cpu {step['server'].get('cpu_pct_mean', 0)}% • rss {step['server'].get('rss_mb_max', 0)} MB",
+            file=sys.stderr,
+        )
+
+    config = dash_app_module.config
+    report = {
+        "latency_model": args.latency,
+        "variant_library": config.variant_library,
+        "job_workers": config.job_workers,
+        "job_queue_max": config.job_queue_max,
+        "cpu_count": os.cpu_count(),
+        "steps": steps,
+        "saturation": find_saturation(steps),
+        "workdir": workdir,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if out_path:
+        out_path.write_text(text)
+    return 0 if all(s["failed"] == 0 for s in steps) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Execution worker for the shared job store (JOB_STORE=sqlite).
+
+Web processes only enqueue jobs and read progress; run one or more of these
+next to them (on the same host / shared volume as JOB_STORE_PATH):
+
+    JOB_STORE=sqlite python worker.py --concurrency 2 --metrics-port 9101
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+from core.config import AppConfig
+from core.job_store import SQLiteJobStore, worker_id
+from core.telemetry import CONTENT_TYPE, JOBS, REGISTRY, watch_jobs
+from agents.runner import build_autopilot_job, make_job_manager
+
+
+def run_worker(
+    *,
+    store: SQLiteJobStore,
+    config: AppConfig,
+    concurrency: int = 2,
+    poll_s: float = 0.25,
+    heartbeat_s: float = 2.0,
+    stop: Optional[threading.Event] = None,
+    log=print,
+):
+    me = worker_id()
+    stop = stop or threading.Event()
+    slots = threading.Semaphore(max(1, concurrency))
+
+    def beat():
+        while not stop.wait(heartbeat_s):
+            try:
+                store.heartbeat(me)
+            except Exception as e:  # keep beating through transient lock errors
+                log(f"heartbeat failed: {e}")
+
+    def execute(job: dict):
+        try:
+            spec = job["spec"]
+            try:
+                job_fn = build_autopilot_job(
+                    job_id=job["job_id"],
+                    raw_csv=job["payload"],
+                    goal=spec["goal"],
+                    wedge=spec["wedge"],
+                    mode=spec["mode"],
+                    config=config,
+                    exports_dir=spec.get("exports_dir", "exports"),
+                    jobs=store,
+                    profile=spec.get("profile", False),
+                )
+            except Exception as e:
+                # bad spec (e.g. from an older web version) or unusable exports dir: fail it, don't leave it running
+                detail = f"missing {e}" if isinstance(e, KeyError) else str(e)
+                store.set_error(job["job_id"], f"Error: could not start job: {detail}")
+                JOBS.inc(outcome="error")
+                log(f"{job['job_id']} failed to start: {detail}")
+                return
+            store.execute(job["job_id"], job_fn)
+            log(f"{job['job_id']} finished")
+        finally:
+            slots.release()
+
+    threading.Thread(target=beat, daemon=True).start()
+    log(f"worker {me}: {concurrency} slots on {store.path}")
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        while not stop.is_set():
+            slots.acquire()
+            job = store.claim(me)
+            if job is None:
+                slots.release()
+                stop.wait(poll_s)
+                continue
+            log(f"{job['job_id']} claimed")
+            pool.submit(execute, job)
+
+
+def serve_metrics(store: SQLiteJobStore, port: int) -> ThreadingHTTPServer:
+    """This worker's stage/LLM/job metrics on :port/metrics (the web process only sees its own)."""
+    watch_jobs(store)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("", port), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Run autopilot jobs from the shared job store.")
+    ap.add_argument("--concurrency", type=int, help="Pipelines run at once (default: JOB_WORKERS)")
+    ap.add_argument("--metrics-port", type=int, help="Serve this worker's /metrics on this port")
+    args = ap.parse_args(argv)
+
+    config = AppConfig.load()
+    store = make_job_manager(config)
+    if not isinstance(store, SQLiteJobStore):
+        print("worker.py needs JOB_STORE=sqlite (the in-memory store runs jobs in the web process).", file=sys.stderr)
+        return 2
+    if args.metrics_port:
+        serve_metrics(store, args.metrics_port)
+    try:
+        run_worker(
+            store=store,
+            config=config,
+            concurrency=args.concurrency or config.job_workers,
+            log=lambda m: print(m, file=sys.stderr),
+        )
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())